@@ -1,3 +1,8 @@
+import functools
+import json
+import os
+import threading
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -5,6 +10,23 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 
+from chart_data import DEFAULT_BINS, DENSITY_THRESHOLD, WEBGL_THRESHOLD, density_grid, scatter_mode
+from columnar_store import ColumnarStore
+from correlation import MAX_ANNOTATED_COLUMNS, MAX_STYLED_COLUMNS, cluster_order, filter_matrix, top_pairs
+from data_loader import append_frames, combine_frames, compact_dtypes, file_digest, read_sheet_headers, read_workbooks, stream_sheet
+from dataset_cache import DatasetCache
+from dataset_profile import DatasetProfile
+from figure_cache import FigureCache
+from job_pool import JobPool
+from downsampling import DEFAULT_MAX_POINTS, METHODS, downsample_positions
+from perf_metrics import MetricsRegistry, StageRecorder, stage
+from pivot_cube import direct_rollup
+from row_filter import MAX_FILTER_LABELS, filter_positions
+from sample_data import generate_sales
+from stats_engine import trend_table
+from table_view import PAGE_SIZES, TableView, search_rows
+from time_series import FREQUENCIES, bucket_series, trend_frame
+
 # Cấu hình trang
 st.set_page_config(
     page_title="KẾT QUẢ PHÂN TÍCH THỐNG KÊ TRONG KINH DOANH",
@@ -17,111 +39,493 @@ st.set_page_config(
 st.title("📊 KẾT QUẢ PHÂN TÍCH THỐNG KÊ TRONG KINH DOANH")
 st.markdown("---")
 
-# Sidebar - Upload file
-st.sidebar.header("📁 Tải Lên File Excel")
-uploaded_file = st.sidebar.file_uploader(
-    "Chọn file Excel để phân tích",
-    type=['xlsx', 'xls'],
-    help="Hỗ trợ định dạng .xlsx và .xls"
-)
+# Kho cache dạng cột trên đĩa, dùng chung cho mọi phiên và giữ lại qua các lần khởi động lại
+@st.cache_resource
+def get_disk_store():
+    return ColumnarStore()
 
-if uploaded_file is not None:
-    try:
-        # Đọc file Excel
-        @st.cache_data
-        def load_excel(uploaded_file):
-            df = pd.read_excel(uploaded_file)
-            return df
-        
-        df = load_excel(uploaded_file)
-        
-        # Hiển thị thông tin cơ bản
-        st.sidebar.success(f"✅ Đã tải file thành công!")
-        st.sidebar.info(f"📏 Kích thước: {df.shape[0]} dòng × {df.shape[1]} cột")
-        
-        # Tùy chọn chọn sheet (nếu có nhiều sheet)
-        if 'xlsx' in uploaded_file.name:
-            try:
-                excel_file = pd.ExcelFile(uploaded_file)
-                if len(excel_file.sheet_names) > 1:
-                    selected_sheet = st.sidebar.selectbox(
-                        "Chọn sheet:",
-                        excel_file.sheet_names
-                    )
-                    df = pd.read_excel(uploaded_file, sheet_name=selected_sheet)
-            except:
-                pass
-        
-        # Chọn cột để phân tích
-        st.sidebar.markdown("---")
-        st.sidebar.subheader("⚙️ Tùy Chọn Phân Tích")
-        
-        # Hiển thị dữ liệu thô
-        st.header("📋 Xem Trước Dữ Liệu")
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Tổng số dòng", df.shape[0])
-        with col2:
-            st.metric("Tổng số cột", df.shape[1])
-        with col3:
-            st.metric("Tổng số ô", df.shape[0] * df.shape[1])
-        
-        # Tùy chọn hiển thị
-        show_data = st.checkbox("Hiển thị dữ liệu chi tiết", value=False)
-        if show_data:
-            st.dataframe(df, use_container_width=True, height=400)
+
+# Cache figure Plotly dùng chung cho mọi phiên, giới hạn theo dung lượng (FIGURE_CACHE_MB)
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+
+# Cache dữ liệu chỉ đọc dùng chung cho mọi phiên: mỗi nội dung file chỉ có một bản trong bộ nhớ,
+# giới hạn bằng DATASET_CACHE_MB và DATASET_CACHE_TTL
+@st.cache_resource
+def get_dataset_cache():
+    return DatasetCache()
+
+
+# Metrics hiệu năng tổng hợp cho mọi phiên, ghi ra PERF_METRICS_DIR nếu được cấu hình
+@st.cache_resource
+def get_metrics_registry():
+    return MetricsRegistry()
+
+
+# Bộ ghi thời gian từng giai đoạn của phiên hiện tại
+def get_recorder():
+    if 'perf_recorder' not in st.session_state:
+        st.session_state['perf_recorder'] = StageRecorder(get_metrics_registry())
+    return st.session_state['perf_recorder']
+
+
+# Dữ liệu có ít ô (dòng × cột) hơn số này được tính ngay trong lượt chạy; lớn hơn thì chạy nền
+BACKGROUND_MIN_CELLS = int(os.environ.get('BACKGROUND_MIN_CELLS', '2000000'))
+# Chu kỳ (giây) kiểm tra lại tác vụ nền đang chạy
+JOB_POLL_SECONDS = 0.5
+
+
+# Pool luồng dùng chung cho các phép tính nặng (JOB_WORKERS luồng).
+# Các giai đoạn chạy trong luồng nền được ghi vào metrics chung, không vào bảng của phiên.
+@st.cache_resource
+def get_job_pool():
+    registry = get_metrics_registry()
+    return JobPool(on_start=lambda: StageRecorder(registry).activate())
+
+
+# Đọc các workbook (tất cả sheet), mỗi file là một mục trong cache dữ liệu theo mã băm nội dung.
+# File chưa có trong bộ nhớ thì đọc lại bản Arrow trên đĩa; file chưa từng đọc được parse
+# song song (mỗi sheet một tiến trình con) rồi lưu vào kho trên đĩa.
+def load_workbooks(file_hashes, file_names, files_bytes):
+    cache = get_dataset_cache()
+    store = get_disk_store()
+    loaded = {}
+    missing = [i for i, file_hash in enumerate(file_hashes) if ('workbook', file_hash) not in cache]
+    if missing:
+        with st.spinner("Đang đọc file Excel..."):
+            with stage('load_disk_cache') as frame:
+                for i in missing:
+                    loaded[i] = store.load(file_hashes[i])
+                frame['rows'] = sum(len(df) for sheets in loaded.values() if sheets is not None for df in sheets.values())
+            to_parse = [i for i in missing if loaded[i] is None]
+            if to_parse:
+                with stage('parse_excel') as frame:
+                    parsed = read_workbooks([(files_bytes[i], file_names[i]) for i in to_parse])
+                    frame['rows'] = sum(len(df) for sheets in parsed for df in sheets.values())
+                for i, sheets in zip(to_parse, parsed):
+                    with stage('save_disk_cache'):
+                        store.save(file_hashes[i], file_names[i], sheets)
+                    loaded[i] = sheets
+    
+    def load_one(i):
+        if i in loaded:
+            return loaded[i]
+        # Mục vừa bị bỏ khỏi bộ nhớ giữa hai bước: đọc lại riêng file này
+        sheets = store.load(file_hashes[i])
+        if sheets is None:
+            sheets = read_workbooks([(files_bytes[i], file_names[i])])[0]
+            store.save(file_hashes[i], file_names[i], sheets)
+        return sheets
+    
+    return [
+        cache.get(('workbook', file_hash), lambda i=i: load_one(i), label=f"📄 {file_names[i]}")[0]
+        for i, file_hash in enumerate(file_hashes)
+    ]
+
+
+# Tiêu đề các sheet cho chế độ đọc theo luồng (chỉ đọc dòng đầu của mỗi sheet)
+@st.cache_data(show_spinner=False)
+def load_sheet_headers(file_hash, _file_bytes):
+    return read_sheet_headers(_file_bytes)
+
+
+# Ghép các sheet đã chọn thành một bộ dữ liệu có cột nguồn, một lần cho mỗi tổ hợp nguồn
+def load_combined(dataset_key, frames):
+    def load():
+        with st.spinner("Đang ghép dữ liệu..."), stage('combine', rows=sum(len(df) for df in frames.values())):
+            return combine_frames(frames)
+    return get_dataset_cache().get(dataset_key, load, label=f"📚 Gộp {len(frames)} sheet")[0]
+
+
+# Nén kiểu dữ liệu một lần cho mỗi phiên bản dữ liệu (file, sheet, tham số đọc)
+def load_compacted(dataset_key, df, label):
+    def load():
+        with st.spinner("Đang tối ưu kiểu dữ liệu..."), stage('compact_dtypes', rows=len(df)):
+            return compact_dtypes(df)
+    return get_dataset_cache().get(('compact', dataset_key), load, label=f"🗜️ {label}")[0]
+
+
+# Hồ sơ dữ liệu dùng chung cho mọi lần rerun (và mọi phiên) của cùng một phiên bản dữ liệu.
+# Hồ sơ nằm trong cache dữ liệu nên các kết quả đã tính được tính vào ngân sách bộ nhớ, TTL và
+# trang quản trị; df của hồ sơ là mục dữ liệu riêng trong cache nên không bị tính hai lần.
+# extend_from = (hồ sơ trước khi nối, các dòng nối thêm): hồ sơ mới được cập nhật từ hồ sơ cũ
+def get_profile(profile_key, df, label, extend_from=None):
+    def load():
+        if extend_from is not None:
+            base, delta = extend_from
+            return base.extend(delta, df, key=profile_key)
+        return DatasetProfile(df, key=profile_key)
+    return get_dataset_cache().get(('profile', profile_key), load, label=f"🧠 Hồ sơ: {label}")[0]
+
+
+# Nối lần lượt các file delta vào cuối dữ liệu. Mỗi bước có khóa riêng (khóa bước trước + mã
+# băm delta) nên phần đã nối được lấy lại từ cache, và hồ sơ của mỗi bước được cập nhật từ
+# hồ sơ của bước trước thay vì tính lại. Delta lấy sheet cùng tên với sheet đang xem nếu có,
+# không thì sheet đầu tiên. Trả về (dữ liệu đã nối, khóa hồ sơ).
+def append_deltas(df, profile_key, delta_files, sheet_name, label):
+    file_hashes = tuple(get_file_hash(f) for f in delta_files)
+    workbooks = load_workbooks(file_hashes, tuple(f.name for f in delta_files), [f.getvalue() for f in delta_files])
+    profile = get_profile(profile_key, df, label)
+    n_before = len(df)
+    issues = []
+    for f, file_hash, sheets in zip(delta_files, file_hashes, workbooks):
+        if not sheets:
+            continue
+        delta = sheets[sheet_name] if sheet_name in sheets else next(iter(sheets.values()))
+        key = profile_key + (('append', file_hash),)
         
-        st.markdown("---")
+        def load(base=df, delta=delta):
+            with stage('append', rows=len(delta)):
+                return append_frames(base, delta)
+        try:
+            (appended, delta_issues), _ = get_dataset_cache().get(('appended',) + key, load, label=f"➕ {label} + {f.name}")
+        except ValueError as e:
+            issues.append(f"{f.name}: {e}, không nối")
+            continue
+        issues += [f"{f.name}: {issue}" for issue in delta_issues]
+        profile = get_profile(key, appended, f"{label} + {f.name}", extend_from=(profile, appended.iloc[len(df):]))
+        df, profile_key = appended, key
+    
+    st.sidebar.info(f"➕ Đã nối thêm {len(df) - n_before:,} dòng từ {len(delta_files)} file")
+    if issues:
+        with st.sidebar.expander(f"⚠️ Dữ liệu nối thêm không khớp ({len(issues)})"):
+            for issue in issues:
+                st.write(f"- {issue}")
+    return df, profile_key
+
+
+# Bộ lọc dòng ở sidebar. Trả về trạng thái lọc dạng tuple (cột, 'in', nhãn) / (cột, 'range', lo, hi),
+# rỗng nếu không lọc. Chỉ mục của các cột được lọc dựng một lần trên hồ sơ của dữ liệu đầy đủ.
+def sidebar_filters(profile):
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔎 Bộ Lọc Dữ Liệu")
+    filter_columns = st.sidebar.multiselect(
+        "Lọc theo cột:",
+        profile.categorical_columns + profile.numeric_columns,
+        key="filter_columns"
+    )
+    
+    state = []
+    for col in filter_columns:
+        if col in profile.categorical_columns:
+            index, _ = profile.category_index(col)
+            if len(index.labels) > MAX_FILTER_LABELS:
+                st.sidebar.caption(f"⚠️ {col} có {len(index.labels):,} giá trị khác nhau, quá nhiều để lọc theo danh sách")
+                continue
+            chosen = st.sidebar.multiselect(f"{col}:", list(index.labels), key=f"filter_in_{col}")
+            if chosen:
+                state.append((col, 'in', tuple(chosen)))
+        else:
+            index, _ = profile.range_index(col)
+            lo, hi = index.bounds
+            if not lo < hi:
+                continue
+            chosen = st.sidebar.slider(f"{col}:", lo, hi, (lo, hi), key=f"filter_range_{col}")
+            if chosen != (lo, hi):
+                state.append((col, 'range') + tuple(chosen))
+    return tuple(state)
+
+
+# Các dòng thỏa bộ lọc, tìm qua chỉ mục và giữ trong cache dữ liệu dùng chung.
+# Chỉ các dòng được chọn được sao chép; khi mọi dòng đều thỏa thì dùng lại chính dữ liệu gốc.
+def load_filtered(profile, filter_state, label):
+    def load():
+        with stage('filter') as frame:
+            conditions = []
+            for col, kind, *args in filter_state:
+                index, _ = profile.category_index(col) if kind == 'in' else profile.range_index(col)
+                conditions.append((index, tuple(args)))
+            positions = filter_positions(conditions)
+            frame['rows'] = len(positions)
+        if len(positions) == len(profile.df):
+            return profile.df
+        return profile.df.take(positions)
+    
+    return get_dataset_cache().get(('filtered', profile.key, filter_state), load, label=f"🔎 {label} (đã lọc)")[0]
+
+
+# Chỉ báo kết quả lấy từ cache hồ sơ dữ liệu hay vừa được tính
+def show_cache_source(cached):
+    st.caption("⚡ Lấy từ cache hồ sơ dữ liệu" if cached else "🔄 Vừa tính toán")
+
+
+# Hàm tổng hợp dùng cho bảng tổng hợp theo nhóm và bảng pivot
+FUNC_MAP = {
+    "Tổng": "sum",
+    "Trung bình": "mean",
+    "Tối đa": "max",
+    "Tối thiểu": "min",
+    "Số lượng": "count"
+}
+
+# Các chỉ số lấy từ sketch khi bật thống kê xấp xỉ
+APPROX_FIELDS = ('Trung vị', 'Quartile 25%', 'Quartile 75%', 'Số giá trị duy nhất')
+
+
+# Ghi chú sai số khi thống kê được tính xấp xỉ
+def show_error_bounds(summary):
+    if summary.error_bounds:
+        st.caption(
+            f"≈ Thống kê xấp xỉ: phân vị (25%, trung vị, 75%) lệch không quá "
+            f"{summary.error_bounds['quantile']:.0%} so với giá trị đúng; số giá trị duy nhất sai số "
+            f"khoảng ±{3 * summary.error_bounds['distinct']:.1%} (độ tin cậy ~99%)"
+        )
+
+
+# Vẽ figure qua cache: build() chỉ chạy khi tổ hợp (phiên bản dữ liệu, tham số) chưa được dựng.
+# Bước mã hóa JSON trong st.plotly_chart vẫn chạy mỗi lần vẽ, kể cả với figure lấy từ cache.
+def show_figure(profile, params, build):
+    def build_figure():
+        with stage('figure_build'):
+            return build()
+    
+    key = (profile.key,) + tuple(params)
+    figure_cache = get_figure_cache()
+    if key in figure_cache or is_small(profile):
+        fig, _ = figure_cache.get_or_build(key, build_figure)
+    else:
+        result = run_in_background(('figure',) + key, lambda: figure_cache.get_or_build(key, build_figure), "Dựng biểu đồ")
+        if result is None:
+            return
+        fig, _ = result
+    # Mã hóa figure sang JSON và gửi cho trình duyệt
+    with stage('render_chart'):
+        st.plotly_chart(fig, width='stretch')
+
+
+# Khoảng dòng cần vẽ. Khi dữ liệu nhiều hơn số điểm tối đa, thanh trượt (nếu có key)
+# cho phép thu hẹp khoảng dòng: khoảng càng hẹp thì độ phân giải càng cao.
+def plot_range(n_rows, max_points, key):
+    if n_rows > max_points and key is not None:
+        return st.slider(
+            "Khoảng dòng hiển thị (thu hẹp để xem chi tiết hơn):",
+            0, n_rows, (0, n_rows),
+            key=key
+        )
+    return 0, n_rows
+
+
+# Rút gọn số điểm vẽ cho biểu đồ theo dòng trong khoảng [start, stop)
+def plot_rows(df, columns, max_points, method, start, stop):
+    with stage('downsample', rows=stop - start):
+        positions = downsample_positions(df, columns, max_points, method, start, stop)
+    if len(positions) < stop - start:
+        st.caption(f"📉 Hiển thị {len(positions):,} / {stop - start:,} điểm (đã rút gọn, giữ hình dạng đường)")
+    return df.iloc[positions]
+
+
+# Mã băm chỉ tính một lần cho mỗi file được tải lên, các lần rerun sau lấy lại từ session
+def get_file_hash(uploaded_file):
+    hashes = st.session_state.setdefault('file_hashes', {})
+    key = (uploaded_file.file_id, uploaded_file.name, uploaded_file.size)
+    if key not in hashes:
+        hashes[key] = file_digest(uploaded_file.getvalue())
+    return hashes[key]
+
+
+# Các phần của trang là fragment: tương tác trong một phần chỉ chạy lại phần đó,
+# không tính lại thống kê, biểu đồ hay các bảng khác.
+# Mỗi lần một phần chạy (cùng cả trang hoặc riêng) là một giai đoạn được đo theo tên hàm.
+# Phần trang kết thúc (xong, lỗi hay bị cắt ngang) mà không còn chờ tác vụ nền nào thì thả tác
+# vụ cũ của nó (bị hủy nếu không phiên nào khác chờ), vd. khi người dùng chuyển sang biểu đồ
+# khác trong lúc đang dựng.
+def section(func):
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        get_recorder().activate()
+        _active_section.name = func.__name__
+        _active_section.waiting = False
+        try:
+            with stage(func.__name__):
+                return func(*args, **kwargs)
+        finally:
+            if not _active_section.waiting:
+                get_job_pool().release(job_owner(func.__name__))
+            _active_section.name = None
+            _active_section.waiting = False
+    return st.fragment(run)
+
+
+# Phần trang đang chạy trong luồng script hiện tại và nó có đang chờ tác vụ nền hay không
+_active_section = threading.local()
+
+
+def job_owner(slot):
+    return (get_recorder().session, slot)
+
+
+def is_small(profile):
+    return profile.df.shape[0] * profile.df.shape[1] < BACKGROUND_MIN_CELLS
+
+
+# Chạy compute() trong pool nền thay cho phần trang đang chạy. Trả về kết quả nếu tác vụ
+# (cùng khóa đầu vào, có thể do phiên khác gửi) đã xong; nếu chưa thì hiện tiến độ và nút
+# hủy, trả về None, và trang tự chạy lại khi tác vụ xong để nhận kết quả.
+def run_in_background(job_key, compute, label):
+    slot = getattr(_active_section, 'name', None)
+    if slot is None:
+        return compute()
+    cancelled = st.session_state.setdefault('cancelled_jobs', set())
+    if job_key in cancelled:
+        st.info(f"⏹️ Đã hủy: {label}")
+        st.button("Tính lại", key=f"retry_{slot}", on_click=cancelled.discard, args=(job_key,))
+        return None
+    
+    pool = get_job_pool()
+    job = pool.submit(job_key, compute, owner=job_owner(slot), label=label)
+    if job.done():
+        # Tác vụ lỗi không được giữ lại: lần chạy sau sẽ thử lại
+        if job.future.exception() is not None:
+            pool.cancel(job_key)
+        return job.result()
+    _active_section.waiting = True
+    show_job_progress(job_key, slot)
+    return None
+
+
+# Kết quả của hồ sơ dữ liệu: tính ngay nếu đã có sẵn hoặc dữ liệu nhỏ, ngược lại chạy nền
+def profile_result(profile, result_key, compute, label):
+    if profile.cached(result_key) or is_small(profile):
+        return compute()
+    return run_in_background((profile.key, result_key), compute, label)
+
+
+# Tiến độ của tác vụ nền, tự kiểm tra lại theo chu kỳ; khi tác vụ xong thì chạy lại trang
+# (các phần khác lấy lại từ cache nên chỉ phần đang chờ thực sự thay đổi)
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job_key, slot):
+    pool = get_job_pool()
+    job = pool.get(job_key)
+    if job is None or job.done():
+        st.rerun()
+    st.progress(job.progress, text=f"⏳ {job.label}... {job.progress:.0%}")
+    if st.button("Hủy", key=f"cancel_{slot}"):
+        st.session_state.setdefault('cancelled_jobs', set()).add(job_key)
+        pool.release(job_owner(slot))
+        st.rerun()
+
+
+# Lựa chọn đặc biệt của ô sắp xếp / tìm kiếm trong bảng xem trước
+PREVIEW_ROW_ORDER = "(Thứ tự gốc)"
+PREVIEW_ALL_TEXT = "Mọi cột văn bản"
+
+
+# Bảng xem trước theo trang: chỉ các dòng của trang đang xem được gửi tới trình duyệt,
+# sắp xếp và tìm kiếm thực hiện ở server
+@section
+def render_preview(profile):
+    show_data = st.checkbox("Hiển thị dữ liệu chi tiết", value=False)
+    if not show_data:
+        return
+    
+    df = profile.df
+    text_columns = [col for col in df.columns if col not in profile.numeric_columns]
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        sort_col = st.selectbox("Sắp xếp theo:", [PREVIEW_ROW_ORDER] + list(df.columns), key="preview_sort")
+        descending = st.checkbox("Giảm dần", value=False, key="preview_desc")
+    with col2:
+        search_term = st.text_input("Tìm kiếm:", key="preview_search", placeholder="Nhập chuỗi cần tìm...")
+        search_col = st.selectbox("Tìm trong:", [PREVIEW_ALL_TEXT] + text_columns, key="preview_search_col")
+    with col3:
+        page_size = st.selectbox("Số dòng mỗi trang:", PAGE_SIZES, index=1, key="preview_page_size")
+    
+    view = preview_view(profile, sort_col, descending, search_col if text_columns else None, search_term.strip())
+    if view is None:
+        return
+    n_pages = max(1, -(-len(view) // page_size))
+    # Số trang đang chọn có thể vượt quá số trang mới khi đổi tìm kiếm / kích thước trang
+    st.session_state.setdefault('preview_page', 1)
+    if st.session_state['preview_page'] > n_pages:
+        st.session_state['preview_page'] = n_pages
+    page = st.number_input(f"Trang (1 - {n_pages:,}):", min_value=1, max_value=n_pages, step=1, key="preview_page")
+    
+    start = (page - 1) * page_size
+    with stage('render_table') as frame:
+        page_df = df.iloc[view.page(start, start + page_size)]
+        frame['rows'] = len(page_df)
+        st.dataframe(page_df, width='stretch', height=min(400, 38 + 35 * max(len(page_df), 1)))
+    if len(view) == 0:
+        st.caption(f"Không tìm thấy dòng nào chứa \"{search_term.strip()}\"")
+        return
+    found = f" · tìm thấy {len(view):,} / {len(df):,} dòng" if search_term.strip() else ""
+    st.caption(f"Dòng {start + 1:,} - {start + len(page_df):,} / {len(view):,}{found}")
+
+
+# Thứ tự xem của bảng xem trước (None khi thứ tự sắp xếp còn đang tính nền). Thứ tự sắp xếp
+# của từng cột được tính một lần trong hồ sơ dữ liệu; kết quả tìm kiếm (một lượt qua mã nhóm
+# của các cột) được giữ trong session cho các lần đổi trang.
+def preview_view(profile, sort_col, descending, search_col, term):
+    order = missing = None
+    if sort_col != PREVIEW_ROW_ORDER:
+        result = profile_result(
+            profile, ('sort_order', sort_col), lambda: profile.sort_order(sort_col), f"Sắp xếp theo {sort_col}"
+        )
+        if result is None:
+            return None
+        order, missing = result[0]
+    if not term or search_col is None:
+        return TableView(len(profile.df), order, missing, descending)
+    
+    key = (profile.key, sort_col, descending, search_col, term)
+    cached = st.session_state.get('preview_view')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    columns = [search_col] if search_col != PREVIEW_ALL_TEXT else [
+        col for col in profile.df.columns if col not in profile.numeric_columns
+    ]
+    with stage('search', rows=len(profile.df)):
+        rows = search_rows([profile.category_index(col)[0] for col in columns], term, len(profile.df))
+        view = TableView(len(profile.df), order, missing, descending, rows)
+    st.session_state['preview_view'] = (key, view)
+    return view
+
+
+# Thống kê mô tả; chỉ tab đang mở mới được tính và vẽ
+@section
+def render_statistics(profile, approx_mode):
+    numeric_columns = profile.numeric_columns
+    if len(numeric_columns) > 0:
+        st.subheader("🔢 Thống Kê Mô Tả Cho Các Cột Số")
         
-        # Phân tích thống kê tổng hợp
-        st.header("📊 Thống Kê Tổng Hợp")
+        # Tính tất cả chỉ số cho mọi cột số trong một lần, cả ba tab cùng dùng
+        result = profile_result(
+            profile, 'summary_approx' if approx_mode else 'summary',
+            lambda: profile.summary(approx_mode), "Thống kê mô tả"
+        )
+        if result is None:
+            return
+        summary, summary_cached = result
+        show_cache_source(summary_cached)
+        show_error_bounds(summary)
         
-        # Chọn các cột số để phân tích
-        numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
-        categorical_columns = df.select_dtypes(include=['object']).columns.tolist()
+        # Tạo tabs cho các loại thống kê
+        tab1, tab2, tab3 = st.tabs(["📈 Tổng Quan", "📋 Chi Tiết", "🔍 Phân Tích Từng Cột"], key="stats_tabs", on_change="rerun")
         
-        if len(numeric_columns) > 0:
-            st.subheader("🔢 Thống Kê Mô Tả Cho Các Cột Số")
-            
-            # Tạo tabs cho các loại thống kê
-            tab1, tab2, tab3 = st.tabs(["📈 Tổng Quan", "📋 Chi Tiết", "🔍 Phân Tích Từng Cột"])
+        with tab1:
+            if tab1.open:
+                st.dataframe(summary.describe(), width='stretch')
             
-            with tab1:
-                st.dataframe(df[numeric_columns].describe(), use_container_width=True)
-                
                 # Hiển thị các metric tổng hợp
                 st.markdown("### 💎 Các Chỉ Số Tổng Hợp")
                 cols = st.columns(min(len(numeric_columns), 4))
-                
+            
                 for idx, col in enumerate(numeric_columns):
                     with cols[idx % 4]:
-                        total = df[col].sum()
-                        mean = df[col].mean()
+                        total = summary.sum[idx]
+                        mean = summary.mean[idx]
                         st.metric(
                             label=f"Tổng {col}",
                             value=f"{total:,.2f}",
                             delta=f"Trung bình: {mean:,.2f}"
                         )
-            
-            with tab2:
+        
+        with tab2:
+            if tab2.open:
                 st.markdown("### 📊 Bảng Thống Kê Chi Tiết")
-                stats_data = []
-                
-                for col in numeric_columns:
-                    stats_data.append({
-                        'Cột': col,
-                        'Tổng': df[col].sum(),
-                        'Trung Bình': df[col].mean(),
-                        'Trung Vị': df[col].median(),
-                        'Độ Lệch Chuẩn': df[col].std(),
-                        'Min': df[col].min(),
-                        'Max': df[col].max(),
-                        'Số Giá Trị Thiếu': df[col].isna().sum(),
-                        'Số Giá Trị Khác 0': (df[col] != 0).sum()
-                    })
-                
-                stats_df = pd.DataFrame(stats_data)
+                stats_df = summary.table()
                 st.dataframe(stats_df.style.format({
                     'Tổng': '{:,.2f}',
                     'Trung Bình': '{:,.2f}',
@@ -129,136 +533,140 @@ if uploaded_file is not None:
                     'Độ Lệch Chuẩn': '{:,.2f}',
                     'Min': '{:,.2f}',
                     'Max': '{:,.2f}'
-                }), use_container_width=True)
-            
-            with tab3:
+                }), width='stretch')
+        
+        with tab3:
+            if tab3.open:
                 selected_numeric = st.selectbox(
                     "Chọn cột số để phân tích chi tiết:",
                     numeric_columns,
                     key="numeric_detail"
                 )
-                
+            
                 col1, col2 = st.columns(2)
                 with col1:
                     st.markdown(f"### 📊 Thống Kê: {selected_numeric}")
-                    detail_stats = {
-                        'Số lượng': len(df[selected_numeric]),
-                        'Tổng': df[selected_numeric].sum(),
-                        'Trung bình': df[selected_numeric].mean(),
-                        'Trung vị': df[selected_numeric].median(),
-                        'Độ lệch chuẩn': df[selected_numeric].std(),
-                        'Phương sai': df[selected_numeric].var(),
-                        'Giá trị nhỏ nhất': df[selected_numeric].min(),
-                        'Giá trị lớn nhất': df[selected_numeric].max(),
-                        'Quartile 25%': df[selected_numeric].quantile(0.25),
-                        'Quartile 75%': df[selected_numeric].quantile(0.75),
-                        'Số giá trị thiếu': df[selected_numeric].isna().sum(),
-                        'Số giá trị duy nhất': df[selected_numeric].nunique()
-                    }
-                    
+                    detail_stats = summary.column(selected_numeric)
+                
                     for key, value in detail_stats.items():
+                        approx = "≈ " if summary.error_bounds and key in APPROX_FIELDS else ""
                         if isinstance(value, (int, np.integer)):
-                            st.write(f"**{key}:** {value:,}")
+                            st.write(f"**{key}:** {approx}{value:,}")
                         else:
-                            st.write(f"**{key}:** {value:,.2f}")
-                
+                            st.write(f"**{key}:** {approx}{value:,.2f}")
+            
                 with col2:
                     st.markdown(f"### 📈 Phân Phối: {selected_numeric}")
-                    fig_hist = px.histogram(
-                        df,
-                        x=selected_numeric,
-                        nbins=30,
-                        title=f"Histogram của {selected_numeric}",
-                        color_discrete_sequence=px.colors.qualitative.Set3,
-                        labels={selected_numeric: selected_numeric, 'count': 'Tần số'}
-                    )
-                    fig_hist.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(size=12)
-                    )
-                    st.plotly_chart(fig_hist, use_container_width=True)
-        
-        st.markdown("---")
-        
-        # Phần biểu đồ trực quan
-        st.header("🎨 Biểu Đồ Trực Quan")
-        
-        # Chọn loại biểu đồ
-        chart_type = st.selectbox(
-            "Chọn loại biểu đồ:",
-            [
-                "Biểu đồ cột (Column Chart)",
-                "Biểu đồ đường (Line Chart)",
-                "Biểu đồ tròn (Pie Chart)",
-                "Biểu đồ phân tán (Scatter Plot)",
-                "Biểu đồ hộp (Box Plot)",
-                "Heatmap tương quan",
-                "Biểu đồ kết hợp (Combined)"
-            ]
+                    # Tần số được đếm ở server, trình duyệt chỉ nhận 30 cột của histogram
+                    def build():
+                        (edges, counts), _ = profile.histogram(selected_numeric, approx=approx_mode)
+                        fig = go.Figure(go.Bar(
+                            x=(edges[:-1] + edges[1:]) / 2,
+                            y=counts,
+                            width=np.diff(edges),
+                            marker_color=px.colors.qualitative.Set3[0],
+                            customdata=np.column_stack([edges[:-1], edges[1:]]),
+                            hovertemplate="%{customdata[0]:,.2f} - %{customdata[1]:,.2f}<br>Tần số: %{y:,}<extra></extra>"
+                        ))
+                        fig.update_layout(
+                            title=f"Histogram của {selected_numeric}",
+                            xaxis_title=selected_numeric,
+                            yaxis_title="Tần số",
+                            bargap=0
+                        )
+                        fig.update_layout(
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            font=dict(size=12)
+                        )
+                        return fig
+                    
+                    show_figure(profile, ('histogram', selected_numeric, approx_mode), build)
+
+
+@section
+def render_charts(df, profile, max_points, downsample_method, approx_mode):
+    numeric_columns = profile.numeric_columns
+    categorical_columns = profile.categorical_columns
+    # Chọn loại biểu đồ
+    chart_type = st.selectbox(
+        "Chọn loại biểu đồ:",
+        [
+            "Biểu đồ cột (Column Chart)",
+            "Biểu đồ đường (Line Chart)",
+            "Biểu đồ tròn (Pie Chart)",
+            "Biểu đồ phân tán (Scatter Plot)",
+            "Biểu đồ hộp (Box Plot)",
+            "Heatmap tương quan",
+            "Biểu đồ kết hợp (Combined)"
+        ]
+    )
+    
+    if chart_type == "Biểu đồ cột (Column Chart)" and len(numeric_columns) > 0:
+        selected_cols = st.multiselect(
+            "Chọn cột số để vẽ biểu đồ cột:",
+            numeric_columns,
+            default=numeric_columns[:min(3, len(numeric_columns))]
         )
         
-        if chart_type == "Biểu đồ cột (Column Chart)" and len(numeric_columns) > 0:
-            selected_cols = st.multiselect(
-                "Chọn cột số để vẽ biểu đồ cột:",
-                numeric_columns,
-                default=numeric_columns[:min(3, len(numeric_columns))]
-            )
+        if len(selected_cols) > 0:
+            group_by = "Không nhóm"
+            if len(categorical_columns) > 0:
+                group_by = st.selectbox(
+                    "Nhóm theo cột:",
+                    ["Không nhóm"] + categorical_columns
+                )
+            
+            if group_by != "Không nhóm":
+                result = profile_result(profile, ('groups', group_by), lambda: profile.groups(group_by), f"Tổng hợp theo {group_by}")
+                if result is None:
+                    return
+                show_cache_source(result[1])
             
-            if len(selected_cols) > 0:
-                if len(categorical_columns) > 0:
-                    group_by = st.selectbox(
-                        "Nhóm theo cột:",
-                        ["Không nhóm"] + categorical_columns
+            def build():
+                if group_by != "Không nhóm":
+                    df_grouped, _ = profile.group_agg(group_by, selected_cols, 'sum')
+                    fig = px.bar(
+                        df_grouped,
+                        x=group_by,
+                        y=selected_cols,
+                        title="Biểu đồ cột có nhóm",
+                        color_discrete_sequence=px.colors.qualitative.Vivid,
+                        barmode='group'
                     )
-                    
-                    if group_by != "Không nhóm":
-                        df_grouped = df.groupby(group_by)[selected_cols].sum().reset_index()
-                        fig = px.bar(
-                            df_grouped,
-                            x=group_by,
-                            y=selected_cols,
-                            title="Biểu đồ cột có nhóm",
-                            color_discrete_sequence=px.colors.qualitative.Vivid,
-                            barmode='group'
-                        )
-                    else:
-                        fig = px.bar(
-                            df[selected_cols].sum().reset_index(),
-                            x='index',
-                            y=0,
-                            title="Biểu đồ cột tổng hợp",
-                            labels={'index': 'Cột', 0: 'Giá trị'},
-                            color_discrete_sequence=px.colors.qualitative.Set3
-                        )
                 else:
                     fig = px.bar(
-                        df[selected_cols].sum().reset_index(),
+                        profile.summary(approx_mode)[0].totals(selected_cols).reset_index(),
                         x='index',
                         y=0,
                         title="Biểu đồ cột tổng hợp",
                         labels={'index': 'Cột', 0: 'Giá trị'},
-                        color_discrete_sequence=px.colors.qualitative.Pastel
+                        color_discrete_sequence=px.colors.qualitative.Set3 if categorical_columns else px.colors.qualitative.Pastel
                     )
-                
                 fig.update_layout(
                     plot_bgcolor='rgba(0,0,0,0)',
                     paper_bgcolor='rgba(0,0,0,0)',
                     font=dict(size=12),
                     height=500
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                return fig
+            
+            show_figure(profile, ('column', tuple(selected_cols), group_by), build)
+    
+    elif chart_type == "Biểu đồ đường (Line Chart)" and len(numeric_columns) > 0:
+        selected_cols = st.multiselect(
+            "Chọn cột số để vẽ biểu đồ đường:",
+            numeric_columns,
+            default=numeric_columns[:min(3, len(numeric_columns))]
+        )
         
-        elif chart_type == "Biểu đồ đường (Line Chart)" and len(numeric_columns) > 0:
-            selected_cols = st.multiselect(
-                "Chọn cột số để vẽ biểu đồ đường:",
-                numeric_columns,
-                default=numeric_columns[:min(3, len(numeric_columns))]
-            )
+        if len(selected_cols) > 0:
+            start, stop = plot_range(len(df), max_points, key="line_range")
+            plot_df = plot_rows(df, selected_cols, max_points, downsample_method, start, stop)
             
-            if len(selected_cols) > 0:
+            def build():
                 fig = px.line(
-                    df,
+                    plot_df,
                     y=selected_cols,
                     title="Biểu đồ đường",
                     color_discrete_sequence=px.colors.qualitative.Dark2,
@@ -272,23 +680,30 @@ if uploaded_file is not None:
                     xaxis_title="Chỉ số dòng",
                     yaxis_title="Giá trị"
                 )
-                st.plotly_chart(fig, use_container_width=True)
-        
-        elif chart_type == "Biểu đồ tròn (Pie Chart)":
-            if len(categorical_columns) > 0:
-                pie_column = st.selectbox(
-                    "Chọn cột phân loại:",
-                    categorical_columns
+                return fig
+            
+            show_figure(profile, ('line', tuple(selected_cols), max_points, downsample_method, start, stop), build)
+    
+    elif chart_type == "Biểu đồ tròn (Pie Chart)":
+        if len(categorical_columns) > 0:
+            pie_column = st.selectbox(
+                "Chọn cột phân loại:",
+                categorical_columns
+            )
+            
+            if len(numeric_columns) > 0:
+                value_column = st.selectbox(
+                    "Chọn cột giá trị:",
+                    numeric_columns
                 )
                 
-                if len(numeric_columns) > 0:
-                    value_column = st.selectbox(
-                        "Chọn cột giá trị:",
-                        numeric_columns
-                    )
-                    
-                    pie_data = df.groupby(pie_column)[value_column].sum().reset_index()
-                    
+                result = profile_result(profile, ('groups', pie_column), lambda: profile.groups(pie_column), f"Tổng hợp theo {pie_column}")
+                if result is None:
+                    return
+                show_cache_source(result[1])
+                
+                def build():
+                    pie_data, _ = profile.group_agg(pie_column, [value_column], 'sum')
                     fig = px.pie(
                         pie_data,
                         values=value_column,
@@ -301,8 +716,11 @@ if uploaded_file is not None:
                         font=dict(size=12),
                         height=500
                     )
-                    st.plotly_chart(fig, use_container_width=True)
-                else:
+                    return fig
+                
+                show_figure(profile, ('pie', pie_column, value_column), build)
+            else:
+                def build():
                     pie_counts = df[pie_column].value_counts()
                     fig = px.pie(
                         values=pie_counts.values,
@@ -312,122 +730,252 @@ if uploaded_file is not None:
                     )
                     fig.update_traces(textposition='inside', textinfo='percent+label')
                     fig.update_layout(font=dict(size=12), height=500)
-                    st.plotly_chart(fig, use_container_width=True)
+                    return fig
+                
+                show_figure(profile, ('pie_counts', pie_column), build)
+    
+    elif chart_type == "Biểu đồ phân tán (Scatter Plot)" and len(numeric_columns) >= 2:
+        x_col = st.selectbox("Chọn cột trục X:", numeric_columns)
+        y_col = st.selectbox("Chọn cột trục Y:", numeric_columns, index=1 if len(numeric_columns) > 1 else 0)
+        
+        color_col = "Không"
+        if len(categorical_columns) > 0:
+            color_col = st.selectbox(
+                "Tô màu theo:",
+                ["Không"] + categorical_columns
+            )
         
-        elif chart_type == "Biểu đồ phân tán (Scatter Plot)" and len(numeric_columns) >= 2:
-            x_col = st.selectbox("Chọn cột trục X:", numeric_columns)
-            y_col = st.selectbox("Chọn cột trục Y:", numeric_columns, index=1 if len(numeric_columns) > 1 else 0)
+        # Tự động: SVG cho dữ liệu nhỏ, WebGL cho dữ liệu vừa, lưới mật độ cho dữ liệu rất lớn
+        scatter_modes = {
+            "Tự động": scatter_mode(len(df)),
+            "SVG": 'svg',
+            "WebGL": 'webgl',
+            "Mật độ (gom lưới)": 'density'
+        }
+        render_mode = scatter_modes[st.selectbox(
+            "Chế độ vẽ:",
+            list(scatter_modes.keys()),
+            help=f"Tự động dùng WebGL khi trên {WEBGL_THRESHOLD:,} điểm và lưới mật độ khi trên {DENSITY_THRESHOLD:,} điểm"
+        )]
+        
+        bins = DEFAULT_BINS
+        if render_mode == 'density':
+            bins = st.slider("Số ô lưới mỗi trục:", 20, 300, DEFAULT_BINS, step=10)
+            st.caption(f"🔲 {len(df):,} điểm được gom thành lưới {bins}×{bins} ô")
+        
+        def build():
+            if render_mode == 'density':
+                x_values = df[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+                y_values = df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
             
-            if len(categorical_columns) > 0:
-                color_col = st.selectbox(
-                    "Tô màu theo:",
-                    ["Không"] + categorical_columns
-                )
-                
                 if color_col != "Không":
-                    fig = px.scatter(
-                        df,
-                        x=x_col,
-                        y=y_col,
-                        color=color_col,
-                        title=f"Biểu đồ phân tán: {x_col} vs {y_col}",
-                        color_discrete_sequence=px.colors.qualitative.Light24,
-                        size_max=15
-                    )
+                    (codes, labels), _ = profile.group_index(color_col)
+                    x_centers, y_centers, counts, group_labels = density_grid(x_values, y_values, bins, codes, labels)
+                
+                    # Mỗi nhóm là một trace gồm tâm các ô có điểm, kích thước theo số điểm trong ô
+                    fig = go.Figure()
+                    palette = px.colors.qualitative.Light24
+                    peak = max(int(counts.max()), 1)
+                    for k, label in enumerate(group_labels or []):
+                        bx, by = np.nonzero(counts[k])
+                        cell_counts = counts[k][bx, by]
+                        fig.add_trace(go.Scattergl(
+                            x=x_centers[bx],
+                            y=y_centers[by],
+                            mode='markers',
+                            name=str(label),
+                            marker=dict(
+                                size=3 + 17 * np.sqrt(cell_counts / peak),
+                                color=palette[k % len(palette)],
+                                opacity=0.7
+                            ),
+                            customdata=cell_counts,
+                            hovertemplate=f"{label}<br>{x_col}: %{{x:,.2f}}<br>{y_col}: %{{y:,.2f}}<br>Số điểm: %{{customdata:,}}<extra></extra>"
+                        ))
                 else:
-                    fig = px.scatter(
-                        df,
-                        x=x_col,
-                        y=y_col,
-                        title=f"Biểu đồ phân tán: {x_col} vs {y_col}",
-                        color_discrete_sequence=['#FF6B6B']
-                    )
+                    x_centers, y_centers, counts, _ = density_grid(x_values, y_values, bins)
+                    fig = go.Figure(go.Heatmap(
+                        x=x_centers,
+                        y=y_centers,
+                        z=np.where(counts.T > 0, counts.T, np.nan),
+                        colorscale='Viridis',
+                        colorbar=dict(title="Số điểm")
+                    ))
+            
+                fig.update_layout(
+                    title=f"Mật độ phân tán: {x_col} vs {y_col}",
+                    xaxis_title=x_col,
+                    yaxis_title=y_col
+                )
+            elif color_col != "Không":
+                fig = px.scatter(
+                    df,
+                    x=x_col,
+                    y=y_col,
+                    color=color_col,
+                    title=f"Biểu đồ phân tán: {x_col} vs {y_col}",
+                    color_discrete_sequence=px.colors.qualitative.Light24,
+                    size_max=15,
+                    render_mode=render_mode
+                )
             else:
                 fig = px.scatter(
                     df,
                     x=x_col,
                     y=y_col,
                     title=f"Biểu đồ phân tán: {x_col} vs {y_col}",
-                    color_discrete_sequence=['#FF6B6B']
+                    color_discrete_sequence=['#FF6B6B'],
+                    render_mode=render_mode
                 )
-            
+        
             fig.update_layout(
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)',
                 font=dict(size=12),
                 height=500
             )
-            st.plotly_chart(fig, use_container_width=True)
+            return fig
         
-        elif chart_type == "Biểu đồ hộp (Box Plot)" and len(numeric_columns) > 0:
-            selected_cols = st.multiselect(
-                "Chọn cột số để vẽ biểu đồ hộp:",
-                numeric_columns,
-                default=numeric_columns[:min(5, len(numeric_columns))]
-            )
-            
-            if len(selected_cols) > 0:
-                fig = px.box(
-                    df,
-                    y=selected_cols,
-                    title="Biểu đồ hộp",
-                    color_discrete_sequence=px.colors.qualitative.Bold
-                )
+        show_figure(profile, ('scatter', x_col, y_col, color_col, render_mode, bins), build)
+    
+    elif chart_type == "Biểu đồ hộp (Box Plot)" and len(numeric_columns) > 0:
+        selected_cols = st.multiselect(
+            "Chọn cột số để vẽ biểu đồ hộp:",
+            numeric_columns,
+            default=numeric_columns[:min(5, len(numeric_columns))]
+        )
+        
+        if len(selected_cols) > 0:
+            def build():
+                # Hộp vẽ từ tứ phân vị đã tính sẵn, chỉ gửi kèm một mẫu giới hạn các điểm ngoại lai
+                fig = go.Figure()
+                palette = px.colors.qualitative.Bold
+                for idx, col in enumerate(selected_cols):
+                    box, _ = profile.box(col, approx_mode)
+                    color = palette[idx % len(palette)]
+                    fig.add_trace(go.Box(
+                        x=[col],
+                        q1=[box['q1']],
+                        median=[box['median']],
+                        q3=[box['q3']],
+                        lowerfence=[box['lowerfence']],
+                        upperfence=[box['upperfence']],
+                        mean=[box['mean']],
+                        name=col,
+                        marker_color=color
+                    ))
+                    if len(box['outliers']) > 0:
+                        fig.add_trace(go.Scatter(
+                            x=[col] * len(box['outliers']),
+                            y=box['outliers'],
+                            mode='markers',
+                            name=f"{col} - ngoại lai ({box['n_outliers']:,})",
+                            marker=dict(color=color, size=5, opacity=0.6),
+                            showlegend=False
+                        ))
+                fig.update_layout(title="Biểu đồ hộp", yaxis_title="Giá trị")
                 fig.update_layout(
                     plot_bgcolor='rgba(0,0,0,0)',
                     paper_bgcolor='rgba(0,0,0,0)',
                     font=dict(size=12),
                     height=500
                 )
-                st.plotly_chart(fig, use_container_width=True)
-        
-        elif chart_type == "Heatmap tương quan" and len(numeric_columns) > 1:
-            corr_matrix = df[numeric_columns].corr()
-            
-            fig = px.imshow(
-                corr_matrix,
-                text_auto=True,
-                aspect="auto",
-                title="Ma trận tương quan",
-                color_continuous_scale=px.colors.sequential.RdBu_r,
-                labels=dict(color="Tương quan")
+                return fig
+            
+            show_figure(profile, ('box', tuple(selected_cols), approx_mode), build)
+    
+    elif chart_type == "Heatmap tương quan" and len(numeric_columns) > 1:
+        result = profile_result(profile, 'correlation', profile.correlation, "Ma trận tương quan")
+        if result is None:
+            return
+        corr_matrix, corr_cached = result
+        show_cache_source(corr_cached)
+        
+        hcol1, hcol2, hcol3 = st.columns(3)
+        with hcol1:
+            corr_threshold = st.slider(
+                "Chỉ hiện tương quan có |r| ≥",
+                0.0, 1.0, 0.0, step=0.05,
+                help="Ẩn các ô yếu hơn ngưỡng và các cột không có tương quan nào đạt ngưỡng"
             )
-            fig.update_layout(
-                font=dict(size=12),
-                height=600,
-                width=800
+        with hcol2:
+            top_k = st.number_input("Số cặp mạnh nhất:", min_value=1, max_value=500, value=20, step=5)
+        with hcol3:
+            cluster_columns = st.checkbox(
+                "Sắp xếp theo cụm",
+                value=len(numeric_columns) > MAX_ANNOTATED_COLUMNS,
+                help="Đưa các cột tương quan mạnh với nhau lại gần nhau"
             )
-            st.plotly_chart(fig, use_container_width=True)
+        
+        heatmap_matrix = corr_matrix
+        if cluster_columns:
+            order, _ = profile.get('correlation_order', lambda: cluster_order(corr_matrix))
+            heatmap_matrix = heatmap_matrix.loc[order, order]
+        heatmap_matrix = filter_matrix(heatmap_matrix, corr_threshold)
+        
+        if heatmap_matrix.shape[0] == 0:
+            st.info("Không có cặp cột nào đạt ngưỡng tương quan đã chọn.")
+        else:
+            def build():
+                fig = px.imshow(
+                    heatmap_matrix,
+                    text_auto='.2f' if len(heatmap_matrix) <= MAX_ANNOTATED_COLUMNS else False,
+                    aspect="auto",
+                    title="Ma trận tương quan",
+                    color_continuous_scale=px.colors.sequential.RdBu_r,
+                    range_color=[-1, 1],
+                    labels=dict(color="Tương quan")
+                )
+                fig.update_layout(
+                    font=dict(size=12),
+                    height=600,
+                    width=800
+                )
+                return fig
             
-            # Hiển thị bảng tương quan
-            st.markdown("### 📊 Bảng Tương Quan Chi Tiết")
-            st.dataframe(corr_matrix.style.background_gradient(cmap='RdBu_r', vmin=-1, vmax=1).format("{:.2f}"), use_container_width=True)
+            show_figure(profile, ('heatmap', corr_threshold, cluster_columns), build)
         
-        elif chart_type == "Biểu đồ kết hợp (Combined)" and len(numeric_columns) >= 2:
-            selected_cols = st.multiselect(
-                "Chọn 2 cột để vẽ biểu đồ kết hợp:",
-                numeric_columns,
-                default=numeric_columns[:2] if len(numeric_columns) >= 2 else numeric_columns
-            )
+        # Các cặp tương quan mạnh nhất
+        st.markdown("### 🔗 Các Cặp Tương Quan Mạnh Nhất")
+        pairs = top_pairs(corr_matrix, int(top_k), corr_threshold)
+        st.dataframe(pairs.style.format({'Tương quan': "{:.3f}"}), width='stretch', hide_index=True)
+        
+        # Hiển thị bảng tương quan (chỉ tô màu khi bảng đủ nhỏ)
+        st.markdown("### 📊 Bảng Tương Quan Chi Tiết")
+        if len(heatmap_matrix) <= MAX_STYLED_COLUMNS:
+            st.dataframe(heatmap_matrix.style.background_gradient(cmap='RdBu_r', vmin=-1, vmax=1).format("{:.2f}"), width='stretch')
+        else:
+            st.dataframe(heatmap_matrix.round(2), width='stretch')
+    
+    elif chart_type == "Biểu đồ kết hợp (Combined)" and len(numeric_columns) >= 2:
+        selected_cols = st.multiselect(
+            "Chọn 2 cột để vẽ biểu đồ kết hợp:",
+            numeric_columns,
+            default=numeric_columns[:2] if len(numeric_columns) >= 2 else numeric_columns
+        )
+        
+        if len(selected_cols) >= 2:
+            start, stop = plot_range(len(df), max_points, key="combined_range")
+            plot_df = plot_rows(df, selected_cols[:2], max_points, downsample_method, start, stop)
             
-            if len(selected_cols) >= 2:
+            def build():
                 fig = make_subplots(specs=[[{"secondary_y": True}]])
-                
+            
                 fig.add_trace(
                     go.Bar(
-                        x=df.index,
-                        y=df[selected_cols[0]],
+                        x=plot_df.index,
+                        y=plot_df[selected_cols[0]],
                         name=selected_cols[0],
                         marker_color='#FF6B6B',
                         opacity=0.7
                     ),
                     secondary_y=False,
                 )
-                
+            
                 fig.add_trace(
                     go.Scatter(
-                        x=df.index,
-                        y=df[selected_cols[1]],
+                        x=plot_df.index,
+                        y=plot_df[selected_cols[1]],
                         name=selected_cols[1],
                         mode='lines+markers',
                         line=dict(color='#4ECDC4', width=3),
@@ -435,11 +983,11 @@ if uploaded_file is not None:
                     ),
                     secondary_y=True,
                 )
-                
+            
                 fig.update_xaxes(title_text="Chỉ số dòng")
                 fig.update_yaxes(title_text=selected_cols[0], secondary_y=False)
                 fig.update_yaxes(title_text=selected_cols[1], secondary_y=True)
-                
+            
                 fig.update_layout(
                     title_text=f"Biểu đồ kết hợp: {selected_cols[0]} & {selected_cols[1]}",
                     plot_bgcolor='rgba(0,0,0,0)',
@@ -448,146 +996,744 @@ if uploaded_file is not None:
                     height=500,
                     showlegend=True
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                return fig
+            
+            show_figure(profile, ('combined', tuple(selected_cols[:2]), max_points, downsample_method, start, stop), build)
+
+
+@section
+def render_group_panel(profile):
+    numeric_columns = profile.numeric_columns
+    categorical_columns = profile.categorical_columns
+    st.markdown("### 📊 Tổng hợp theo nhóm")
+    if len(categorical_columns) > 0 and len(numeric_columns) > 0:
+        group_col = st.selectbox(
+            "Nhóm theo:",
+            categorical_columns,
+            key="group_agg"
+        )
+        agg_col = st.selectbox(
+            "Tính toán trên:",
+            numeric_columns,
+            key="agg_col"
+        )
         
-        st.markdown("---")
+        agg_func = st.selectbox(
+            "Hàm tổng hợp:",
+            list(FUNC_MAP.keys()),
+            key="agg_func"
+        )
         
-        # Tính toán tổng hợp nâng cao
-        st.header("🧮 Tính Toán Tổng Hợp Nâng Cao")
+        # Kết quả giữ nguyên sau khi bấm cho đến khi đổi lựa chọn, kể cả khi phải chờ tính nền
+        request = (profile.key, group_col, agg_col, agg_func)
+        if st.button("Tính toán", key="calc_agg"):
+            st.session_state['calc_agg_request'] = request
+        if st.session_state.get('calc_agg_request') == request:
+            result = profile_result(profile, ('groups', group_col), lambda: profile.groups(group_col), f"Tổng hợp theo {group_col}")
+            if result is None:
+                return
+            show_cache_source(result[1])
+            grouped = result[0].frame(FUNC_MAP[agg_func], [agg_col]).copy()
+            grouped.columns = [group_col, f"{agg_func} của {agg_col}"]
+            
+            st.dataframe(grouped, width='stretch')
+            
+            # Vẽ biểu đồ
+            def build():
+                fig = px.bar(
+                    grouped,
+                    x=group_col,
+                    y=f"{agg_func} của {agg_col}",
+                    title=f"{agg_func} của {agg_col} theo {group_col}",
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                fig.update_layout(
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    font=dict(size=12),
+                    height=400
+                )
+                return fig
+            
+            show_figure(profile, ('group', group_col, agg_col, agg_func), build)
+
+
+@section
+def render_trend_panel(df, profile, max_points, downsample_method):
+    numeric_columns = profile.numeric_columns
+    st.markdown("### 📈 Phân tích xu hướng")
+    if len(numeric_columns) > 0:
+        trend_col = st.selectbox(
+            "Cột để phân tích:",
+            numeric_columns,
+            key="trend_col"
+        )
         
-        col1, col2, col3 = st.columns(3)
+        time_columns, _ = profile.time_columns()
+        if not time_columns:
+            st.caption("ℹ️ Không tìm thấy cột ngày / tháng: xu hướng được tính theo thứ tự dòng")
+            render_row_trend(df, profile, trend_col, max_points, downsample_method)
+            return
         
-        with col1:
-            st.markdown("### 📊 Tổng hợp theo nhóm")
-            if len(categorical_columns) > 0 and len(numeric_columns) > 0:
-                group_col = st.selectbox(
-                    "Nhóm theo:",
+        time_col = st.selectbox(
+            "Cột thời gian:",
+            list(time_columns),
+            key="trend_time_col"
+        )
+        if time_columns[time_col] == 'period':
+            freq_label = "Tháng"
+            st.caption(f"📅 {time_col} là cột kỳ tháng, dữ liệu được gộp theo từng tháng")
+        else:
+            freq_label = st.selectbox(
+                "Gộp theo:",
+                list(FREQUENCIES.keys()),
+                index=list(FREQUENCIES.keys()).index("Tháng"),
+                key="trend_freq"
+            )
+        freq = FREQUENCIES[freq_label]
+        trend_func = st.selectbox(
+            "Giá trị mỗi kỳ:",
+            list(FUNC_MAP.keys()),
+            key="trend_func"
+        )
+        window = st.number_input(
+            "Cửa sổ trung bình trượt (số kỳ):",
+            min_value=2,
+            max_value=60,
+            value=3,
+            step=1,
+            key="trend_window"
+        )
+        
+        # Kết quả giữ nguyên sau khi bấm cho đến khi đổi lựa chọn, kể cả khi phải chờ tính nền
+        request = (profile.key, trend_col, time_col, freq, trend_func, window)
+        if st.button("Phân tích", key="calc_trend"):
+            st.session_state['calc_trend_request'] = request
+        if st.session_state.get('calc_trend_request') != request:
+            return
+        
+        try:
+            result = profile_result(
+                profile, ('time_aggregates', time_col, freq),
+                lambda: profile.time_aggregates(time_col, freq), f"Tổng hợp theo {freq_label.lower()}"
+            )
+        except ValueError as e:
+            st.warning(f"⚠️ {time_col}: {e}")
+            return
+        if result is None:
+            return
+        aggregates, trend_cached = result
+        show_cache_source(trend_cached)
+        
+        if len(aggregates.labels) == 0:
+            st.warning(f"⚠️ {time_col} không có giá trị thời gian hợp lệ")
+            return
+        with stage('trend', rows=len(aggregates.labels)):
+            series = bucket_series(aggregates, trend_col, FUNC_MAP[trend_func])
+            trend = trend_frame(series, window)
+            stats = trend_table(trend, ['Giá trị']).loc['Giá trị']
+        
+        st.write(f"**Thống kê xu hướng ({len(trend):,} kỳ, {trend_func.lower()} của {trend_col} theo {freq_label.lower()}):**")
+        st.write(f"- Thay đổi trung bình mỗi kỳ: {stats['Thay đổi trung bình']:,.2f}")
+        st.write(f"- Tăng nhiều nhất: {stats['Tăng nhiều nhất']:,.2f}")
+        st.write(f"- Giảm nhiều nhất: {stats['Giảm nhiều nhất']:,.2f}")
+        last_change = trend['Thay đổi %'].iloc[-1]
+        if np.isfinite(last_change):
+            st.write(f"- Kỳ gần nhất so với kỳ trước: {last_change:+,.2f}%")
+        
+        # Biểu đồ xu hướng: giá trị theo kỳ cùng hai đường trung bình trượt, bên dưới là % thay đổi
+        def build():
+            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.08)
+            fig.add_trace(go.Scatter(
+                x=trend.index,
+                y=trend['Giá trị'],
+                mode='lines+markers',
+                name=trend_col,
+                line=dict(color='#FF6B6B', width=2),
+                marker=dict(size=4)
+            ), row=1, col=1)
+            fig.add_trace(go.Scatter(
+                x=trend.index,
+                y=trend[f"TB trượt {window} kỳ"],
+                mode='lines',
+                name=f"TB trượt {window} kỳ",
+                line=dict(color='#4ECDC4', width=2)
+            ), row=1, col=1)
+            fig.add_trace(go.Scatter(
+                x=trend.index,
+                y=trend['TB hàm mũ'],
+                mode='lines',
+                name="TB hàm mũ",
+                line=dict(color='#556270', width=2, dash='dash')
+            ), row=1, col=1)
+            fig.add_trace(go.Bar(
+                x=trend.index,
+                y=trend['Thay đổi %'],
+                name="Thay đổi % so với kỳ trước",
+                marker_color=np.where(trend['Thay đổi %'] < 0, '#FF6B6B', '#4ECDC4')
+            ), row=2, col=1)
+            fig.update_layout(
+                title=f"Xu hướng của {trend_col} theo {freq_label.lower()}",
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(size=12),
+                height=550
+            )
+            return fig
+        
+        show_figure(profile, ('trend', trend_col, time_col, freq, trend_func, window), build)
+        
+        with st.expander("📋 Bảng theo kỳ"):
+            st.dataframe(trend.rename_axis(time_col).reset_index(), width='stretch', hide_index=True)
+
+
+# Xu hướng theo thứ tự dòng khi dữ liệu không có cột thời gian
+def render_row_trend(df, profile, trend_col, max_points, downsample_method):
+    if st.button("Phân tích", key="calc_trend"):
+        st.write("**Thống kê xu hướng:**")
+        
+        with stage('trend', rows=len(df)):
+            trend = trend_table(df, [trend_col]).loc[trend_col]
+        st.write(f"- Thay đổi trung bình: {trend['Thay đổi trung bình']:,.2f}")
+        st.write(f"- Tăng nhiều nhất: {trend['Tăng nhiều nhất']:,.2f}")
+        st.write(f"- Giảm nhiều nhất: {trend['Giảm nhiều nhất']:,.2f}")
+        
+        # Biểu đồ xu hướng
+        plot_df = plot_rows(df, [trend_col], max_points, downsample_method, 0, len(df))
+        
+        def build():
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=plot_df.index,
+                y=plot_df[trend_col],
+                mode='lines+markers',
+                name=trend_col,
+                line=dict(color='#FF6B6B', width=2),
+                marker=dict(size=4)
+            ))
+            fig.update_layout(
+                title=f"Xu hướng của {trend_col}",
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(size=12),
+                height=400
+            )
+            return fig
+        
+        show_figure(profile, ('trend', trend_col, max_points, downsample_method), build)
+
+
+@section
+def render_compare_panel(profile, approx_mode):
+    numeric_columns = profile.numeric_columns
+    st.markdown("### 🔢 Thống kê so sánh")
+    if len(numeric_columns) >= 2:
+        compare_col1 = st.selectbox(
+            "Cột 1:",
+            numeric_columns,
+            key="compare1"
+        )
+        compare_col2 = st.selectbox(
+            "Cột 2:",
+            numeric_columns,
+            key="compare2"
+        )
+        
+        request = (profile.key, compare_col1, compare_col2, approx_mode)
+        if st.button("So sánh", key="calc_compare"):
+            st.session_state['calc_compare_request'] = request
+        if st.session_state.get('calc_compare_request') == request:
+            result = profile_result(
+                profile, 'summary_approx' if approx_mode else 'summary',
+                lambda: profile.summary(approx_mode), "Thống kê mô tả"
+            )
+            if result is None:
+                return
+            summary, compare_cached = result
+            show_cache_source(compare_cached)
+            stats1 = summary.column(compare_col1)
+            stats2 = summary.column(compare_col2)
+            col1_mean = stats1['Trung bình']
+            col2_mean = stats2['Trung bình']
+            col1_sum = stats1['Tổng']
+            col2_sum = stats2['Tổng']
+            
+            st.write(f"**{compare_col1}:**")
+            st.write(f"- Trung bình: {col1_mean:,.2f}")
+            st.write(f"- Tổng: {col1_sum:,.2f}")
+            
+            st.write(f"**{compare_col2}:**")
+            st.write(f"- Trung bình: {col2_mean:,.2f}")
+            st.write(f"- Tổng: {col2_sum:,.2f}")
+            
+            st.write(f"**Tỷ lệ:** {np.divide(col1_mean, col2_mean):.2f}")
+            
+            # Biểu đồ so sánh
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=[compare_col1, compare_col2],
+                y=[col1_sum, col2_sum],
+                marker_color=['#FF6B6B', '#4ECDC4'],
+                text=[f"{col1_sum:,.0f}", f"{col2_sum:,.0f}"],
+                textposition='auto'
+            ))
+            fig.update_layout(
+                title="So sánh tổng giá trị",
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(size=12),
+                height=400
+            )
+            st.plotly_chart(fig, width='stretch')
+
+
+# Bảng pivot đa chiều: tổng hợp trước trên tích các cột phân loại, sau đó mọi cách
+# nhóm con / drill-down / pivot chỉ cuộn lên từ khối chứ không quét lại dữ liệu.
+# Khối chỉ được dựng khi mở expander.
+@section
+def render_pivot(df, profile):
+    numeric_columns = profile.numeric_columns
+    categorical_columns = profile.categorical_columns
+    if len(categorical_columns) > 0 and len(numeric_columns) > 0:
+        st.markdown("---")
+        pivot_expander = st.expander("🧊 Bảng Pivot Đa Chiều", key="pivot_expander", on_change="rerun")
+        with pivot_expander:
+            if pivot_expander.open:
+                # Mặc định chọn các cột có ít nhóm nhất để khối nhỏ gọn
+                by_cardinality = sorted(categorical_columns, key=lambda c: len(profile.group_index(c)[0][1]))
+                cube_dims = st.multiselect(
+                    "Các chiều của khối tổng hợp:",
                     categorical_columns,
-                    key="group_agg"
+                    default=by_cardinality[:min(3, len(by_cardinality))],
+                    key="cube_dims"
                 )
-                agg_col = st.selectbox(
-                    "Tính toán trên:",
-                    numeric_columns,
-                    key="agg_col"
-                )
-                
-                agg_func = st.selectbox(
-                    "Hàm tổng hợp:",
-                    ["Tổng", "Trung bình", "Tối đa", "Tối thiểu", "Số lượng"],
-                    key="agg_func"
-                )
-                
-                func_map = {
-                    "Tổng": "sum",
-                    "Trung bình": "mean",
-                    "Tối đa": "max",
-                    "Tối thiểu": "min",
-                    "Số lượng": "count"
-                }
-                
-                if st.button("Tính toán", key="calc_agg"):
-                    grouped = df.groupby(group_col)[agg_col].agg(func_map[agg_func]).reset_index()
-                    grouped.columns = [group_col, f"{agg_func} của {agg_col}"]
+        
+                if len(cube_dims) > 0:
+                    result = profile_result(profile, ('cube', tuple(cube_dims)), lambda: profile.cube(cube_dims), "Khối tổng hợp")
+                    if result is None:
+                        return
+                    cube, cube_cached = result
+                    if cube is None:
+                        st.warning("⚠️ Số tổ hợp của các chiều đã chọn vượt ngân sách bộ nhớ, kết quả sẽ được tính trực tiếp trên dữ liệu (chậm hơn).")
+                    else:
+                        show_cache_source(cube_cached)
+                        st.caption(f"🧊 Khối có {cube.n_cells:,} ô, dùng {cube.nbytes / 1024 / 1024:,.2f} MB")
+            
+                    pcol1, pcol2, pcol3, pcol4 = st.columns(4)
+                    with pcol1:
+                        row_dim = st.selectbox("Hàng:", cube_dims, key="pivot_row")
+                    with pcol2:
+                        col_dim = st.selectbox(
+                            "Cột:",
+                            ["Không"] + [d for d in cube_dims if d != row_dim],
+                            key="pivot_col"
+                        )
+                    with pcol3:
+                        pivot_value = st.selectbox("Giá trị:", numeric_columns, key="pivot_value")
+                    with pcol4:
+                        pivot_func = st.selectbox("Hàm tổng hợp:", list(FUNC_MAP.keys()), key="pivot_func")
+            
+                    # Drill-down theo các chiều còn lại
+                    where = {}
+                    drill_dims = [d for d in cube_dims if d not in (row_dim, col_dim)]
+                    if drill_dims:
+                        drill_cols = st.columns(len(drill_dims))
+                        for drill_col, dim in zip(drill_cols, drill_dims):
+                            with drill_col:
+                                (_, dim_labels), _ = profile.group_index(dim)
+                                choice = st.selectbox(f"Lọc {dim}:", ["Tất cả"] + list(dim_labels), key=f"pivot_where_{dim}")
+                                if choice != "Tất cả":
+                                    where[dim] = choice
+            
+                    group_dims = [row_dim] if col_dim == "Không" else [row_dim, col_dim]
+                    if cube is not None:
+                        with stage('cube_rollup', rows=cube.n_cells):
+                            pivot_long = cube.rollup(group_dims, [pivot_value], FUNC_MAP[pivot_func], where)
+                    else:
+                        with stage('direct_rollup', rows=len(df)):
+                            pivot_long = direct_rollup(df, group_dims, [pivot_value], FUNC_MAP[pivot_func], where)
+            
+                    if col_dim == "Không":
+                        st.dataframe(pivot_long, width='stretch', hide_index=True)
+                    else:
+                        st.dataframe(
+                            pivot_long.pivot(index=row_dim, columns=col_dim, values=pivot_value),
+                            width='stretch'
+                        )
+            
+                    # Cột chồng chỉ có ý nghĩa với hàm cộng dồn được (tổng, số lượng)
+                    stackable = FUNC_MAP[pivot_func] in ('sum', 'count')
                     
-                    st.dataframe(grouped, use_container_width=True)
+                    def build():
+                        fig = px.bar(
+                            pivot_long,
+                            x=row_dim,
+                            y=pivot_value,
+                            color=None if col_dim == "Không" else col_dim,
+                            barmode='stack' if stackable else 'group',
+                            title=f"{pivot_func} của {pivot_value} theo {' và '.join(group_dims)}",
+                            color_discrete_sequence=px.colors.qualitative.Vivid
+                        )
+                        fig.update_layout(
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            font=dict(size=12),
+                            height=450
+                        )
+                        return fig
                     
-                    # Vẽ biểu đồ
-                    fig = px.bar(
-                        grouped,
-                        x=group_col,
-                        y=f"{agg_func} của {agg_col}",
-                        title=f"{agg_func} của {agg_col} theo {group_col}",
-                        color_discrete_sequence=px.colors.qualitative.Set3
-                    )
-                    fig.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(size=12),
-                        height=400
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    show_figure(profile, ('pivot', row_dim, col_dim, pivot_value, pivot_func, tuple(where.items())), build)
+
+
+# Bảng hiệu năng: các giai đoạn của lượt chạy hiện tại, tổng hợp của mọi phiên và xuất metrics
+def show_perf_panel(recorder):
+    records = recorder.last_run()
+    if records:
+        total = sum(r['seconds'] for r in records if r['depth'] == 0)
+        st.write(f"**Lượt chạy #{recorder.run}:** {total * 1000:,.1f} ms đo được trong {len(records)} giai đoạn")
+        st.dataframe(pd.DataFrame([{
+            'Giai đoạn': "· " * r['depth'] + r['stage'],
+            'ms': round(r['seconds'] * 1000, 1),
+            'Số dòng': r['rows'],
+            'Bộ nhớ đỉnh (MB)': None if r['peak_bytes'] is None else round(r['peak_bytes'] / 1024 / 1024, 2)
+        } for r in records]), width='stretch', hide_index=True)
+    else:
+        st.caption("Lượt chạy này không có giai đoạn nào cần tính toán")
+    
+    registry = recorder.registry
+    stages = registry.snapshot()
+    if stages:
+        st.markdown("**Tổng hợp mọi phiên:**")
+        st.dataframe(pd.DataFrame([{
+            'Giai đoạn': name,
+            'Số lần': stats['count'],
+            'TB (ms)': round(stats['seconds'] / stats['count'] * 1000, 1),
+            'Tổng (s)': round(stats['seconds'], 2)
+        } for name, stats in sorted(stages.items(), key=lambda item: -item[1]['seconds'])]), width='stretch', hide_index=True)
+    
+    st.download_button(
+        "Tải metrics (Prometheus)",
+        registry.prometheus_text(),
+        file_name="metrics.prom",
+        mime="text/plain",
+        on_click="ignore"
+    )
+    st.download_button(
+        "Tải log giai đoạn (JSON)",
+        "\n".join(json.dumps(r, ensure_ascii=False) for r in recorder.history),
+        file_name="stages.jsonl",
+        mime="application/json",
+        on_click="ignore"
+    )
+    if registry.output_dir:
+        st.caption(f"📝 Đang ghi metrics vào thư mục `{registry.output_dir}`")
+
+
+# Sidebar - Upload file
+st.sidebar.header("📁 Tải Lên File Excel")
+uploaded_files = st.sidebar.file_uploader(
+    "Chọn file Excel để phân tích",
+    type=['xlsx', 'xls'],
+    accept_multiple_files=True,
+    help="Hỗ trợ định dạng .xlsx và .xls; có thể chọn nhiều file để phân tích gộp"
+)
+
+# Quản lý kho cache trên đĩa
+with st.sidebar.expander("🗄️ Cache dữ liệu trên đĩa"):
+    disk_store = get_disk_store()
+    cache_entries = disk_store.entries()
+    total_mb = sum(e['bytes'] for e in cache_entries) / 1024 / 1024
+    st.write(f"**Dung lượng:** {total_mb:,.2f} MB / {disk_store.max_bytes / 1024 / 1024:,.0f} MB")
+    if cache_entries:
+        st.dataframe(pd.DataFrame([{
+            'File': e['file_name'],
+            'Sheet': e['sheets'],
+            'MB': round(e['bytes'] / 1024 / 1024, 2),
+            'Truy cập': pd.to_datetime(e['last_access'], unit='s').strftime('%Y-%m-%d %H:%M')
+        } for e in cache_entries]), width='stretch', hide_index=True)
+        if st.button("Xóa cache", key="purge_disk_cache"):
+            disk_store.purge()
+            st.rerun()
+
+# Dữ liệu đang nằm trong bộ nhớ, dùng chung cho mọi phiên
+with st.sidebar.expander("🧠 Dữ liệu dùng chung trong bộ nhớ"):
+    dataset_cache = get_dataset_cache()
+    resident = dataset_cache.entries()
+    st.write(f"**Dung lượng:** {dataset_cache.total_bytes / 1024 / 1024:,.2f} MB / {dataset_cache.max_bytes / 1024 / 1024:,.0f} MB")
+    if dataset_cache.ttl > 0:
+        st.caption(f"Dữ liệu không được dùng trong {dataset_cache.ttl / 60:,.0f} phút sẽ được giải phóng")
+    if resident:
+        st.dataframe(pd.DataFrame([{
+            'Dữ liệu': e['label'],
+            'MB': round(e['bytes'] / 1024 / 1024, 2),
+            'Lượt dùng lại': e['hits'],
+            'Truy cập': pd.to_datetime(e['last_access'], unit='s').strftime('%Y-%m-%d %H:%M')
+        } for e in resident]), width='stretch', hide_index=True)
+        if st.button("Giải phóng bộ nhớ", key="purge_dataset_cache"):
+            dataset_cache.clear()
+            st.rerun()
+
+# Thống kê và dọn cache figure
+with st.sidebar.expander("🖼️ Cache biểu đồ"):
+    figure_cache = get_figure_cache()
+    st.write(f"**Dung lượng:** {figure_cache.total_bytes / 1024 / 1024:,.2f} MB / {figure_cache.max_bytes / 1024 / 1024:,.0f} MB")
+    st.write(f"**Số biểu đồ:** {len(figure_cache):,} · **Lấy từ cache:** {figure_cache.hits:,} / {figure_cache.hits + figure_cache.misses:,} lần vẽ")
+    if st.button("Xóa cache biểu đồ", key="purge_figure_cache"):
+        figure_cache.clear()
+        st.rerun()
+
+# Đo hiệu năng từng giai đoạn; bảng kết quả được điền ở cuối lượt chạy
+perf_panel = st.sidebar.expander("⏱️ Hiệu năng (debug)")
+with perf_panel:
+    trace_memory = st.checkbox(
+        "Đo bộ nhớ đỉnh (chậm hơn)",
+        value=False,
+        key="perf_trace_memory",
+        help="Theo dõi cấp phát bộ nhớ bằng tracemalloc để ghi bộ nhớ đỉnh của từng giai đoạn"
+    )
+recorder = get_recorder()
+recorder.begin_run(trace_memory)
+
+if uploaded_files:
+    try:
+        uploaded_file = uploaded_files[0]
+        file_hash = get_file_hash(uploaded_file)
         
-        with col2:
-            st.markdown("### 📈 Phân tích xu hướng")
-            if len(numeric_columns) > 0:
-                trend_col = st.selectbox(
-                    "Cột để phân tích:",
-                    numeric_columns,
-                    key="trend_col"
+        # Chế độ đọc theo luồng cho một file .xlsx rất lớn: không giữ toàn bộ cây ô của openpyxl trong bộ nhớ
+        stream_mode = False
+        if len(uploaded_files) == 1 and uploaded_file.name.lower().endswith('.xlsx'):
+            stream_mode = st.sidebar.checkbox(
+                "🚰 Đọc theo luồng (file rất lớn)",
+                value=False,
+                help="Đọc từng khối dòng, chỉ nạp các cột và khoảng dòng được chọn để tiết kiệm bộ nhớ"
+            )
+        
+        # Sheet đang xem (None khi gộp nhiều sheet), dùng để chọn sheet của file nối thêm
+        selected_sheet = None
+        if stream_mode:
+            headers = load_sheet_headers(file_hash, uploaded_file.getvalue())
+            sheet_names = list(headers.keys())
+            selected_sheet = sheet_names[0]
+            if len(sheet_names) > 1:
+                selected_sheet = st.sidebar.selectbox(
+                    "Chọn sheet:",
+                    sheet_names
                 )
+            usecols = st.sidebar.multiselect(
+                "Chỉ đọc các cột:",
+                headers[selected_sheet],
+                default=headers[selected_sheet]
+            )
+            start_row = st.sidebar.number_input("Bắt đầu từ dòng dữ liệu:", min_value=1, value=1, step=1)
+            max_rows = st.sidebar.number_input("Số dòng tối đa (0 = tất cả):", min_value=0, value=0, step=10000)
+            
+            stream_key = (file_hash, selected_sheet, tuple(usecols), int(start_row), int(max_rows))
+            dataset_key = stream_key
+            dataset_label = f"{uploaded_file.name} / {selected_sheet} (đọc theo luồng)"
+            
+            # Kết quả đọc được giữ trong cache dữ liệu dùng chung, chỉ đọc lại khi tham số thay đổi
+            def load_stream():
+                progress_bar = st.sidebar.progress(0.0, text="Đang đọc dữ liệu...")
                 
-                if st.button("Phân tích", key="calc_trend"):
-                    st.write("**Thống kê xu hướng:**")
-                    
-                    diff = df[trend_col].diff()
-                    st.write(f"- Thay đổi trung bình: {diff.mean():,.2f}")
-                    st.write(f"- Tăng nhiều nhất: {diff.max():,.2f}")
-                    st.write(f"- Giảm nhiều nhất: {diff.min():,.2f}")
-                    
-                    # Biểu đồ xu hướng
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=df.index,
-                        y=df[trend_col],
-                        mode='lines+markers',
-                        name=trend_col,
-                        line=dict(color='#FF6B6B', width=2),
-                        marker=dict(size=4)
-                    ))
-                    fig.update_layout(
-                        title=f"Xu hướng của {trend_col}",
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(size=12),
-                        height=400
+                def report_progress(done, total):
+                    if total:
+                        progress_bar.progress(min(done / total, 1.0), text=f"Đã đọc {done:,} / {total:,} dòng")
+                    else:
+                        progress_bar.progress(0.0, text=f"Đã đọc {done:,} dòng")
+                
+                with stage('stream_excel') as frame:
+                    streamed = stream_sheet(
+                        uploaded_file.getvalue(),
+                        sheet_name=selected_sheet,
+                        usecols=usecols,
+                        start_row=int(start_row),
+                        nrows=int(max_rows) or None,
+                        progress=report_progress
                     )
-                    st.plotly_chart(fig, use_container_width=True)
-        
-        with col3:
-            st.markdown("### 🔢 Thống kê so sánh")
-            if len(numeric_columns) >= 2:
-                compare_col1 = st.selectbox(
-                    "Cột 1:",
-                    numeric_columns,
-                    key="compare1"
+                    frame['rows'] = len(streamed)
+                progress_bar.empty()
+                return streamed
+            
+            df, _ = get_dataset_cache().get(('stream',) + stream_key, load_stream, label=f"🚰 {dataset_label}")
+        else:
+            # Đọc các file Excel (tất cả sheet, chỉ parse một lần cho mỗi nội dung file)
+            file_hashes = tuple(get_file_hash(f) for f in uploaded_files)
+            workbooks = load_workbooks(
+                file_hashes,
+                tuple(f.name for f in uploaded_files),
+                [f.getvalue() for f in uploaded_files]
+            )
+            
+            # Mỗi nguồn là một cặp (file, sheet); nhãn nguồn chỉ gồm tên sheet khi chỉ có một file
+            sources = {}
+            for i, (f, sheets) in enumerate(zip(uploaded_files, workbooks)):
+                for sheet in sheets:
+                    label = sheet if len(uploaded_files) == 1 else f"{f.name} / {sheet}"
+                    if label in sources:
+                        label = f"{label} ({i + 1})"
+                    sources[label] = (i, sheet)
+            
+            combine_mode = False
+            if len(sources) > 1:
+                combine_mode = st.sidebar.checkbox(
+                    "📚 Gộp nhiều sheet / file",
+                    value=len(uploaded_files) > 1,
+                    help="Ghép các sheet được chọn thành một bộ dữ liệu, thêm cột nguồn để phân biệt"
                 )
-                compare_col2 = st.selectbox(
-                    "Cột 2:",
-                    numeric_columns,
-                    key="compare2"
+            
+            if combine_mode:
+                selected_sources = st.sidebar.multiselect(
+                    "Chọn các sheet cần gộp:",
+                    list(sources.keys()),
+                    default=list(sources.keys())
                 )
-                
-                if st.button("So sánh", key="calc_compare"):
-                    col1_mean = df[compare_col1].mean()
-                    col2_mean = df[compare_col2].mean()
-                    
-                    st.write(f"**{compare_col1}:**")
-                    st.write(f"- Trung bình: {col1_mean:,.2f}")
-                    st.write(f"- Tổng: {df[compare_col1].sum():,.2f}")
-                    
-                    st.write(f"**{compare_col2}:**")
-                    st.write(f"- Trung bình: {col2_mean:,.2f}")
-                    st.write(f"- Tổng: {df[compare_col2].sum():,.2f}")
-                    
-                    st.write(f"**Tỷ lệ:** {col1_mean/col2_mean:.2f}")
-                    
-                    # Biểu đồ so sánh
-                    fig = go.Figure()
-                    fig.add_trace(go.Bar(
-                        x=[compare_col1, compare_col2],
-                        y=[df[compare_col1].sum(), df[compare_col2].sum()],
-                        marker_color=['#FF6B6B', '#4ECDC4'],
-                        text=[f"{df[compare_col1].sum():,.0f}", f"{df[compare_col2].sum():,.0f}"],
-                        textposition='auto'
-                    ))
-                    fig.update_layout(
-                        title="So sánh tổng giá trị",
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(size=12),
-                        height=400
+                if not selected_sources:
+                    st.sidebar.warning("⚠️ Chưa chọn sheet nào, dùng sheet đầu tiên")
+                    selected_sources = list(sources.keys())[:1]
+                frames = {label: workbooks[sources[label][0]][sources[label][1]] for label in selected_sources}
+                dataset_key = ('combined',) + tuple((file_hashes[sources[label][0]], sources[label][1], label) for label in selected_sources)
+                dataset_label = ", ".join(selected_sources) if len(selected_sources) <= 3 else f"{len(selected_sources)} sheet"
+                df, schema_issues = load_combined(dataset_key, frames)
+                if schema_issues:
+                    with st.sidebar.expander(f"⚠️ Lược đồ không khớp ({len(schema_issues)})"):
+                        for issue in schema_issues:
+                            st.write(f"- {issue}")
+            else:
+                # Chọn file (nếu có nhiều file) rồi chọn sheet - chỉ chuyển giữa các DataFrame đã cache
+                file_idx = 0
+                if len(uploaded_files) > 1:
+                    file_idx = st.sidebar.selectbox(
+                        "Chọn file:",
+                        range(len(uploaded_files)),
+                        format_func=lambda i: uploaded_files[i].name
+                    )
+                sheets = workbooks[file_idx]
+                sheet_names = list(sheets.keys())
+                selected_sheet = sheet_names[0]
+                if len(sheet_names) > 1:
+                    selected_sheet = st.sidebar.selectbox(
+                        "Chọn sheet:",
+                        sheet_names
                     )
-                    st.plotly_chart(fig, use_container_width=True)
+                df = sheets[selected_sheet]
+                dataset_key = (file_hashes[file_idx], selected_sheet)
+                dataset_label = f"{uploaded_files[file_idx].name} / {selected_sheet}"
+        
+        # Nén kiểu dữ liệu: cột phân loại -> category, số nguyên -> kiểu nhỏ nhất đủ chứa
+        compact_mode = st.sidebar.checkbox(
+            "🗜️ Nén kiểu dữ liệu",
+            value=True,
+            help="Chuyển cột văn bản ít giá trị khác nhau sang category và thu nhỏ kiểu số nguyên mà không mất thông tin"
+        )
+        memory_info = None
+        if compact_mode:
+            df, mem_before, mem_after = load_compacted(dataset_key, df, dataset_label)
+            memory_info = f"💾 Bộ nhớ: {mem_before / 1024 / 1024:,.2f} MB → {mem_after / 1024 / 1024:,.2f} MB"
+        
+        # Nối thêm dữ liệu mới (delta) vào cuối dữ liệu hiện tại thay vì tải lại cả file lớn
+        profile_key = dataset_key + (compact_mode,)
+        delta_files = st.sidebar.file_uploader(
+            "➕ Nối thêm dữ liệu mới (delta)",
+            type=['xlsx', 'xls'],
+            accept_multiple_files=True,
+            key="delta_files",
+            help="Các dòng của file delta (cùng các cột) được nối vào cuối dữ liệu hiện tại. Thống kê xấp xỉ, "
+                 "tương quan và tổng hợp nhóm đã tính được cập nhật theo phần nối thêm thay vì tính lại từ đầu"
+        )
+        if delta_files:
+            df, profile_key = append_deltas(df, profile_key, delta_files, selected_sheet, dataset_label)
+        
+        # Hiển thị thông tin cơ bản
+        st.sidebar.success(f"✅ Đã tải file thành công!")
+        st.sidebar.info(f"📏 Kích thước: {df.shape[0]} dòng × {df.shape[1]} cột")
+        if memory_info is not None:
+            st.sidebar.info(memory_info)
+        
+        # Chọn cột để phân tích
+        st.sidebar.markdown("---")
+        st.sidebar.subheader("⚙️ Tùy Chọn Phân Tích")
+        max_points = st.sidebar.number_input(
+            "Số điểm tối đa trên biểu đồ đường:",
+            min_value=100,
+            max_value=100000,
+            value=DEFAULT_MAX_POINTS,
+            step=500,
+            help="Biểu đồ đường, kết hợp và xu hướng sẽ rút gọn dữ liệu về số điểm này"
+        )
+        downsample_method = METHODS[st.sidebar.selectbox(
+            "Phương pháp rút gọn điểm:",
+            list(METHODS.keys())
+        )]
+        # Thống kê chính xác cần sắp xếp lại toàn bộ dữ liệu nên không cập nhật theo delta được:
+        # mặc định dùng thống kê xấp xỉ khi có dữ liệu nối thêm
+        approx_mode = st.sidebar.checkbox(
+            "🎯 Thống kê xấp xỉ (dữ liệu rất lớn)",
+            value=bool(delta_files),
+            help="Tính phân vị và số giá trị duy nhất bằng sketch trong một lượt quét, không sắp xếp toàn bộ cột"
+        )
+        
+        # Hồ sơ của dữ liệu đầy đủ giữ các chỉ mục lọc; khi có bộ lọc, mọi phần bên dưới
+        # dùng bản đã lọc với khóa hồ sơ riêng gồm cả trạng thái lọc
+        base_profile = get_profile(profile_key, df, dataset_label)
+        filter_state = sidebar_filters(base_profile)
+        if filter_state:
+            n_total = len(df)
+            df = load_filtered(base_profile, filter_state, dataset_label)
+            profile_key = profile_key + (('filter',) + filter_state,)
+            st.sidebar.info(f"🔎 Sau lọc: {len(df):,} / {n_total:,} dòng")
+            if len(df) == 0:
+                st.warning("⚠️ Không có dòng nào thỏa điều kiện lọc. Hãy nới rộng bộ lọc ở sidebar.")
+                st.stop()
+        
+        # Hiển thị dữ liệu thô
+        st.header("📋 Xem Trước Dữ Liệu")
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Tổng số dòng", df.shape[0])
+        with col2:
+            st.metric("Tổng số cột", df.shape[1])
+        with col3:
+            st.metric("Tổng số ô", df.shape[0] * df.shape[1])
+        
+        # Hồ sơ dữ liệu dùng chung cho mọi phần bên dưới
+        profile = get_profile(profile_key, df, f"{dataset_label} (đã lọc)" if filter_state else dataset_label)
+        
+        # Tùy chọn hiển thị
+        render_preview(profile)
+        
+        st.markdown("---")
+        
+        # Phân tích thống kê tổng hợp
+        st.header("📊 Thống Kê Tổng Hợp")
+        numeric_columns = profile.numeric_columns
+        
+        render_statistics(profile, approx_mode)
+        
+        st.markdown("---")
+        
+        # Phần biểu đồ trực quan
+        st.header("🎨 Biểu Đồ Trực Quan")
+        
+        render_charts(df, profile, max_points, downsample_method, approx_mode)
+        
+        st.markdown("---")
+        
+        # Tính toán tổng hợp nâng cao
+        st.header("🧮 Tính Toán Tổng Hợp Nâng Cao")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            render_group_panel(profile)
+        
+        with col2:
+            render_trend_panel(df, profile, max_points, downsample_method)
+        
+        with col3:
+            render_compare_panel(profile, approx_mode)
+        
+        render_pivot(df, profile)
         
         # Footer
         st.markdown("---")
@@ -633,22 +1779,7 @@ else:
     
     if st.button("Tạo file Excel mẫu"):
         # Tạo dữ liệu mẫu
-        np.random.seed(42)
-        n = 100
-        
-        sample_data = {
-            'Mã sản phẩm': [f'SP{i:03d}' for i in range(1, n+1)],
-            'Loại sản phẩm': np.random.choice(['A', 'B', 'C', 'D'], n),
-            'Giá bán': np.random.uniform(10000, 500000, n),
-            'Số lượng': np.random.randint(10, 1000, n),
-            'Doanh thu': np.random.uniform(500000, 5000000, n),
-            'Chi phí': np.random.uniform(200000, 3000000, n),
-            'Lợi nhuận': np.random.uniform(-100000, 2000000, n),
-            'Tháng': np.random.choice(['Tháng 1', 'Tháng 2', 'Tháng 3', 'Tháng 4'], n),
-            'Khu vực': np.random.choice(['Miền Bắc', 'Miền Trung', 'Miền Nam'], n)
-        }
-        
-        sample_df = pd.DataFrame(sample_data)
+        sample_df = generate_sales(100)
         
         # Tạo file Excel
         output = pd.ExcelWriter('sample_data.xlsx', engine='openpyxl')
@@ -659,3 +1790,6 @@ else:
         st.info("📁 Bây giờ bạn có thể tải lên file này để thử nghiệm ứng dụng!")
         st.dataframe(sample_df.head(10))
 
+# Điền bảng hiệu năng sau cùng để có đủ các giai đoạn của lượt chạy
+with perf_panel:
+    show_perf_panel(recorder)
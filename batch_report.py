@@ -0,0 +1,228 @@
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_loader import compact_dtypes, read_workbook
+from dataset_profile import DatasetProfile
+from sketches import merge_sketches, sketch_columns
+from stats_engine import trend_table
+
+EXCEL_SUFFIXES = ('.xlsx', '.xls')
+# Bỏ qua tổng hợp theo các cột có quá nhiều nhóm (mã sản phẩm, mã đơn...) để báo cáo gọn
+MAX_REPORT_GROUPS = 100
+
+
+def _records(df, index=False):
+    if index:
+        df = df.rename_axis(df.index.name or 'Cột').reset_index()
+    return json.loads(df.to_json(orient='records', force_ascii=False))
+
+
+# Phân tích một sheet: thống kê mô tả, tổng hợp theo nhóm, xu hướng, so sánh và tương quan
+# (cùng các phép tính với ứng dụng Streamlit)
+def analyze_sheet(df, compact=True):
+    if compact:
+        df, _, _ = compact_dtypes(df)
+    profile = DatasetProfile(df)
+    numeric_columns = profile.numeric_columns
+
+    result = {
+        'rows': int(df.shape[0]),
+        'columns': int(df.shape[1]),
+        'numeric_columns': numeric_columns,
+        'categorical_columns': profile.categorical_columns,
+        'tables': {}
+    }
+    if not numeric_columns:
+        return result
+
+    summary, _ = profile.summary()
+    tables = result['tables']
+    tables['Thống kê chi tiết'] = summary.table()
+    tables['Xu hướng'] = trend_table(df, numeric_columns)
+    tables['So sánh (tỷ lệ trung bình hàng / cột)'] = summary.mean_ratios()
+    if len(numeric_columns) > 1:
+        corr, _ = profile.correlation()
+        tables['Tương quan'] = corr
+    for group_col in profile.categorical_columns:
+        (_, labels), _ = profile.group_index(group_col)
+        if len(labels) > MAX_REPORT_GROUPS:
+            continue
+        aggregates, _ = profile.groups(group_col)
+        for func, label in (('sum', 'Tổng'), ('mean', 'Trung bình')):
+            tables[f"{label} theo {group_col}"] = aggregates.frame(func, numeric_columns)
+    result['totals'] = {col: float(summary.sum[i]) for i, col in enumerate(numeric_columns)}
+    # Sketch gộp được để tính phân vị / số giá trị duy nhất xấp xỉ trên toàn bộ các file
+    result['sketches'] = sketch_columns(df, numeric_columns)
+    return result
+
+
+def _html_report(title, sections):
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif;margin:24px}table{border-collapse:collapse;margin-bottom:24px}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}th{background:#f0f0f0}</style>",
+        f"</head><body><h1>📊 {html.escape(title)}</h1>"
+    ]
+    for heading, body in sections:
+        parts.append(f"<h2>{html.escape(heading)}</h2>")
+        parts.append(body)
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+# Chạy trong tiến trình con: đọc file, phân tích mọi sheet, ghi báo cáo JSON và HTML.
+# Chỉ trả về bản tóm tắt nhỏ để tiến trình chính tổng hợp.
+def process_file(path, output_dir, compact=True, input_dir=None):
+    started = time.perf_counter()
+    name = os.path.basename(path)
+    relative = os.path.relpath(path, input_dir) if input_dir else name
+    stem = report_name(relative)
+    try:
+        with open(path, 'rb') as f:
+            sheets = read_workbook(f.read(), name)
+
+        report = {'file': relative, 'sheets': {}}
+        sections = []
+        totals = {}
+        sketches = []
+        rows = 0
+        for sheet_name, df in sheets.items():
+            analysis = analyze_sheet(df, compact)
+            rows += analysis['rows']
+            sketches.append(analysis.pop('sketches', {}))
+            for col, value in analysis.get('totals', {}).items():
+                totals[col] = totals.get(col, 0.0) + value
+
+            sections.append((
+                f"Sheet: {sheet_name}",
+                f"<p>{analysis['rows']:,} dòng × {analysis['columns']} cột</p>"
+            ))
+            sheet_report = {k: v for k, v in analysis.items() if k != 'tables'}
+            sheet_report['tables'] = {}
+            for title, table in analysis['tables'].items():
+                indexed = not isinstance(table.index, pd.RangeIndex)
+                sheet_report['tables'][title] = _records(table, index=indexed)
+                sections.append((f"{sheet_name} - {title}", table.to_html(index=indexed, float_format=lambda v: f"{v:,.2f}")))
+            report['sheets'][sheet_name] = sheet_report
+
+        with open(os.path.join(output_dir, f"{stem}.json"), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(output_dir, f"{stem}.html"), 'w', encoding='utf-8') as f:
+            f.write(_html_report(relative, sections))
+
+        return {
+            'file': relative,
+            'status': 'ok',
+            'sheets': len(sheets),
+            'rows': rows,
+            'seconds': round(time.perf_counter() - started, 3),
+            'totals': totals,
+            'sketches': merge_sketches(sketches)
+        }
+    except Exception as e:
+        return {
+            'file': relative,
+            'status': 'error',
+            'error': str(e),
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+
+
+# Tên file báo cáo theo đường dẫn tương đối của workbook trong thư mục đầu vào, giữ cả phần mở
+# rộng: a/sales.xlsx -> a__sales.xlsx, để các workbook trùng tên ở thư mục con khác nhau hoặc
+# khác đuôi (a.xlsx, a.xls) không ghi đè báo cáo của nhau
+def report_name(relative):
+    parts = [part for part in re.split(r'[\\/]+', relative) if part not in ('', '.')]
+    return '__'.join(parts)
+
+
+def find_workbooks(input_dir, recursive=False):
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for file in sorted(files):
+            if file.lower().endswith(EXCEL_SUFFIXES) and not file.startswith('~$'):
+                paths.append(os.path.join(root, file))
+        if not recursive:
+            break
+    return paths
+
+
+# Báo cáo tổng hợp: mỗi file một dòng, kèm tổng của các cột số trên toàn bộ các file và
+# trung vị / số giá trị duy nhất xấp xỉ từ sketch đã gộp của mọi file
+def write_summary(results, output_dir, elapsed):
+    results = [dict(r) for r in results]
+    sketches = merge_sketches(r.pop('sketches', {}) for r in results)
+    files = pd.DataFrame([{k: v for k, v in r.items() if k != 'totals'} for r in results])
+    totals = {}
+    for r in results:
+        for col, value in r.get('totals', {}).items():
+            totals[col] = totals.get(col, 0.0) + value
+    totals_df = pd.DataFrame({
+        'Cột': list(totals.keys()),
+        'Tổng trên tất cả file': list(totals.values()),
+        'Trung vị (xấp xỉ)': [sketches[col].quantiles.quantile(0.5) if col in sketches else None for col in totals],
+        'Số giá trị duy nhất (xấp xỉ)': [sketches[col].distinct.estimate() if col in sketches else None for col in totals]
+    })
+
+    summary = {
+        'files': len(results),
+        'ok': sum(r['status'] == 'ok' for r in results),
+        'errors': sum(r['status'] != 'ok' for r in results),
+        'seconds': round(elapsed, 3),
+        'results': results,
+        'totals': totals,
+        'approx': _records(totals_df.drop(columns='Tổng trên tất cả file'))
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, 'summary.html'), 'w', encoding='utf-8') as f:
+        f.write(_html_report("Báo cáo tổng hợp", [
+            ("Các file", files.to_html(index=False)),
+            ("Tổng các cột số", totals_df.to_html(index=False, float_format=lambda v: f"{v:,.2f}"))
+        ]))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Phân tích hàng loạt các file Excel trong một thư mục (không cần giao diện)")
+    parser.add_argument('input_dir', help="Thư mục chứa các file .xlsx/.xls")
+    parser.add_argument('-o', '--output', default='reports', help="Thư mục ghi báo cáo (mặc định: reports)")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="Số tiến trình song song (mặc định: số nhân CPU)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Tìm cả trong các thư mục con")
+    parser.add_argument('--no-compact', action='store_true', help="Không nén kiểu dữ liệu sau khi đọc")
+    args = parser.parse_args(argv)
+
+    paths = find_workbooks(args.input_dir, args.recursive)
+    if not paths:
+        print(f"Không tìm thấy file Excel nào trong {args.input_dir}", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    started = time.perf_counter()
+    results = []
+    workers = max(1, min(args.workers, len(paths)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, path, args.output, not args.no_compact, args.input_dir) for path in paths]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            status = "✅" if result['status'] == 'ok' else f"❌ {result['error']}"
+            print(f"[{done}/{len(paths)}] {result['file']} ({result['seconds']:.2f}s) {status}")
+
+    results.sort(key=lambda r: r['file'])
+    summary = write_summary(results, args.output, time.perf_counter() - started)
+    print(f"Xong {summary['ok']}/{summary['files']} file trong {summary['seconds']:.2f}s với {workers} tiến trình -> {args.output}")
+    return 0 if summary['errors'] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
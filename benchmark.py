@@ -0,0 +1,214 @@
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from correlation import correlation_matrix
+from data_loader import compact_dtypes, read_workbook
+from downsampling import DEFAULT_MAX_POINTS, METHODS, downsample_positions
+from groupby_engine import group_aggregates
+from perf_metrics import StageRecorder
+from sample_data import BASE_COLUMNS, generate_sales
+from stats_engine import summarize_approx, summarize_numeric
+from time_series import period_buckets, period_keys
+
+MIN_ROWS = 1_000
+MAX_ROWS = 10_000_000
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+# Giai đoạn chậm hơn baseline quá tỷ lệ này (và quá MIN_DELTA_SECONDS) bị coi là suy giảm
+DEFAULT_THRESHOLD = 0.25
+MIN_DELTA_SECONDS = 0.002
+# Ghi file Excel mẫu rất chậm và Excel giới hạn ~1 triệu dòng: chỉ đo đọc file tới số dòng này
+DEFAULT_INGEST_MAX_ROWS = 100_000
+
+
+def config_key(n_rows, n_columns, cardinality):
+    return f"rows={n_rows},columns={n_columns},cardinality={cardinality}"
+
+
+def _excel_bytes(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, sheet_name='Dữ liệu mẫu', engine='openpyxl')
+    return buffer.getvalue()
+
+
+# Chạy một lượt mọi giai đoạn của ứng dụng trên dữ liệu đã sinh, đo bằng recorder
+def _run_stages(recorder, df, excel_bytes):
+    n_rows = len(df)
+    if excel_bytes is not None:
+        with recorder.stage('ingest', rows=n_rows):
+            read_workbook(excel_bytes, 'benchmark.xlsx')
+
+    with recorder.stage('compact', rows=n_rows):
+        df, _, _ = compact_dtypes(df)
+    numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+
+    with recorder.stage('statistics', rows=n_rows):
+        summarize_numeric(df, numeric_columns)
+    with recorder.stage('statistics_approx', rows=n_rows):
+        summarize_approx(df, numeric_columns)
+
+    with recorder.stage('groupby', rows=n_rows):
+        codes, labels = pd.factorize(df['Loại sản phẩm'], sort=True)
+        aggregates = group_aggregates(df, 'Loại sản phẩm', numeric_columns, codes, labels)
+
+    with recorder.stage('time_buckets', rows=n_rows):
+        month_codes, months = pd.factorize(df['Tháng'], sort=True)
+        keys = period_keys(months)
+        codes, labels = period_buckets(np.where(month_codes >= 0, keys[month_codes], -1))
+        group_aggregates(df, 'Tháng', numeric_columns, codes, labels)
+
+    with recorder.stage('correlation', rows=n_rows):
+        correlation_matrix(df, numeric_columns)
+
+    plot_df = None
+    for method in METHODS.values():
+        with recorder.stage(f"downsample_{method}", rows=n_rows):
+            positions = downsample_positions(df, ['Doanh thu'], DEFAULT_MAX_POINTS, method)
+        plot_df = df.iloc[positions]
+
+    with recorder.stage('figure', rows=len(plot_df)):
+        fig = go.Figure(go.Scatter(x=plot_df.index, y=plot_df['Doanh thu'], mode='lines+markers'))
+        totals = aggregates.frame('sum', ['Doanh thu'])
+        fig.add_trace(go.Bar(x=totals['Loại sản phẩm'], y=totals['Doanh thu']))
+    with recorder.stage('figure_json', rows=len(plot_df)):
+        pio.to_json(fig, validate=False)
+
+
+# Đo một cấu hình: mỗi giai đoạn chạy repeat lần, lấy thời gian nhỏ nhất (ít nhiễu nhất)
+def run_benchmark(n_rows, n_columns, cardinality, repeat=3, ingest_max_rows=DEFAULT_INGEST_MAX_ROWS,
+                  trace_memory=False, seed=42):
+    started = time.perf_counter()
+    df = generate_sales(n_rows, n_columns, cardinality, seed)
+    generate_seconds = time.perf_counter() - started
+    excel_bytes = _excel_bytes(df) if n_rows <= ingest_max_rows else None
+
+    recorder = StageRecorder()
+    recorder.begin_run(trace_memory)
+    for _ in range(repeat):
+        _run_stages(recorder, df, excel_bytes)
+
+    stages = {}
+    for record in recorder.history:
+        stats = stages.setdefault(record['stage'], {'seconds': np.inf, 'rows': record['rows'], 'peak_bytes': None})
+        stats['seconds'] = min(stats['seconds'], record['seconds'])
+        if record['peak_bytes'] is not None:
+            stats['peak_bytes'] = max(stats['peak_bytes'] or 0, record['peak_bytes'])
+    return {'generate_seconds': generate_seconds, 'stages': stages}
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(path, baseline, results):
+    baseline.setdefault('configs', {})
+    for key, result in results.items():
+        baseline['configs'][key] = {stage: stats['seconds'] for stage, stats in result['stages'].items()}
+    baseline['environment'] = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'saved': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+
+
+# So sánh với baseline; trả về danh sách (cấu hình, giai đoạn, baseline, hiện tại) bị suy giảm
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get('configs', {}).get(key, {})
+        for stage, stats in result['stages'].items():
+            if stage not in reference:
+                continue
+            before, after = reference[stage], stats['seconds']
+            if after > before * (1 + threshold) and after - before > MIN_DELTA_SECONDS:
+                regressions.append((key, stage, before, after))
+    return regressions
+
+
+def _report(key, result, reference):
+    print(f"\n{key} (sinh dữ liệu {result['generate_seconds']:.2f}s)")
+    print(f"  {'Giai đoạn':<20} {'ms':>10} {'baseline':>10} {'tỷ lệ':>7} {'MB đỉnh':>9}")
+    for stage, stats in result['stages'].items():
+        ms = stats['seconds'] * 1000
+        before = reference.get(stage)
+        base = f"{before * 1000:10.1f}" if before is not None else f"{'-':>10}"
+        ratio = f"{stats['seconds'] / before:7.2f}" if before else f"{'-':>7}"
+        peak = f"{stats['peak_bytes'] / 1024 / 1024:9.1f}" if stats['peak_bytes'] is not None else f"{'-':>9}"
+        print(f"  {stage:<20} {ms:10.1f} {base} {ratio} {peak}")
+
+
+def _row_count(value):
+    n_rows = int(float(value))
+    if not MIN_ROWS <= n_rows <= MAX_ROWS:
+        raise argparse.ArgumentTypeError(f"số dòng phải trong khoảng {MIN_ROWS:,} - {MAX_ROWS:,}")
+    return n_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark các giai đoạn phân tích trên dữ liệu bán hàng tổng hợp")
+    parser.add_argument('-n', '--rows', type=_row_count, nargs='+', default=[10_000, 100_000],
+                        help=f"Số dòng của từng cấu hình, {MIN_ROWS:,} - {MAX_ROWS:,} (vd: 1e3 1e5 1e7)")
+    parser.add_argument('-c', '--columns', type=int, default=len(BASE_COLUMNS),
+                        help=f"Tổng số cột (tối thiểu {len(BASE_COLUMNS)}, phần dư là cột số)")
+    parser.add_argument('-k', '--cardinality', type=int, default=4, help="Số loại sản phẩm khác nhau")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Số lần chạy mỗi giai đoạn, lấy thời gian nhỏ nhất")
+    parser.add_argument('--ingest-max-rows', type=int, default=DEFAULT_INGEST_MAX_ROWS,
+                        help="Chỉ đo đọc file Excel khi số dòng không vượt quá giá trị này")
+    parser.add_argument('--memory', action='store_true', help="Đo bộ nhớ đỉnh (tracemalloc, chậm hơn)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=f"File baseline (mặc định: {DEFAULT_BASELINE})")
+    parser.add_argument('--save-baseline', action='store_true', help="Ghi kết quả lần này làm baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Tỷ lệ chậm hơn baseline cho phép trước khi báo suy giảm (mặc định: 0.25)")
+    args = parser.parse_args(argv)
+    if args.columns < len(BASE_COLUMNS):
+        parser.error(f"cần ít nhất {len(BASE_COLUMNS)} cột")
+    if args.memory and args.save_baseline:
+        parser.error("không lưu baseline khi đo bộ nhớ: tracemalloc làm chậm mọi giai đoạn")
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    for n_rows in args.rows:
+        key = config_key(n_rows, args.columns, args.cardinality)
+        results[key] = run_benchmark(n_rows, args.columns, args.cardinality, args.repeat,
+                                     args.ingest_max_rows, args.memory)
+        _report(key, results[key], baseline.get('configs', {}).get(key, {}))
+
+    if args.save_baseline:
+        save_baseline(args.baseline, baseline, results)
+        print(f"\nĐã lưu baseline vào {args.baseline}")
+        return 0
+    if args.memory:
+        print("\nĐo bộ nhớ làm chậm mọi giai đoạn nên không so sánh với baseline")
+        return 0
+    if not baseline:
+        print(f"\nChưa có baseline ({args.baseline}); chạy lại với --save-baseline để tạo", file=sys.stderr)
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} giai đoạn chậm hơn baseline quá {args.threshold:.0%}:", file=sys.stderr)
+        for key, stage, before, after in regressions:
+            print(f"  {key} / {stage}: {before * 1000:.1f} ms → {after * 1000:.1f} ms", file=sys.stderr)
+        return 1
+    print(f"\n✅ Không giai đoạn nào chậm hơn baseline quá {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
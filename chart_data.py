@@ -0,0 +1,117 @@
+import numpy as np
+
+# Ngưỡng số điểm của biểu đồ phân tán: trên WEBGL_THRESHOLD vẽ bằng WebGL,
+# trên DENSITY_THRESHOLD gom điểm thành lưới mật độ 2 chiều ở phía server
+WEBGL_THRESHOLD = 10_000
+DENSITY_THRESHOLD = 200_000
+DEFAULT_BINS = 100
+MAX_DENSITY_CATEGORIES = 20
+
+HISTOGRAM_BINS = 30
+# Số điểm ngoại lai tối đa gửi lên trình duyệt cho mỗi hộp
+MAX_BOX_OUTLIERS = 500
+
+
+def scatter_mode(n_points):
+    if n_points > DENSITY_THRESHOLD:
+        return 'density'
+    if n_points > WEBGL_THRESHOLD:
+        return 'webgl'
+    return 'svg'
+
+
+# Chỉ số ô và biên của các ô đều nhau trên [lo, hi] (mặc định là [min, max] của dữ liệu)
+def _bin_axis(values, bins, lo=None, hi=None):
+    lo = float(values.min()) if lo is None else float(lo)
+    hi = float(values.max()) if hi is None else float(hi)
+    if hi <= lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, bins + 1)
+    idx = ((values - lo) / (hi - lo) * bins).astype(np.intp)
+    return np.clip(idx, 0, bins - 1), edges
+
+
+def _centers(edges):
+    return (edges[:-1] + edges[1:]) / 2
+
+
+# Lưới mật độ 2 chiều của (x, y), bỏ qua các cặp có ô trống.
+# Nếu có codes (mã nhóm của cột tô màu, -1 = trống) thì đếm riêng cho từng nhóm;
+# các nhóm nhỏ vượt quá max_categories được gộp vào nhóm cuối cùng.
+# Trả về (tâm trục X, tâm trục Y, counts, nhãn nhóm) với counts có dạng
+# (bins_x, bins_y) khi không có nhóm, hoặc (số nhóm, bins_x, bins_y).
+def density_grid(x, y, bins=DEFAULT_BINS, codes=None, labels=None,
+                 max_categories=MAX_DENSITY_CATEGORIES, other_label="Khác"):
+    valid = np.isfinite(x) & np.isfinite(y)
+    if codes is not None:
+        valid &= codes >= 0
+    x = x[valid]
+    y = y[valid]
+    if len(x) == 0:
+        empty = np.zeros((bins, bins), dtype=np.int64)
+        return np.arange(bins, dtype=float), np.arange(bins, dtype=float), empty, None
+
+    ix, x_edges = _bin_axis(x, bins)
+    iy, y_edges = _bin_axis(y, bins)
+    x_centers = _centers(x_edges)
+    y_centers = _centers(y_edges)
+    cell = ix * bins + iy
+
+    if codes is None:
+        counts = np.bincount(cell, minlength=bins * bins).reshape(bins, bins)
+        return x_centers, y_centers, counts, None
+
+    codes = codes[valid]
+    group_sizes = np.bincount(codes, minlength=len(labels))
+    order = np.argsort(group_sizes)[::-1]
+    order = order[group_sizes[order] > 0]
+    group_labels = [labels[i] for i in order[:max_categories]]
+
+    # Đánh lại mã: các nhóm lớn nhất giữ mã riêng, phần còn lại chung một mã
+    remap = np.full(len(labels), min(len(order), max_categories), dtype=np.intp)
+    remap[order[:max_categories]] = np.arange(min(len(order), max_categories))
+    if len(order) > max_categories:
+        group_labels.append(other_label)
+    n_groups = len(group_labels)
+
+    flat = remap[codes] * (bins * bins) + cell
+    counts = np.bincount(flat, minlength=n_groups * bins * bins).reshape(n_groups, bins, bins)
+    return x_centers, y_centers, counts, group_labels
+
+
+# Tần số histogram tính ở server; vmin/vmax lấy từ thống kê đã có nên chỉ cần một lượt đếm.
+# Trả về (biên các ô, số phần tử mỗi ô)
+def histogram_counts(values, vmin, vmax, bins=HISTOGRAM_BINS):
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.linspace(0, 1, bins + 1), np.zeros(bins, dtype=np.int64)
+    if not (np.isfinite(vmin) and np.isfinite(vmax)):
+        vmin, vmax = None, None
+    idx, edges = _bin_axis(values, bins, vmin, vmax)
+    return edges, np.bincount(idx, minlength=bins)
+
+
+# Râu và điểm ngoại lai của biểu đồ hộp theo quy tắc 1.5 IQR, dùng tứ phân vị đã tính sẵn.
+# Chỉ giữ tối đa max_outliers điểm ngoại lai (luôn gồm giá trị nhỏ nhất và lớn nhất).
+def box_whiskers(values, q1, q3, max_outliers=MAX_BOX_OUTLIERS, seed=0):
+    values = values[~np.isnan(values)]
+    iqr = q3 - q1
+    lo = q1 - 1.5 * iqr
+    hi = q3 + 1.5 * iqr
+    outside = (values < lo) | (values > hi)
+    inside = values[~outside]
+    lowerfence = float(inside.min()) if len(inside) else float(q1)
+    upperfence = float(inside.max()) if len(inside) else float(q3)
+
+    outliers = values[outside]
+    n_outliers = len(outliers)
+    if n_outliers > max_outliers:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(n_outliers, size=max_outliers - 2, replace=False)
+        outliers = np.concatenate([[outliers.min(), outliers.max()], outliers[sample]])
+    return {
+        'lowerfence': lowerfence,
+        'upperfence': upperfence,
+        'outliers': outliers,
+        'n_outliers': n_outliers
+    }
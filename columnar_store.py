@@ -0,0 +1,210 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+
+DEFAULT_CACHE_DIR = os.environ.get('EXCEL_CACHE_DIR', '.excel_cache')
+DEFAULT_MAX_MB = float(os.environ.get('EXCEL_CACHE_MAX_MB', '2048'))
+
+MANIFEST = 'manifest.json'
+# Tên thư mục của một entry: mã băm SHA-256 của file (thư mục <mã băm>.tmp-* là entry đang ghi dở)
+ENTRY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+# Tên cột gốc kèm kiểu để khôi phục sau khi đọc lại: Arrow chỉ lưu tên cột dạng chuỗi, trong khi
+# tiêu đề Excel có thể là số (2023) hoặc ngày. Kiểu khác không khôi phục được thì giữ dạng chuỗi.
+def _encode_name(name):
+    if isinstance(name, bool):
+        return ['bool', name]
+    if isinstance(name, (int, np.integer)):
+        return ['int', int(name)]
+    if isinstance(name, (float, np.floating)):
+        return ['float', float(name)]
+    if isinstance(name, datetime.datetime):
+        return ['datetime', name.isoformat()]
+    return ['str', str(name)]
+
+
+def _decode_name(encoded):
+    kind, value = encoded
+    if kind == 'datetime':
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+
+# Kho lưu trữ dạng cột (Arrow IPC) trên đĩa cho các workbook đã chuyển đổi.
+# Mỗi workbook nằm trong thư mục <root>/<mã băm>/, mỗi sheet là một file .arrow
+# không nén để đọc lại bằng memory-map mà không phải giải nén; to_pandas() vẫn chép
+# dữ liệu sang bộ nhớ của pandas, nên lợi ích là bỏ qua bước parse Excel chứ không
+# phải tiết kiệm bộ nhớ. Thời điểm truy cập gần nhất được
+# ghi vào mtime của manifest và dùng cho việc loại bỏ theo LRU khi vượt dung lượng.
+class ColumnarStore:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, file_hash):
+        return os.path.join(self.root, file_hash)
+
+    def _read_manifest(self, file_hash):
+        path = os.path.join(self._entry_dir(file_hash), MANIFEST)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Đọc lại tất cả sheet của workbook, trả về None nếu chưa có trong kho
+    def load(self, file_hash):
+        manifest = self._read_manifest(file_hash)
+        if manifest is None:
+            return None
+
+        entry_dir = self._entry_dir(file_hash)
+        sheets = {}
+        try:
+            for sheet in manifest['sheets']:
+                with pa.memory_map(os.path.join(entry_dir, sheet['file'])) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                df = table.to_pandas()
+                if 'columns' in sheet:
+                    df.columns = [_decode_name(name) for name in sheet['columns']]
+                sheets[sheet['name']] = df
+        except (OSError, pa.ArrowException, KeyError, ValueError):
+            # Entry hỏng hoặc bị xóa dở dang: bỏ đi để lần sau ghi lại
+            self.remove(file_hash)
+            return None
+
+        # Cập nhật thời điểm truy cập cho LRU; entry có thể vừa bị phiên khác loại bỏ,
+        # dữ liệu đã đọc xong nên vẫn dùng được
+        try:
+            os.utime(os.path.join(entry_dir, MANIFEST))
+        except OSError:
+            pass
+        return sheets
+
+    # Ghi tất cả sheet của workbook; trả về False nếu dữ liệu không chuyển được sang Arrow
+    def save(self, file_hash, file_name, sheets):
+        entry_dir = self._entry_dir(file_hash)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        try:
+            manifest_sheets = []
+            for idx, (name, df) in enumerate(sheets.items()):
+                file = f"{idx}.arrow"
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                with pa.OSFile(os.path.join(tmp_dir, file), 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                manifest_sheets.append({
+                    'name': name,
+                    'file': file,
+                    'rows': len(df),
+                    'columns': [_encode_name(col) for col in df.columns]
+                })
+        except (pa.ArrowException, TypeError, ValueError):
+            # Ví dụ: cột chứa lẫn số và chuỗi - vẫn dùng được trong bộ nhớ, chỉ không lưu đĩa
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        manifest = {
+            'file_name': file_name,
+            'created': time.time(),
+            'sheets': manifest_sheets
+        }
+        with open(os.path.join(tmp_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        with self._lock:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            self._evict(keep=file_hash)
+        return True
+
+    def remove(self, file_hash):
+        with self._lock:
+            shutil.rmtree(self._entry_dir(file_hash), ignore_errors=True)
+
+    # Các thư mục entry trong kho (bỏ qua thư mục tạm đang ghi và file lạ)
+    def _entry_hashes(self):
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        return [name for name in names if ENTRY_PATTERN.fullmatch(name)]
+
+    # Danh sách entry trong kho, mới truy cập nhất lên đầu
+    def entries(self):
+        result = []
+        for file_hash in self._entry_hashes():
+            entry_dir = self._entry_dir(file_hash)
+            manifest = self._read_manifest(file_hash)
+            if manifest is None:
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, f))
+                    for f in os.listdir(entry_dir)
+                )
+                last_access = os.path.getmtime(os.path.join(entry_dir, MANIFEST))
+            except OSError:
+                # Entry vừa bị phiên khác xóa hoặc ghi đè
+                continue
+            result.append({
+                'hash': file_hash,
+                'file_name': manifest.get('file_name', ''),
+                'sheets': len(manifest.get('sheets', [])),
+                'bytes': size,
+                'created': manifest.get('created', 0.0),
+                'last_access': last_access
+            })
+        result.sort(key=lambda e: e['last_access'], reverse=True)
+        return result
+
+    def total_bytes(self):
+        return sum(e['bytes'] for e in self.entries())
+
+    # Xóa mọi entry; chỉ xóa các thư mục entry chứ không xóa cả thư mục gốc
+    # (EXCEL_CACHE_DIR có thể trỏ vào thư mục chứa dữ liệu khác)
+    def purge(self):
+        with self._lock:
+            for file_hash in self._entry_hashes():
+                shutil.rmtree(self._entry_dir(file_hash), ignore_errors=True)
+
+    # Xóa các workbook truy cập lâu nhất cho tới khi tổng dung lượng nằm trong giới hạn
+    def _evict(self, keep=None):
+        entries = self.entries()
+        total = sum(e['bytes'] for e in entries)
+        for entry in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if entry['hash'] == keep:
+                continue
+            shutil.rmtree(self._entry_dir(entry['hash']), ignore_errors=True)
+            total -= entry['bytes']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Xem hoặc xóa kho cache dạng cột của các file Excel")
+    parser.add_argument('--dir', default=DEFAULT_CACHE_DIR, help="Thư mục kho cache")
+    parser.add_argument('--purge', action='store_true', help="Xóa toàn bộ kho cache")
+    args = parser.parse_args()
+
+    store = ColumnarStore(args.dir)
+    if args.purge:
+        store.purge()
+        print(f"Đã xóa kho cache: {args.dir}")
+    else:
+        for e in store.entries():
+            print(f"{e['hash'][:12]}  {e['bytes'] / 1024 / 1024:8.2f} MB  {e['sheets']} sheet  {e['file_name']}")
+        print(f"Tổng: {store.total_bytes() / 1024 / 1024:.2f} MB / {store.max_bytes / 1024 / 1024:.0f} MB")
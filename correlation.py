@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Heatmap chỉ hiện số trong ô và bảng tô màu khi số cột không quá các ngưỡng này
+MAX_ANNOTATED_COLUMNS = 30
+MAX_STYLED_COLUMNS = 60
+
+
+# Các mô-men gộp được của tương quan theo từng cặp cột (bỏ các dòng thiếu của cặp đó).
+# Với mỗi cặp (i, j), trên các dòng có cả hai giá trị: n[i, j] số dòng, sx[i, j] tổng x_i,
+# sxx[i, j] tổng x_i², sxy[i, j] tổng x_i·x_j. Giá trị được trừ trước một độ dời cố định
+# (thường là trung bình của lô đầu tiên) để giảm sai số khi trừ hai số lớn gần bằng nhau;
+# các lô dùng cùng độ dời gộp với nhau chỉ bằng phép cộng.
+class CoMoments:
+    def __init__(self, columns, shift):
+        self.columns = list(columns)
+        self.shift = np.asarray(shift, dtype=np.float64)
+        k = len(self.columns)
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    # x: khối (số dòng × số cột) số thực, NaN = ô trống.
+    # Không có ô trống: chỉ cần một tích ma trận, các tổng theo cặp là tổng của từng cột;
+    # có ô trống: vài tích ma trận trên mặt nạ hợp lệ thay vì lặp qua từng cặp cột.
+    def update(self, x):
+        valid = ~np.isnan(x)
+        x = np.where(valid, x - self.shift, 0.0)
+        if valid.all():
+            self.n += len(x)
+            self.sx += x.sum(axis=0)[:, None]
+            self.sxx += (x * x).sum(axis=0)[:, None]
+        else:
+            m = valid.astype(np.float64)
+            self.n += m.T @ m
+            self.sx += x.T @ m
+            self.sxx += (x * x).T @ m
+        self.sxy += x.T @ x
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns or not np.array_equal(other.shift, self.shift):
+            raise ValueError("Chỉ gộp được mô-men của cùng các cột với cùng độ dời")
+        self.n += other.n
+        self.sx += other.sx
+        self.sxx += other.sxx
+        self.sxy += other.sxy
+        return self
+
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.sxy - self.sx * self.sx.T / self.n
+            var_x = self.sxx - self.sx * self.sx / self.n
+            corr = cov / np.sqrt(var_x * var_x.T)
+        corr[self.n < 2] = np.nan
+
+        corr = np.clip(corr, -1.0, 1.0)
+        diag = np.diag(corr).copy()
+        np.fill_diagonal(corr, np.where(np.isnan(diag), np.nan, 1.0))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+# Mô-men tương quan của các cột số trong df; shift=None: độ dời là trung bình của từng cột
+def frame_comoments(df, columns, shift=None):
+    columns = list(columns)
+    x = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    if shift is None:
+        valid = ~np.isnan(x)
+        counts = valid.sum(axis=0)
+        shift = np.where(counts > 0, np.where(valid, x, 0.0).sum(axis=0) / np.maximum(counts, 1), 0.0)
+    return CoMoments(columns, shift).update(x)
+
+
+# Ma trận tương quan Pearson của các cột số, tương đương df[columns].corr()
+def correlation_matrix(df, columns):
+    return frame_comoments(df, columns).correlation()
+
+
+# Các cặp cột có tương quan mạnh nhất (theo trị tuyệt đối), chỉ lấy tam giác trên
+def top_pairs(corr, k=20, threshold=0.0):
+    values = corr.to_numpy()
+    i, j = np.triu_indices(len(values), k=1)
+    r = values[i, j]
+    keep = ~np.isnan(r) & (np.abs(r) >= threshold)
+    i, j, r = i[keep], j[keep], r[keep]
+    order = np.argsort(-np.abs(r), kind='stable')[:k]
+    return pd.DataFrame({
+        'Cột 1': corr.columns[i[order]],
+        'Cột 2': corr.columns[j[order]],
+        'Tương quan': r[order]
+    })
+
+
+# Thứ tự cột đưa các cột tương quan mạnh với nhau lại gần nhau (spectral seriation):
+# sắp theo vector riêng Fiedler của ma trận Laplace với trọng số |r|
+def cluster_order(corr):
+    weights = np.abs(np.nan_to_num(corr.to_numpy(), nan=0.0))
+    np.fill_diagonal(weights, 0.0)
+    if len(weights) < 3:
+        return list(corr.columns)
+    laplacian = np.diag(weights.sum(axis=1)) - weights
+    _, vectors = np.linalg.eigh(laplacian)
+    order = np.argsort(vectors[:, 1], kind='stable')
+    return list(corr.columns[order])
+
+
+# Chỉ giữ các cột có ít nhất một tương quan |r| >= threshold với cột khác,
+# các ô yếu hơn ngưỡng được để trống để heatmap chỉ hiện phần đáng chú ý
+def filter_matrix(corr, threshold):
+    if threshold <= 0:
+        return corr
+    values = corr.to_numpy().copy()
+    np.fill_diagonal(values, np.nan)
+    strong = np.abs(np.nan_to_num(values, nan=0.0)) >= threshold
+    keep = strong.any(axis=0)
+    filtered = corr.where(np.abs(corr) >= threshold)
+    return filtered.loc[keep, keep]
@@ -0,0 +1,270 @@
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+STREAM_CHUNK_ROWS = 50_000
+# Chỉ dùng tiến trình con khi tổng dung lượng cần đọc đủ lớn để bù chi phí khởi động tiến trình
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+SOURCE_COLUMN = 'Nguồn'
+
+
+# Băm nội dung file để làm khóa cache (cùng nội dung => cùng khóa, bất kể tên file)
+def file_digest(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+# Chọn engine đọc theo đuôi file: .xls cần xlrd, còn lại để pandas dùng openpyxl
+def excel_engine(file_name):
+    return 'xlrd' if file_name.lower().endswith('.xls') else 'openpyxl'
+
+
+# Đọc toàn bộ workbook trong một lần: trả về dict {tên sheet: DataFrame}
+def read_workbook(file_bytes, file_name):
+    return pd.read_excel(
+        io.BytesIO(file_bytes),
+        sheet_name=None,
+        engine=excel_engine(file_name)
+    )
+
+
+# Danh sách sheet theo thứ tự trong workbook (không đọc dữ liệu)
+def excel_sheet_names(file_bytes, file_name):
+    with pd.ExcelFile(io.BytesIO(file_bytes), engine=excel_engine(file_name)) as book:
+        return list(book.sheet_names)
+
+
+def _read_sheet(file_bytes, file_name, sheet_name):
+    return pd.read_excel(io.BytesIO(file_bytes), sheet_name=sheet_name, engine=excel_engine(file_name))
+
+
+# Đọc nhiều file cùng lúc, mỗi sheet là một tác vụ riêng trong tiến trình con
+# (parse Excel tốn CPU và giữ GIL nên luồng không giúp được).
+# files: danh sách (file_bytes, file_name); trả về danh sách dict {tên sheet: DataFrame} theo cùng thứ tự.
+def read_workbooks(files, max_workers=None):
+    tasks = [(i, sheet) for i, (data, name) in enumerate(files) for sheet in excel_sheet_names(data, name)]
+    total_bytes = sum(len(data) for data, _ in files)
+    workbooks = [{} for _ in files]
+
+    if len(tasks) < 2 or total_bytes < PARALLEL_MIN_BYTES:
+        for i, sheet in tasks:
+            workbooks[i][sheet] = _read_sheet(*files[i], sheet)
+        return workbooks
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(tasks)))
+    # spawn thay vì fork: tiến trình gọi (Streamlit) đang chạy nhiều luồng
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(_read_sheet, *files[i], sheet) for i, sheet in tasks]
+        for (i, sheet), future in zip(tasks, futures):
+            workbooks[i][sheet] = future.result()
+    return workbooks
+
+
+# Nhóm kiểu của cột để so sánh lược đồ giữa các nguồn (None = cột toàn ô trống, không xét)
+def _column_kind(series):
+    if series.isna().all():
+        return None
+    if pd.api.types.is_bool_dtype(series):
+        return 'logic'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'số'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'ngày giờ'
+    return 'văn bản'
+
+
+# Ghép nhiều bảng thành một, thêm cột nguồn (dạng category) ở đầu.
+# Khác biệt lược đồ không làm dừng việc ghép: cột thiếu ở nguồn nào thì để trống,
+# cột khác kiểu giữa các nguồn được giữ nguyên (pandas chuyển sang object); mọi khác biệt
+# được trả về dạng danh sách thông báo.
+# frames: dict {nhãn nguồn: DataFrame}; trả về (DataFrame, danh sách thông báo)
+def combine_frames(frames, source_col=SOURCE_COLUMN):
+    columns = []
+    kinds = {}
+    for label, df in frames.items():
+        for col in df.columns:
+            if col not in kinds:
+                columns.append(col)
+                kinds[col] = {}
+            kind = _column_kind(df[col])
+            if kind is not None:
+                kinds[col].setdefault(kind, []).append(label)
+
+    issues = []
+    for label, df in frames.items():
+        missing = [str(col) for col in columns if col not in df.columns]
+        if missing:
+            issues.append(f"{label}: thiếu cột {', '.join(missing)}")
+    for col, by_kind in kinds.items():
+        if len(by_kind) > 1:
+            detail = '; '.join(f"{kind} ở {', '.join(labels)}" for kind, labels in by_kind.items())
+            issues.append(f"Cột '{col}' khác kiểu giữa các nguồn: {detail}")
+
+    while source_col in kinds:
+        source_col = f"{source_col}_"
+    labels = list(frames.keys())
+    lengths = [len(df) for df in frames.values()]
+    combined = pd.concat([df.reindex(columns=columns) for df in frames.values()], ignore_index=True)
+    codes = np.repeat(np.arange(len(labels)), lengths)
+    combined.insert(0, source_col, pd.Categorical.from_codes(codes, categories=labels))
+    return combined, issues
+
+
+# Nối các dòng của delta vào cuối base theo đúng các cột của base.
+# Cột thiếu trong delta để trống, cột chỉ có trong delta bị bỏ qua; cột phân loại
+# (category) của base nhận thêm các nhãn mới của delta. Mọi khác biệt được trả về dạng
+# danh sách thông báo. Trả về (DataFrame, danh sách thông báo).
+def append_frames(base, delta):
+    shared = [col for col in base.columns if col in delta.columns]
+    if not shared:
+        raise ValueError("không có cột nào trùng với dữ liệu hiện tại")
+
+    issues = []
+    missing = [str(col) for col in base.columns if col not in delta.columns]
+    extra = [str(col) for col in delta.columns if col not in base.columns]
+    if missing:
+        issues.append(f"thiếu cột {', '.join(missing)} (để trống)")
+    if extra:
+        issues.append(f"bỏ qua cột không có trong dữ liệu hiện tại: {', '.join(extra)}")
+    for col in shared:
+        before, after = _column_kind(base[col]), _column_kind(delta[col])
+        if before is not None and after is not None and before != after:
+            issues.append(f"cột '{col}' có kiểu {after}, dữ liệu hiện tại là {before}")
+
+    delta = delta.reindex(columns=base.columns)
+    columns = {}
+    for col in base.columns:
+        if isinstance(base[col].dtype, pd.CategoricalDtype):
+            try:
+                columns[col] = pd.Series(pd.api.types.union_categoricals(
+                    [base[col].array, pd.Categorical(delta[col])], sort_categories=True, ignore_order=True
+                ))
+                continue
+            except TypeError:
+                # Nhãn của delta khác kiểu với nhãn hiện có: ghép thường (pandas chuyển sang object)
+                pass
+        columns[col] = pd.concat([base[col], delta[col]], ignore_index=True)
+    return pd.DataFrame(columns), issues
+
+
+# Đặt tên cho các ô tiêu đề trống và đánh số các tên trùng, giống cách pandas làm
+def _clean_header(values):
+    header = []
+    seen = {}
+    for idx, value in enumerate(values):
+        name = f"Unnamed: {idx}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+# Đọc dòng tiêu đề của từng sheet (chế độ read-only, không nạp dữ liệu)
+def read_sheet_headers(file_bytes):
+    wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        headers = {}
+        for ws in wb.worksheets:
+            first = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            headers[ws.title] = _clean_header(first)
+        return headers
+    finally:
+        wb.close()
+
+
+# Đọc một sheet theo luồng bằng chế độ read-only của openpyxl.
+# Các dòng được gom thành từng khối, mỗi khối chuyển ngay sang mảng có kiểu của từng cột,
+# nên bộ nhớ đỉnh chỉ xấp xỉ dữ liệu dạng cột cuối cùng cộng với một khối.
+# - usecols: danh sách tên cột cần đọc (None = tất cả)
+# - start_row: dòng dữ liệu bắt đầu (1 = dòng ngay dưới tiêu đề)
+# - nrows: số dòng tối đa (None = đến hết sheet)
+# - progress: hàm progress(số dòng đã đọc, tổng số dòng dự kiến hoặc None)
+def stream_sheet(file_bytes, sheet_name=None, usecols=None, start_row=1, nrows=None,
+                 chunk_rows=STREAM_CHUNK_ROWS, progress=None):
+    wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+        header = _clean_header(next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ()))
+
+        if usecols is None:
+            col_idx = list(range(len(header)))
+        else:
+            wanted = set(usecols)
+            col_idx = [i for i, name in enumerate(header) if name in wanted]
+        names = [header[i] for i in col_idx]
+
+        # ws.max_row lấy từ thẻ dimension của sheet, có thể không có
+        total = None
+        if ws.max_row:
+            total = max(ws.max_row - start_row, 0)
+            if nrows is not None:
+                total = min(total, nrows)
+
+        max_row = start_row + nrows if nrows is not None else None
+        chunks = [[] for _ in col_idx]
+        buffers = [[] for _ in col_idx]
+        done = 0
+
+        def flush():
+            for buf, parts in zip(buffers, chunks):
+                parts.append(pd.Series(buf))
+                buf.clear()
+            if progress is not None:
+                progress(done, total)
+
+        for row in ws.iter_rows(min_row=start_row + 1, max_row=max_row, values_only=True):
+            for buf, i in zip(buffers, col_idx):
+                buf.append(row[i] if i < len(row) else None)
+            done += 1
+            if done % chunk_rows == 0:
+                flush()
+        if done % chunk_rows or done == 0:
+            flush()
+    finally:
+        wb.close()
+
+    data = {}
+    for name, parts in zip(names, chunks):
+        column = pd.concat(parts, ignore_index=True)
+        parts.clear()
+        # Khối toàn ô trống có kiểu object, suy lại kiểu sau khi ghép
+        data[name] = column.infer_objects() if column.dtype == object else column
+    return pd.DataFrame(data)
+
+
+# Nén kiểu dữ liệu sau khi đọc, không làm mất thông tin:
+# - cột chuỗi có ít giá trị khác nhau (<= max_category_ratio số dòng) -> category
+# - cột số nguyên -> kiểu nguyên nhỏ nhất chứa được mọi giá trị
+# - cột số thực mà mọi giá trị đều là số nguyên (không có ô trống) -> kiểu nguyên nhỏ nhất
+# Trả về (DataFrame mới, số byte trước, số byte sau)
+def compact_dtypes(df, max_category_ratio=0.5):
+    before = int(df.memory_usage(deep=True).sum())
+    compacted = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) > 0 and series.nunique(dropna=True) <= max_category_ratio * len(series):
+                try:
+                    series = series.astype('category')
+                except TypeError:
+                    # Cột lẫn kiểu không so sánh được với nhau thì giữ nguyên
+                    pass
+        elif pd.api.types.is_bool_dtype(series):
+            pass
+        elif pd.api.types.is_integer_dtype(series):
+            series = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            if series.notna().all() and (series % 1 == 0).all():
+                series = pd.to_numeric(series, downcast='integer')
+        compacted[col] = series
+    result = pd.DataFrame(compacted, index=df.index)
+    after = int(result.memory_usage(deep=True).sum())
+    return result, before, after
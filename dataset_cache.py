@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DATASET_CACHE_MB = float(os.environ.get('DATASET_CACHE_MB', '4096'))
+# Thời gian (giây) một bộ dữ liệu không được dùng trước khi bị bỏ khỏi bộ nhớ; 0 = không hết hạn
+DEFAULT_DATASET_CACHE_TTL = float(os.environ.get('DATASET_CACHE_TTL', '3600'))
+
+
+# Dung lượng bộ nhớ ước tính của một giá trị trong cache (DataFrame, mảng, dict/list/tuple lồng
+# nhau, đối tượng kết quả tính toán). Đối tượng có thuộc tính nbytes tự theo dõi dung lượng của nó.
+def value_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(v) for v in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if hasattr(value, '__dict__'):
+        return value_nbytes(vars(value))
+    return 0
+
+
+# Giá trị có dung lượng tăng dần sau khi vào cache (vd. hồ sơ dữ liệu tích lũy kết quả):
+# dung lượng được đo lại mỗi lần truy cập cache
+def _grows(value):
+    return not isinstance(value, (pd.DataFrame, pd.Series, np.ndarray, dict, list, tuple)) and hasattr(value, 'nbytes')
+
+
+# Bản xem không sao chép dữ liệu: DataFrame mới dùng chung bộ đệm của cột với bản trong cache.
+# Với copy-on-write (luôn bật từ pandas 3.0, bản tối thiểu trong requirements.txt), sửa trên
+# bản xem sẽ tự tách bản sao, bản trong cache không đổi.
+def _view(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return {k: _view(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_view(v) for v in value)
+    if isinstance(value, list):
+        return [_view(v) for v in value]
+    return value
+
+
+# Cache dữ liệu chỉ đọc dùng chung cho mọi phiên trong tiến trình.
+# Mỗi khóa (dẫn xuất từ mã băm nội dung file) chỉ có một bản trong bộ nhớ; nhiều phiên mở
+# cùng một file nhận các bản xem của cùng dữ liệu. Khi tổng dung lượng vượt ngân sách, các
+# mục lâu không dùng nhất bị bỏ trước (LRU); mục không được dùng quá ttl giây cũng bị bỏ.
+# Mục có dung lượng tăng dần (hồ sơ dữ liệu) được đo lại ở mỗi lần truy cập.
+class DatasetCache:
+    def __init__(self, max_bytes=DEFAULT_DATASET_CACHE_MB * 1024 * 1024, ttl=DEFAULT_DATASET_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Mỗi khóa đang được nạp có một khóa riêng để các phiên khác chờ thay vì nạp trùng
+        self._loading = {}
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def __contains__(self, key):
+        with self._lock:
+            self._expire()
+            self._refresh()
+            return key in self._entries
+
+    def _hit(self, key):
+        entry = self._entries[key]
+        self._entries.move_to_end(key)
+        entry['hits'] += 1
+        entry['last_access'] = time.time()
+        return _view(entry['value'])
+
+    # Trả về (bản xem của giá trị, True nếu đã có sẵn); load() chỉ chạy khi chưa có.
+    # label: mô tả ngắn hiển thị trong trang quản trị
+    def get(self, key, load, label=None):
+        with self._lock:
+            self._expire()
+            self._refresh()
+            if key in self._entries:
+                return self._hit(key), True
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if key in self._entries:
+                    return self._hit(key), True
+            try:
+                value = load()
+                self._insert(key, value, label)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return _view(value), False
+
+    def _insert(self, key, value, label):
+        size = value_nbytes(value)
+        now = time.time()
+        with self._lock:
+            # Giá trị lớn hơn cả ngân sách vẫn được trả về cho phiên đang cần, chỉ không giữ lại
+            if size > self.max_bytes:
+                return
+            self._entries[key] = {
+                'value': value,
+                'bytes': size,
+                'grows': _grows(value),
+                'label': label or str(key),
+                'hits': 0,
+                'created': now,
+                'last_access': now
+            }
+            self._bytes += size
+            self._shrink()
+
+    # Bỏ các mục lâu không dùng nhất cho tới khi về dưới ngân sách (gọi khi đang giữ self._lock)
+    def _shrink(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._pop(next(iter(self._entries)))
+
+    # Đo lại các mục có dung lượng tăng dần (gọi khi đang giữ self._lock)
+    def _refresh(self):
+        changed = False
+        for entry in self._entries.values():
+            if entry['grows']:
+                size = value_nbytes(entry['value'])
+                if size != entry['bytes']:
+                    self._bytes += size - entry['bytes']
+                    entry['bytes'] = size
+                    changed = True
+        if changed:
+            self._shrink()
+
+    def _pop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['bytes']
+
+    # Bỏ các mục quá hạn (gọi khi đang giữ self._lock)
+    def _expire(self):
+        if self.ttl <= 0:
+            return
+        deadline = time.time() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry['last_access'] < deadline]
+        for key in expired:
+            self._pop(key)
+
+    def remove(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # Danh sách các mục đang nằm trong bộ nhớ, mục dùng gần nhất đứng đầu
+    def entries(self):
+        with self._lock:
+            self._expire()
+            self._refresh()
+            return [
+                {k: entry[k] for k in ('label', 'bytes', 'hits', 'created', 'last_access')}
+                for entry in reversed(self._entries.values())
+            ]
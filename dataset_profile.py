@@ -0,0 +1,200 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+from chart_data import HISTOGRAM_BINS, box_whiskers, histogram_counts
+from correlation import frame_comoments
+from dataset_cache import value_nbytes
+from groupby_engine import group_aggregates
+from perf_metrics import stage
+from pivot_cube import build_cube
+from row_filter import CategoryIndex, RangeIndex
+from sketches import merge_sketches, sketch_columns
+from stats_engine import summarize_numeric, summary_from_sketches
+from time_series import date_buckets, datetime_values, detect_time_columns, parse_dates, period_buckets, period_keys
+
+
+# Hồ sơ của một phiên bản dữ liệu (file, sheet, tham số đọc/lọc).
+# Giữ các kết quả tính toán nặng - thống kê mô tả, ma trận tương quan, chỉ mục nhóm,
+# bảng tổng hợp theo nhóm - để các lần rerun do đổi widget chỉ việc đọc lại.
+# key: định danh phiên bản dữ liệu, dùng làm tiền tố khóa cho các cache bên ngoài (figure...)
+# nbytes: dung lượng ước tính của các kết quả đã lưu (không gồm df, vốn thuộc về mục dữ liệu
+# riêng trong cache dữ liệu), để hồ sơ nằm trong ngân sách bộ nhớ của cache dữ liệu.
+class DatasetProfile:
+    def __init__(self, df, key=None):
+        self.df = df
+        self.key = key
+        self.numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+        self.categorical_columns = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        self._results = {}
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        # Mỗi khóa có khóa tính toán riêng: các luồng nền tính những kết quả khác nhau song song,
+        # luồng cần đúng kết quả đang được tính thì chờ thay vì tính trùng
+        self._key_locks = {}
+
+    # Lấy kết quả theo khóa, chỉ gọi compute() ở lần đầu.
+    # Trả về (giá trị, True nếu lấy từ cache / False nếu vừa tính)
+    def get(self, key, compute):
+        if key in self._results:
+            return self._results[key], True
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key in self._results:
+                return self._results[key], True
+            # Mỗi lần tính thật sự là một giai đoạn được đo (tên = khóa hoặc phần tử đầu của khóa)
+            with stage(key if isinstance(key, str) else key[0], rows=len(self.df)):
+                value = compute()
+            self._store(key, value)
+            return value, False
+
+    def _store(self, key, value):
+        self._results[key] = value
+        self.nbytes += value_nbytes(value)
+
+    # Kết quả đã được tính và lưu lại chưa
+    def cached(self, key):
+        return key in self._results
+
+    # Sketch gộp được của từng cột số (số đếm, tổng, phương sai, min/max, phân vị, số giá trị duy nhất)
+    def sketches(self):
+        return self.get('sketches', lambda: sketch_columns(self.df, self.numeric_columns))
+
+    # approx=True: thống kê xấp xỉ bằng sketch, không sắp xếp toàn bộ cột
+    def summary(self, approx=False):
+        if approx:
+            return self.get('summary_approx', lambda: summary_from_sketches(self.df, self.numeric_columns, self.sketches()[0]))
+        return self.get('summary', lambda: summarize_numeric(self.df, self.numeric_columns))
+
+    # Mô-men gộp được của tương quan theo cặp cột
+    def comoments(self):
+        return self.get('comoments', lambda: frame_comoments(self.df, self.numeric_columns))
+
+    def correlation(self):
+        return self.get('correlation', lambda: self.comoments()[0].correlation())
+
+    def _values(self, column):
+        return self.df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # Tần số histogram của một cột, biên lấy từ min/max của thống kê mô tả
+    def histogram(self, column, bins=HISTOGRAM_BINS, approx=False):
+        def compute():
+            summary, _ = self.summary(approx)
+            i = summary.position(column)
+            return histogram_counts(self._values(column), summary.min[i], summary.max[i], bins)
+        return self.get(('histogram', column, bins, approx), compute)
+
+    # Thống kê của biểu đồ hộp: tứ phân vị và trung bình lấy từ thống kê mô tả,
+    # chỉ râu và mẫu điểm ngoại lai cần thêm một lượt qua cột
+    def box(self, column, approx=False):
+        def compute():
+            summary, _ = self.summary(approx)
+            i = summary.position(column)
+            stats = box_whiskers(self._values(column), summary.q25[i], summary.q75[i])
+            stats.update(q1=summary.q25[i], median=summary.median[i], q3=summary.q75[i], mean=summary.mean[i])
+            return stats
+        return self.get(('box', column, approx), compute)
+
+    # Mã số nguyên của từng dòng theo nhóm và nhãn của các nhóm (NaN có mã -1)
+    def group_index(self, column):
+        def compute():
+            codes, labels = pd.factorize(self.df[column], sort=True)
+            return codes, labels
+        return self.get(('group_index', column), compute)
+
+    # Chỉ mục lọc theo nhóm (danh sách dòng của từng nhóm), dùng chung mã nhóm với group_index
+    def category_index(self, column):
+        def compute():
+            (codes, labels), _ = self.group_index(column)
+            return CategoryIndex(codes, labels)
+        return self.get(('category_index', column), compute)
+
+    # Chỉ mục lọc khoảng giá trị (hoán vị sắp xếp) của một cột số
+    def range_index(self, column):
+        return self.get(('range_index', column), lambda: RangeIndex(self._values(column)))
+
+    # Thứ tự sắp xếp tăng dần của một cột, lấy từ chỉ mục lọc của cột:
+    # (các dòng có giá trị theo thứ tự, các dòng trống)
+    def sort_order(self, column):
+        def compute():
+            if column in self.numeric_columns:
+                index, _ = self.range_index(column)
+                return index.order, np.flatnonzero(np.isnan(index.values))
+            index, _ = self.category_index(column)
+            return index.rows, np.flatnonzero(index.codes < 0)
+        return self.get(('sort_order', column), compute)
+
+    # Tổng hợp sum/mean/count/min/max của mọi cột số theo một cột phân loại, tính một lần
+    def groups(self, group_col):
+        def compute():
+            (codes, labels), _ = self.group_index(group_col)
+            return group_aggregates(self.df, group_col, self.numeric_columns, codes, labels)
+        return self.get(('groups', group_col), compute)
+
+    # Bảng tổng hợp theo nhóm cho các cột được chọn, đọc từ kết quả tổng hợp đã cache
+    def group_agg(self, group_col, value_cols, func):
+        aggregates, cached = self.groups(group_col)
+        return aggregates.frame(func, value_cols), cached
+
+    # Các cột thời gian nhận diện được: {cột: 'datetime' | 'period'}
+    def time_columns(self):
+        return self.get('time_columns', lambda: detect_time_columns(self.df))
+
+    # Mã kỳ của từng dòng và nhãn các kỳ khi gộp cột thời gian theo freq ('D', 'W', 'M').
+    # Cột văn bản chỉ parse các giá trị khác nhau (mã nhóm dùng chung với group_index).
+    def time_buckets(self, column, freq):
+        def compute():
+            kinds, _ = self.time_columns()
+            if kinds[column] == 'period':
+                (codes, labels), _ = self.group_index(column)
+                keys = period_keys(labels)
+                return period_buckets(np.where(codes >= 0, keys[codes], -1))
+            if pd.api.types.is_datetime64_any_dtype(self.df[column]):
+                values = datetime_values(self.df[column])
+            else:
+                (codes, labels), _ = self.group_index(column)
+                dates = np.append(parse_dates(labels), np.datetime64('NaT', 'ns'))
+                values = dates[codes]
+            return date_buckets(values, freq)
+        return self.get(('time_buckets', column, freq), compute)
+
+    # Tổng hợp sum/mean/count/min/max của mọi cột số theo kỳ thời gian, tính một lần cho mỗi mức gộp
+    def time_aggregates(self, column, freq):
+        def compute():
+            (codes, labels), _ = self.time_buckets(column, freq)
+            return group_aggregates(self.df, column, self.numeric_columns, codes, labels)
+        return self.get(('time_aggregates', column, freq), compute)
+
+    # Hồ sơ của dữ liệu sau khi nối thêm các dòng delta vào cuối (df = dữ liệu cũ + delta).
+    # Các kết quả gộp được đã tính trên dữ liệu cũ - sketch từng cột, mô-men tương quan, tổng
+    # hợp theo nhóm - được gộp với kết quả tính riêng trên delta, nên chi phí theo số dòng của
+    # delta. Các kết quả còn lại (thống kê chính xác cần sắp xếp, chỉ mục, khối pivot...) được
+    # tính lại trên toàn bộ dữ liệu khi cần. Kết quả của hồ sơ cũ không bị thay đổi.
+    def extend(self, delta, df, key=None):
+        profile = DatasetProfile(df, key)
+        if profile.numeric_columns != self.numeric_columns:
+            return profile
+        part = DatasetProfile(delta)
+        with stage('extend', rows=len(delta)):
+            for result_key, value in list(self._results.items()):
+                name = result_key if isinstance(result_key, str) else result_key[0]
+                if name == 'sketches':
+                    merged = merge_sketches([copy.deepcopy(value), part.sketches()[0]])
+                elif name == 'comoments':
+                    merged = copy.deepcopy(value).merge(frame_comoments(delta, self.numeric_columns, value.shift))
+                elif name == 'groups' and result_key[1] in part.categorical_columns:
+                    merged = copy.deepcopy(value).merge(part.groups(result_key[1])[0])
+                else:
+                    continue
+                profile._store(result_key, merged)
+        return profile
+
+    # Khối tổng hợp trên tích các chiều phân loại; None nếu vượt ngân sách bộ nhớ
+    def cube(self, dims):
+        def compute():
+            indexes = {dim: self.group_index(dim)[0] for dim in dims}
+            return build_cube(self.df, dims, indexes, self.numeric_columns)
+        return self.get(('cube', tuple(dims)), compute)
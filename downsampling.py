@@ -0,0 +1,88 @@
+import numpy as np
+
+DEFAULT_MAX_POINTS = 2000
+
+METHODS = {
+    'LTTB': 'lttb',
+    'Min-Max theo khoảng': 'minmax'
+}
+
+
+# Largest-Triangle-Three-Buckets: giữ lại n_out điểm sao cho hình dạng đường
+# (kể cả các đỉnh và đáy) gần với dữ liệu gốc nhất. Trả về vị trí các điểm được chọn.
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+
+        # Điểm thứ ba của tam giác: trung bình của khoảng kế tiếp
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+# Chia dữ liệu thành n_out/2 khoảng đều nhau, giữ điểm nhỏ nhất và lớn nhất của mỗi khoảng
+def minmax_indices(y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.intp)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        part = y[start:end]
+        selected.append(start + int(np.argmin(part)))
+        selected.append(start + int(np.argmax(part)))
+    return np.unique(np.array(selected, dtype=np.intp))
+
+
+# Vị trí các dòng cần vẽ cho các cột đã chọn trong khoảng dòng [start, stop).
+# Mỗi cột được rút gọn riêng (bỏ qua ô trống) rồi lấy hợp các vị trí,
+# để mọi đường trên cùng biểu đồ dùng chung trục X.
+def downsample_positions(df, columns, max_points, method='lttb', start=0, stop=None):
+    stop = len(df) if stop is None else min(stop, len(df))
+    window = df.iloc[start:stop]
+    if len(window) <= max_points:
+        return np.arange(start, stop)
+
+    index = window.index
+    if np.issubdtype(index.dtype, np.number):
+        x_all = index.to_numpy(dtype=np.float64)
+    else:
+        x_all = np.arange(len(window), dtype=np.float64)
+
+    per_column = max(max_points // max(len(columns), 1), 3)
+    keep = []
+    for col in columns:
+        y_all = window[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(y_all))
+        if len(valid) == 0:
+            continue
+        if method == 'minmax':
+            chosen = minmax_indices(y_all[valid], per_column)
+        else:
+            chosen = lttb_indices(x_all[valid], y_all[valid], per_column)
+        keep.append(valid[chosen])
+
+    if not keep:
+        return np.arange(start, min(stop, start + max_points))
+    return start + np.unique(np.concatenate(keep))
@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_FIGURE_CACHE_MB = float(os.environ.get('FIGURE_CACHE_MB', '64'))
+
+# Các thuộc tính mảng dữ liệu của trace (phần chiếm gần hết kích thước một figure)
+ARRAY_PROPS = ('x', 'y', 'z', 'values', 'labels', 'text', 'hovertext', 'customdata', 'ids')
+NESTED_ARRAY_PROPS = {'marker': ('color', 'size'), 'line': ('color', 'width')}
+# Phần cố định của layout và của mỗi trace khi ước lượng kích thước
+FIGURE_OVERHEAD_BYTES = 4096
+TRACE_OVERHEAD_BYTES = 512
+# Plotly gửi mảng numpy dưới dạng base64: mỗi 3 byte dữ liệu thành 4 ký tự
+BASE64_RATIO = 4 / 3
+
+
+def _value_bytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        value = np.asarray(value)
+    return int(getattr(value, 'nbytes', 8) * BASE64_RATIO)
+
+
+# Ước lượng kích thước figure theo nbytes của các mảng dữ liệu trong trace thay vì mã hóa
+# cả figure sang JSON: Streamlit đã mã hóa một lần khi hiển thị, mã hóa thêm chỉ để đo là lãng phí
+def estimate_figure_bytes(figure):
+    size = FIGURE_OVERHEAD_BYTES
+    for trace in figure.data:
+        size += TRACE_OVERHEAD_BYTES
+        for name in ARRAY_PROPS:
+            if name in trace:
+                size += _value_bytes(trace[name])
+        for parent, names in NESTED_ARRAY_PROPS.items():
+            if parent in trace:
+                for name in names:
+                    if name in trace[parent]:
+                        size += _value_bytes(trace[parent][name])
+    return size
+
+
+# Cache LRU cho các figure Plotly đã dựng, giới hạn theo tổng kích thước ước lượng của figure.
+# Khóa là (phiên bản dữ liệu, loại biểu đồ, tham số); khi quay lại một biểu đồ đã xem
+# thì dùng lại figure cũ thay vì gom nhóm, rút gọn điểm và dựng lại từ đầu.
+# Cache giữ đối tượng figure nên chỉ bỏ được bước dựng: st.plotly_chart không nhận spec đã
+# mã hóa sẵn, nên vẫn mã hóa figure sang JSON mỗi lần vẽ.
+class FigureCache:
+    def __init__(self, max_bytes=DEFAULT_FIGURE_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Trả về (figure, True nếu lấy từ cache); build() chỉ được gọi khi chưa có
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0], True
+            self.misses += 1
+
+        figure = build()
+        size = estimate_figure_bytes(figure)
+        with self._lock:
+            # Figure lớn hơn cả ngân sách thì không giữ lại
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (figure, size)
+                self._bytes += size
+                self._evict()
+        return figure, False
+
+    # Bỏ các figure lâu không dùng nhất cho đến khi về dưới ngân sách
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from job_pool import report_progress
+from stats_engine import BLOCK_COLS
+
+AGG_FUNCS = ('sum', 'mean', 'count', 'min', 'max')
+
+
+# Kết quả tổng hợp theo một cột phân loại cho tất cả cột số cùng lúc.
+# Các mảng có dạng (số nhóm, số cột số); nhãn nhóm theo thứ tự đã sắp xếp như groupby.
+class GroupAggregates:
+    def __init__(self, group_col, labels, columns, integer, size, count, total, minimum, maximum):
+        self.group_col = group_col
+        self.labels = labels
+        self.columns = list(columns)
+        self.integer = integer
+        self.size = size
+        self.count = count
+        self.sum = total
+        self.min = minimum
+        self.max = maximum
+        self._pos = {col: i for i, col in enumerate(self.columns)}
+
+    @property
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.sum / np.maximum(self.count, 1), np.nan)
+
+    # Gộp kết quả tổng hợp của một phần dữ liệu khác (cùng cột nhóm và các cột số) vào đây:
+    # nhãn nhóm là hợp của hai bên (vẫn theo thứ tự đã sắp xếp), size/count/sum cộng lại,
+    # min/max lấy nhỏ nhất/lớn nhất
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("Chỉ gộp được kết quả tổng hợp của cùng các cột số")
+        mine = pd.Index(np.asarray(self.labels, dtype=object))
+        theirs = pd.Index(np.asarray(other.labels, dtype=object))
+        labels = mine.append(theirs).unique()
+        try:
+            labels = labels.sort_values()
+        except TypeError:
+            # Nhãn lẫn kiểu không so sánh được: giữ thứ tự xuất hiện
+            pass
+        a = labels.get_indexer(mine)
+        b = labels.get_indexer(theirs)
+        shape = (len(labels), len(self.columns))
+
+        size = np.zeros(len(labels), dtype=np.int64)
+        count = np.zeros(shape)
+        total = np.zeros(shape)
+        minimum = np.full(shape, np.nan)
+        maximum = np.full(shape, np.nan)
+        size[a] += self.size
+        size[b] += other.size
+        count[a] += self.count
+        count[b] += other.count
+        total[a] += self.sum
+        total[b] += other.sum
+        minimum[a] = self.min
+        minimum[b] = np.fmin(minimum[b], other.min)
+        maximum[a] = self.max
+        maximum[b] = np.fmax(maximum[b], other.max)
+
+        self.labels = labels
+        self.integer = self.integer & other.integer
+        self.size, self.count, self.sum, self.min, self.max = size, count, total, minimum, maximum
+        return self
+
+    # Bảng giống df.groupby(group_col, observed=True)[value_cols].agg(func).reset_index()
+    def frame(self, func, value_cols):
+        idx = [self._pos[col] for col in value_cols]
+        observed = self.size > 0
+        values = getattr(self, func)[observed][:, idx]
+        integer = self.integer[idx]
+
+        result = pd.DataFrame({self.group_col: self.labels[observed]})
+        for j, col in enumerate(value_cols):
+            column = values[:, j]
+            # Cột nguyên giữ kiểu nguyên khi kết quả không có ô trống (giống pandas)
+            if func == 'count' or (integer[j] and func in ('sum', 'min', 'max') and not np.isnan(column).any()):
+                column = column.astype(np.int64)
+            result[col] = column
+        return result
+
+
+# Tổng hợp sum/count/min/max cho mọi cột số theo mã nhóm đã factorize.
+# Các dòng được sắp xếp ổn định theo mã nhóm một lần (radix sort khi ít nhóm),
+# sau đó mỗi phép tổng hợp là một lần reduceat trên khối 2-D đã sắp xếp.
+def group_aggregates(df, group_col, columns, codes, labels):
+    columns = list(columns)
+    n_groups = len(labels)
+    k = len(columns)
+    integer = np.array([pd.api.types.is_integer_dtype(df[col]) for col in columns], dtype=bool)
+
+    keep = np.flatnonzero(codes >= 0)
+    small_codes = codes[keep].astype(np.int16 if n_groups < np.iinfo(np.int16).max else np.int64)
+    order = keep[np.argsort(small_codes, kind='stable')]
+    size = np.bincount(codes[keep], minlength=n_groups)
+    observed = size > 0
+    starts = np.concatenate([[0], np.cumsum(size)[:-1]])[observed]
+
+    count = np.zeros((n_groups, k))
+    total = np.zeros((n_groups, k))
+    minimum = np.full((n_groups, k), np.nan)
+    maximum = np.full((n_groups, k), np.nan)
+
+    for start in range(0, k, BLOCK_COLS):
+        report_progress(start, k)
+        part = slice(start, start + BLOCK_COLS)
+        block = df[columns[part]].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        if len(block) == 0:
+            continue
+        valid = ~np.isnan(block)
+        count[observed, part] = np.add.reduceat(valid, starts, axis=0)
+        total[observed, part] = np.add.reduceat(np.where(valid, block, 0.0), starts, axis=0)
+        # fmin/fmax bỏ qua NaN; nhóm toàn ô trống cho NaN
+        minimum[observed, part] = np.fmin.reduceat(block, starts, axis=0)
+        maximum[observed, part] = np.fmax.reduceat(block, starts, axis=0)
+
+    return GroupAggregates(group_col, labels, columns, integer, size, count, total, minimum, maximum)
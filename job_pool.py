@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_JOB_WORKERS = int(os.environ.get('JOB_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Số tác vụ đã xong được giữ lại (kèm kết quả) để lần rerun sau nhận lại thay vì tính lại
+DEFAULT_JOB_RESULTS = 64
+
+# Tác vụ đang chạy trong luồng hiện tại (mỗi luồng của pool chạy một tác vụ tại một thời điểm)
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Báo tiến độ từ bên trong phép tính (done / total); đồng thời là điểm dừng: nếu tác vụ đã bị
+# hủy thì dừng ngay bằng JobCancelled. Không làm gì khi không chạy trong tác vụ nền.
+def report_progress(done, total):
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    if job.cancel_requested:
+        raise JobCancelled()
+    if total:
+        job.progress = min(max(done / total, 0.0), 1.0)
+
+
+# Một phép tính chạy nền. waiters: các chủ (phiên, phần trang) đang chờ kết quả;
+# tác vụ chỉ bị hủy khi không còn ai chờ.
+class Job:
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.progress = 0.0
+        self.cancel_requested = False
+        self.waiters = set()
+        self.submitted = time.time()
+        self.future = None
+
+    def done(self):
+        return self.future.done()
+
+    @property
+    def cancelled(self):
+        return self.future.cancelled() or (self.future.done() and isinstance(self.future.exception(), JobCancelled))
+
+    def result(self):
+        return self.future.result()
+
+    # Hủy hợp tác: tác vụ chưa chạy bị bỏ khỏi hàng đợi, tác vụ đang chạy dừng ở report_progress kế tiếp
+    def cancel(self):
+        self.cancel_requested = True
+        self.future.cancel()
+
+
+# Pool luồng có giới hạn cho các phép tính nặng, dùng chung cho mọi phiên.
+# Tác vụ được nhận diện theo khóa đầu vào: gửi lại cùng khóa thì nhận lại tác vụ đang chạy
+# hoặc kết quả đã xong. Mỗi chủ chỉ chờ một tác vụ; khi chủ chuyển sang khóa khác (đầu vào
+# thay đổi), tác vụ cũ bị hủy nếu không còn chủ nào khác chờ.
+# on_start: gọi ở đầu mỗi tác vụ trong luồng của pool (vd. gắn bộ ghi hiệu năng)
+class JobPool:
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, max_results=DEFAULT_JOB_RESULTS, on_start=None):
+        self.max_workers = max_workers
+        self.max_results = max_results
+        self.on_start = on_start
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def _run(self, job, func):
+        _current.job = job
+        try:
+            if job.cancel_requested:
+                raise JobCancelled()
+            if self.on_start is not None:
+                self.on_start()
+            result = func()
+            job.progress = 1.0
+            return result
+        finally:
+            _current.job = None
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def submit(self, key, func, owner=None, label=None):
+        with self._lock:
+            job = self._jobs.get(key)
+            # Tác vụ đã hủy không giữ kết quả: gửi lại thì chạy lại từ đầu
+            if job is not None and job.cancel_requested:
+                del self._jobs[key]
+                job = None
+            if job is None:
+                job = Job(key, label or str(key))
+                job.future = self._executor.submit(self._run, job, func)
+                self._jobs[key] = job
+            else:
+                self._jobs.move_to_end(key)
+            if owner is not None:
+                self._watch(owner, job)
+            self._trim()
+            return job
+
+    # Chủ không còn chờ tác vụ nào (vd. phần trang đã có đủ kết quả)
+    def release(self, owner):
+        with self._lock:
+            self._watch(owner, None)
+
+    def cancel(self, key):
+        with self._lock:
+            job = self._jobs.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+    # Gọi khi đang giữ self._lock
+    def _watch(self, owner, job):
+        previous = self._owners.get(owner)
+        if previous is job:
+            return
+        if previous is not None:
+            previous.waiters.discard(owner)
+            if not previous.waiters and not previous.done():
+                previous.cancel()
+                self._jobs.pop(previous.key, None)
+        if job is None:
+            self._owners.pop(owner, None)
+        else:
+            job.waiters.add(owner)
+            self._owners[owner] = job
+
+    # Bỏ các tác vụ đã xong lâu nhất khi vượt số kết quả được giữ (gọi khi đang giữ self._lock)
+    def _trim(self):
+        finished = [key for key, job in self._jobs.items() if job.done()]
+        for key in finished[:max(0, len(finished) - self.max_results)]:
+            del self._jobs[key]
+
+    # Các tác vụ đang chạy hoặc chờ chạy
+    def pending(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done()]
@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+# Thư mục ghi metrics (Prometheus dạng text và log JSON từng giai đoạn); để trống = không ghi ra file
+DEFAULT_METRICS_DIR = os.environ.get('PERF_METRICS_DIR', '')
+PROMETHEUS_FILE = 'metrics.prom'
+JSON_LOG_FILE = 'stages.jsonl'
+METRIC_PREFIX = 'excel_analyzer'
+# Biên trên (giây) các bucket của histogram thời gian mỗi giai đoạn
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Số bản ghi gần nhất giữ lại cho mỗi phiên
+HISTORY_SIZE = 500
+
+# Bộ ghi đang hoạt động của luồng hiện tại (mỗi phiên Streamlit chạy script trong luồng riêng)
+_active = threading.local()
+
+# Số phiên đang bật đo bộ nhớ: tracemalloc chung cho cả tiến trình nên chỉ dừng khi không còn phiên nào cần
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+
+
+def _retain_tracing():
+    global _tracing_sessions
+    with _tracing_lock:
+        _tracing_sessions += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _release_tracing():
+    global _tracing_sessions
+    with _tracing_lock:
+        _tracing_sessions = max(0, _tracing_sessions - 1)
+        if _tracing_sessions == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+# Tổng hợp metrics của mọi phiên trong tiến trình: số lần chạy, tổng thời gian, histogram
+# thời gian, tổng số dòng và bộ nhớ đỉnh lớn nhất của từng giai đoạn.
+# Nếu có thư mục ghi: mỗi giai đoạn thêm một dòng vào log JSON, file Prometheus được ghi
+# lại (thay thế nguyên tử) sau mỗi giai đoạn ngoài cùng để bộ thu textfile đọc được.
+# Khóa số liệu chỉ giữ khi cập nhật và chụp lại nội dung cần ghi; việc ghi file dùng khóa
+# riêng để các phiên và tác vụ nền không phải chờ nhau vì I/O đĩa.
+class MetricsRegistry:
+    def __init__(self, output_dir=DEFAULT_METRICS_DIR):
+        self.output_dir = output_dir
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._version = 0
+        self._written_version = 0
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+    def observe(self, record):
+        with self._lock:
+            stats = self._stages.get(record['stage'])
+            if stats is None:
+                stats = self._stages[record['stage']] = {
+                    'count': 0,
+                    'seconds': 0.0,
+                    'rows': 0,
+                    'peak_bytes': 0,
+                    'buckets': [0] * len(DURATION_BUCKETS)
+                }
+            stats['count'] += 1
+            stats['seconds'] += record['seconds']
+            stats['rows'] += record['rows'] or 0
+            stats['peak_bytes'] = max(stats['peak_bytes'], record['peak_bytes'] or 0)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if record['seconds'] <= bound:
+                    stats['buckets'][i] += 1
+            if not self.output_dir:
+                return
+            self._version += 1
+            version = self._version
+            prometheus = _prometheus_text(self._stages) if record['depth'] == 0 else None
+
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._write_lock:
+            with open(os.path.join(self.output_dir, JSON_LOG_FILE), 'a', encoding='utf-8') as f:
+                f.write(line)
+            # Bỏ qua nếu một luồng khác đã ghi nội dung mới hơn
+            if prometheus is not None and version > self._written_version:
+                self._write_prometheus(prometheus)
+                self._written_version = version
+
+    # Bảng tổng hợp theo giai đoạn: số lần, tổng / trung bình thời gian, số dòng, bộ nhớ đỉnh
+    def snapshot(self):
+        with self._lock:
+            return {stage: dict(stats, buckets=list(stats['buckets'])) for stage, stats in self._stages.items()}
+
+    def prometheus_text(self):
+        return _prometheus_text(self.snapshot())
+
+    # Gọi khi đang giữ self._write_lock
+    def _write_prometheus(self, text):
+        path = os.path.join(self.output_dir, PROMETHEUS_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Nội dung định dạng text của Prometheus cho các metrics đã tổng hợp
+def _prometheus_text(stages):
+    lines = [
+        f"# HELP {METRIC_PREFIX}_stage_seconds Wall time of each pipeline stage.",
+        f"# TYPE {METRIC_PREFIX}_stage_seconds histogram"
+    ]
+    for stage, stats in stages.items():
+        label = _label(stage)
+        for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {count}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{label}"}} {stats["seconds"]:.6f}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{label}"}} {stats["count"]}')
+    lines += [
+        f"# HELP {METRIC_PREFIX}_stage_rows_total Rows processed by each pipeline stage.",
+        f"# TYPE {METRIC_PREFIX}_stage_rows_total counter"
+    ]
+    for stage, stats in stages.items():
+        lines.append(f'{METRIC_PREFIX}_stage_rows_total{{stage="{_label(stage)}"}} {stats["rows"]}')
+    lines += [
+        f"# HELP {METRIC_PREFIX}_stage_peak_bytes Largest traced peak memory of each pipeline stage.",
+        f"# TYPE {METRIC_PREFIX}_stage_peak_bytes gauge"
+    ]
+    for stage, stats in stages.items():
+        lines.append(f'{METRIC_PREFIX}_stage_peak_bytes{{stage="{_label(stage)}"}} {stats["peak_bytes"]}')
+    return "\n".join(lines) + "\n"
+
+
+# Bộ ghi thời gian của một phiên: mỗi lần chạy lại script là một lượt (run), mỗi giai đoạn
+# ghi thời gian thực, số dòng xử lý và (nếu bật) bộ nhớ đỉnh theo tracemalloc.
+# Giai đoạn lồng nhau được phép; bộ nhớ đỉnh của giai đoạn ngoài gồm cả các giai đoạn con.
+class StageRecorder:
+    def __init__(self, registry=None):
+        self.registry = registry
+        self.session = uuid.uuid4().hex[:8]
+        self.run = 0
+        self.trace_memory = False
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._stack = []
+        self._tracing = None
+
+    # Bắt đầu một lượt chạy mới và gắn bộ ghi vào luồng hiện tại.
+    # tracemalloc là chung cho cả tiến trình: khi nhiều phiên cùng đo, bộ nhớ đỉnh gồm cả
+    # cấp phát của phiên khác, và việc đo làm chậm mọi phiên nên chỉ bật khi cần. Mỗi phiên
+    # bật đo giữ một lượt đếm (trả lại khi tắt hoặc khi bộ ghi bị thu hồi cùng phiên);
+    # tracemalloc chỉ dừng khi không còn phiên nào đang đo.
+    def begin_run(self, trace_memory=False):
+        if trace_memory and self._tracing is None:
+            _retain_tracing()
+            self._tracing = weakref.finalize(self, _release_tracing)
+        elif not trace_memory and self._tracing is not None:
+            self._tracing()
+            self._tracing = None
+        self.trace_memory = trace_memory
+        self.run += 1
+        self._stack = []
+        self.activate()
+
+    # Gắn bộ ghi vào luồng hiện tại (đầu mỗi lần chạy lại toàn trang hoặc một fragment)
+    def activate(self):
+        _active.recorder = self
+
+    # Các giai đoạn của lượt chạy gần nhất (gồm cả các lần chạy lại từng phần sau đó), theo thứ tự bắt đầu
+    def last_run(self):
+        return sorted((r for r in self.history if r['run'] == self.run), key=lambda r: r['time'])
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        frame = {'rows': rows, 'start_mem': 0, 'peak': 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Đỉnh của giai đoạn cha tính đến lúc này được giữ lại trước khi đặt lại bộ đếm đỉnh
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start_mem'] = frame['peak'] = current
+        self._stack.append(frame)
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            seconds = time.perf_counter() - started
+            self._stack.pop()
+            peak_bytes = None
+            if tracing and tracemalloc.is_tracing():
+                peak_bytes = max(frame['peak'], tracemalloc.get_traced_memory()[1]) - frame['start_mem']
+            record = {
+                'time': started_at,
+                'session': self.session,
+                'run': self.run,
+                'stage': name,
+                'depth': len(self._stack),
+                'seconds': seconds,
+                'rows': None if frame['rows'] is None else int(frame['rows']),
+                'peak_bytes': peak_bytes
+            }
+            self.history.append(record)
+            if self.registry is not None:
+                self.registry.observe(record)
+
+
+# Đo một giai đoạn bằng bộ ghi đang hoạt động của luồng hiện tại; không làm gì nếu chưa có
+# (chạy ngoài Streamlit, CLI hàng loạt...). Có thể gán frame['rows'] khi chỉ biết số dòng sau khi chạy.
+@contextmanager
+def stage(name, rows=None):
+    recorder = getattr(_active, 'recorder', None)
+    if recorder is None:
+        yield {'rows': rows}
+        return
+    with recorder.stage(name, rows) as frame:
+        yield frame
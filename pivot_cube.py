@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from groupby_engine import group_aggregates
+
+DEFAULT_CUBE_MAX_MB = float(os.environ.get('CUBE_MAX_MB', '256'))
+
+
+# Khối tổng hợp (cube) trên tích của nhiều cột phân loại.
+# Chỉ lưu các ô thực sự có dữ liệu: mỗi ô giữ count/sum/min/max của mọi cột số,
+# nên mọi cách nhóm con, drill-down hay bảng pivot đều được cuộn lên từ các ô
+# mà không phải quét lại các dòng dữ liệu. Ô trống của một chiều có mã len(nhãn của chiều):
+# dòng đó bị bỏ khi nhóm theo chiều này (như groupby) nhưng vẫn được tính khi nhóm theo chiều khác.
+class PivotCube:
+    def __init__(self, dims, dim_labels, cell_codes, aggregates):
+        self.dims = list(dims)
+        self.dim_labels = dim_labels
+        self.cell_codes = cell_codes
+        self.columns = aggregates.columns
+        self.integer = aggregates.integer
+        self.count = aggregates.count
+        self.sum = aggregates.sum
+        self.min = aggregates.min
+        self.max = aggregates.max
+        self._pos = {col: i for i, col in enumerate(self.columns)}
+
+    @property
+    def n_cells(self):
+        return len(self.cell_codes)
+
+    @property
+    def nbytes(self):
+        return self.cell_codes.nbytes + self.count.nbytes + self.sum.nbytes + self.min.nbytes + self.max.nbytes
+
+    # Cuộn khối lên theo các chiều group_dims (có thể rỗng = tổng chung).
+    # where: {chiều: nhãn} để drill-down vào một phần của khối.
+    # Trả về bảng dạng dài: các cột chiều + các cột giá trị.
+    def rollup(self, group_dims, value_cols, func, where=None):
+        cells = np.ones(self.n_cells, dtype=bool)
+        for dim, label in (where or {}).items():
+            d = self.dims.index(dim)
+            matches = np.flatnonzero(np.asarray(self.dim_labels[d] == label))
+            cells &= np.isin(self.cell_codes[:, d], matches)
+
+        idx = [self.dims.index(dim) for dim in group_dims]
+        for d in idx:
+            cells &= self.cell_codes[:, d] < len(self.dim_labels[d])
+        cells = np.flatnonzero(cells)
+        if idx:
+            shape = tuple(len(self.dim_labels[d]) for d in idx)
+            keys = np.ravel_multi_index(tuple(self.cell_codes[cells][:, d] for d in idx), shape)
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+        else:
+            unique_keys = np.zeros(1, dtype=np.intp)
+            inverse = np.zeros(len(cells), dtype=np.intp)
+        n_groups = len(unique_keys)
+
+        result = {}
+        if idx:
+            for dim, d, codes in zip(group_dims, idx, np.unravel_index(unique_keys, shape)):
+                result[dim] = self.dim_labels[d][codes]
+
+        for col in value_cols:
+            j = self._pos[col]
+            count = np.bincount(inverse, weights=self.count[cells, j], minlength=n_groups)
+            if func in ('sum', 'mean'):
+                total = np.bincount(inverse, weights=self.sum[cells, j], minlength=n_groups)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = total if func == 'sum' else np.where(count > 0, total / count, np.nan)
+            elif func == 'count':
+                values = count
+            else:
+                values = np.full(n_groups, np.nan)
+                reduce = np.fmin if func == 'min' else np.fmax
+                reduce.at(values, inverse, (self.min if func == 'min' else self.max)[cells, j])
+            if func == 'count' or (self.integer[j] and func in ('sum', 'min', 'max') and not np.isnan(values).any()):
+                values = values.astype(np.int64)
+            result[col] = values
+        return pd.DataFrame(result)
+
+    # Bảng pivot: hàng theo row_dim, cột theo col_dim
+    def pivot(self, row_dim, col_dim, value_col, func, where=None):
+        long = self.rollup([row_dim, col_dim], [value_col], func, where)
+        return long.pivot(index=row_dim, columns=col_dim, values=value_col)
+
+
+# Ước lượng bộ nhớ của khối với n_cells ô, d chiều và k cột số
+def estimate_cube_bytes(n_cells, n_dims, n_columns):
+    return n_cells * (n_dims + 4 * n_columns) * 8
+
+
+# Dựng khối từ mã nhóm đã factorize của từng chiều.
+# Trả về None nếu số ô vượt ngân sách bộ nhớ (khi đó nên tính trực tiếp trên dữ liệu).
+def build_cube(df, dims, group_indexes, columns, max_bytes=DEFAULT_CUBE_MAX_MB * 1024 * 1024):
+    codes = [group_indexes[dim][0] for dim in dims]
+    labels = [group_indexes[dim][1] for dim in dims]
+    shape = tuple(len(lab) + 1 for lab in labels)
+
+    # Tích số nhóm quá lớn để mã hóa trong int64 thì chắc chắn vượt ngân sách
+    if np.prod([float(n) for n in shape]) >= np.iinfo(np.int64).max:
+        return None
+
+    # Ô trống (mã -1) được dời thành mã cuối của chiều
+    shifted = tuple(np.where(c >= 0, c, len(lab)) for c, lab in zip(codes, labels))
+    combined = np.ravel_multi_index(shifted, shape)
+
+    cell_keys, cell_of_row = np.unique(combined, return_inverse=True)
+    if estimate_cube_bytes(len(cell_keys), len(dims), len(columns)) > max_bytes:
+        return None
+
+    cell_codes = np.column_stack(np.unravel_index(cell_keys, shape)).reshape(len(cell_keys), len(dims))
+    aggregates = group_aggregates(df, None, columns, cell_of_row, np.arange(len(cell_keys)))
+    return PivotCube(dims, labels, cell_codes, aggregates)
+
+
+# Phương án dự phòng khi không dựng được khối: tính trực tiếp trên các dòng, cùng dạng kết quả với rollup
+def direct_rollup(df, group_dims, value_cols, func, where=None):
+    for dim, label in (where or {}).items():
+        df = df[df[dim] == label]
+    if not group_dims:
+        return df[list(value_cols)].agg(func).to_frame().T.reset_index(drop=True)
+    return df.groupby(list(group_dims), observed=True)[list(value_cols)].agg(func).reset_index()
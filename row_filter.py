@@ -0,0 +1,94 @@
+import numpy as np
+
+# Cột phân loại có nhiều nhóm hơn số này không được lọc bằng danh sách chọn
+MAX_FILTER_LABELS = 1000
+
+
+# Đưa các vị trí dòng về thứ tự tăng dần: sắp xếp khi ít, đánh dấu trên mảng bool khi nhiều
+def _in_row_order(positions, n_rows):
+    if len(positions) * 16 < n_rows:
+        return np.sort(positions)
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[positions] = True
+    return np.flatnonzero(mask)
+
+
+# Chỉ mục lọc của một cột phân loại: mã nhóm của từng dòng và danh sách dòng của từng nhóm
+# (các dòng sắp xếp ổn định theo mã, nhóm j nằm trong rows[offsets[j]:offsets[j + 1]]).
+class CategoryIndex:
+    def __init__(self, codes, labels):
+        self.codes = codes
+        self.labels = labels
+        keep = np.flatnonzero(codes >= 0)
+        self.rows = keep[np.argsort(codes[keep], kind='stable')]
+        self.sizes = np.bincount(codes[keep], minlength=len(labels))
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)])
+        self._positions = {label: i for i, label in enumerate(labels)}
+
+    def _selected(self, values):
+        return [self._positions[v] for v in values if v in self._positions]
+
+    def count(self, values):
+        return int(self.sizes[self._selected(values)].sum())
+
+    # Các dòng thuộc những nhóm được chọn, theo thứ tự dòng
+    def positions(self, values):
+        parts = [self.rows[self.offsets[j]:self.offsets[j + 1]] for j in self._selected(values)]
+        if not parts:
+            return np.zeros(0, dtype=np.intp)
+        return _in_row_order(np.concatenate(parts), len(self.codes))
+
+    # Giữ lại các vị trí ứng viên thuộc những nhóm được chọn
+    def keep(self, candidates, values):
+        # Bảng tra theo mã nhóm; phần tử cuối (mã -1 = ô trống) luôn là False
+        table = np.zeros(len(self.labels) + 1, dtype=bool)
+        table[self._selected(values)] = True
+        return candidates[table[self.codes[candidates]]]
+
+
+# Chỉ mục lọc khoảng của một cột số: hoán vị sắp xếp các dòng có giá trị (bỏ NaN) và giá trị
+# đã sắp xếp, nên các dòng trong [lo, hi] là một đoạn liên tiếp tìm bằng tìm kiếm nhị phân.
+class RangeIndex:
+    def __init__(self, values):
+        self.values = values
+        valid = np.flatnonzero(~np.isnan(values))
+        self.order = valid[np.argsort(values[valid], kind='stable')]
+        self.sorted_values = values[self.order]
+
+    @property
+    def bounds(self):
+        if len(self.sorted_values) == 0:
+            return np.nan, np.nan
+        return float(self.sorted_values[0]), float(self.sorted_values[-1])
+
+    def _span(self, lo, hi):
+        return (np.searchsorted(self.sorted_values, lo, side='left'),
+                np.searchsorted(self.sorted_values, hi, side='right'))
+
+    def count(self, lo, hi):
+        start, stop = self._span(lo, hi)
+        return int(stop - start)
+
+    def positions(self, lo, hi):
+        start, stop = self._span(lo, hi)
+        return _in_row_order(self.order[start:stop], len(self.values))
+
+    def keep(self, candidates, lo, hi):
+        values = self.values[candidates]
+        return candidates[(values >= lo) & (values <= hi)]
+
+
+# Vị trí các dòng thỏa mọi điều kiện. conditions: danh sách (chỉ mục, tham số) với tham số là
+# ((nhãn,...),) cho CategoryIndex hoặc (lo, hi) cho RangeIndex.
+# Điều kiện chọn lọc nhất (ít dòng nhất, biết được chỉ từ chỉ mục) sinh tập ứng viên,
+# các điều kiện còn lại chỉ kiểm tra trên tập đó, nên chi phí theo số dòng được chọn
+# chứ không theo số dòng của cả bảng.
+def filter_positions(conditions):
+    counts = [index.count(*args) for index, args in conditions]
+    driver = int(np.argmin(counts))
+    index, args = conditions[driver]
+    candidates = index.positions(*args)
+    for i, (index, args) in enumerate(conditions):
+        if i != driver and len(candidates):
+            candidates = index.keep(candidates, *args)
+    return candidates
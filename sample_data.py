@@ -0,0 +1,53 @@
+import string
+
+import numpy as np
+import pandas as pd
+
+# Các cột của dữ liệu bán hàng mẫu; cột thêm (nếu có) là các cột số "Chỉ số k"
+BASE_COLUMNS = (
+    'Mã sản phẩm', 'Loại sản phẩm', 'Giá bán', 'Số lượng', 'Doanh thu',
+    'Chi phí', 'Lợi nhuận', 'Tháng', 'Khu vực'
+)
+MONTHS = ('Tháng 1', 'Tháng 2', 'Tháng 3', 'Tháng 4')
+REGIONS = ('Miền Bắc', 'Miền Trung', 'Miền Nam')
+
+
+# Nhãn của cardinality loại sản phẩm: A, B, C... rồi L0027, L0028... khi vượt quá 26 loại
+def category_labels(cardinality):
+    letters = string.ascii_uppercase
+    if cardinality <= len(letters):
+        return list(letters[:cardinality])
+    width = len(str(cardinality))
+    return list(letters) + [f"L{i:0{width}d}" for i in range(len(letters) + 1, cardinality + 1)]
+
+
+def _choice(rng, labels, n_rows):
+    return np.asarray(labels, dtype=object)[rng.integers(0, len(labels), n_rows)]
+
+
+# Dữ liệu bán hàng mẫu sinh bằng các phép toán trên cả mảng (không lặp theo dòng), dùng cho
+# nút tạo file mẫu và bộ benchmark. n_columns: tổng số cột (tối thiểu bằng số cột cơ bản,
+# phần dư là các cột số thêm); cardinality: số loại sản phẩm khác nhau.
+def generate_sales(n_rows, n_columns=len(BASE_COLUMNS), cardinality=4, seed=42):
+    if n_columns < len(BASE_COLUMNS):
+        raise ValueError(f"Cần ít nhất {len(BASE_COLUMNS)} cột")
+    if cardinality < 1:
+        raise ValueError("Số loại sản phẩm phải lớn hơn 0")
+    rng = np.random.default_rng(seed)
+
+    width = max(3, len(str(n_rows)))
+    codes = np.char.zfill(np.arange(1, n_rows + 1).astype(f"U{width}"), width)
+    data = {
+        'Mã sản phẩm': np.char.add('SP', codes),
+        'Loại sản phẩm': _choice(rng, category_labels(cardinality), n_rows),
+        'Giá bán': rng.uniform(10000, 500000, n_rows),
+        'Số lượng': rng.integers(10, 1000, n_rows),
+        'Doanh thu': rng.uniform(500000, 5000000, n_rows),
+        'Chi phí': rng.uniform(200000, 3000000, n_rows),
+        'Lợi nhuận': rng.uniform(-100000, 2000000, n_rows),
+        'Tháng': _choice(rng, MONTHS, n_rows),
+        'Khu vực': _choice(rng, REGIONS, n_rows)
+    }
+    for k in range(1, n_columns - len(BASE_COLUMNS) + 1):
+        data[f"Chỉ số {k}"] = rng.normal(100, 15, n_rows)
+    return pd.DataFrame(data)
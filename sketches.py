@@ -0,0 +1,243 @@
+import numpy as np
+
+from job_pool import report_progress
+
+# Sai số tương đối của phân vị xấp xỉ và độ chính xác (số bit chỉ số thanh ghi) của HyperLogLog
+RELATIVE_ACCURACY = 0.01
+HLL_PRECISION = 14
+# Số dòng mỗi khối khi quét dữ liệu: mỗi khối dựng sketch riêng rồi gộp vào kết quả chung
+SKETCH_CHUNK_ROWS = 1_000_000
+
+
+# Bộ đếm theo chỉ số ô nguyên, lưu dạng mảng liền kề bắt đầu từ offset
+class _BucketStore:
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _extend(self, lo, hi):
+        if len(self.counts) == 0:
+            self.offset = lo
+            self.counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            return
+        new_lo = min(lo, self.offset)
+        new_hi = max(hi, self.offset + len(self.counts) - 1)
+        if new_lo == self.offset and new_hi == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_hi - new_lo + 1, dtype=np.int64)
+        counts[self.offset - new_lo:self.offset - new_lo + len(self.counts)] = self.counts
+        self.offset = new_lo
+        self.counts = counts
+
+    def add(self, indices):
+        if len(indices) == 0:
+            return
+        lo = int(indices.min())
+        hi = int(indices.max())
+        self._extend(lo, hi)
+        self.counts[lo - self.offset:hi - self.offset + 1] += np.bincount(indices - lo)
+
+    def merge(self, other):
+        if len(other.counts) == 0:
+            return
+        self._extend(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+
+# Sketch phân vị với sai số tương đối cố định (kiểu DDSketch): mỗi giá trị được đếm vào ô
+# logarit thứ ceil(log_gamma(|x|)), nên ước lượng của mọi phân vị lệch không quá
+# relative_accuracy so với giá trị đúng. Cập nhật chỉ gồm một phép log và một bincount,
+# không cần sắp xếp; hai sketch cùng độ chính xác gộp được bằng cách cộng số đếm.
+class QuantileSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive = _BucketStore()
+        self.negative = _BucketStore()
+        self.zero_count = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    # values: mảng số thực không có NaN
+    def update(self, values):
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        negative = -values[values < 0]
+        self.zero_count += len(values) - len(positive) - len(negative)
+        self.positive.add(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64))
+        self.negative.add(np.ceil(np.log(negative) / self._log_gamma).astype(np.int64))
+        return self
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Chỉ gộp được các sketch có cùng độ chính xác")
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    # Giá trị đại diện của phần tử thứ rank (0 = nhỏ nhất) trong dữ liệu đã sắp xếp
+    def _value_at(self, rank, cumulative, values):
+        return values[np.searchsorted(cumulative, rank, side='right')]
+
+    # Phân vị q nội suy tuyến tính giữa hai thứ hạng liền kề, giống pandas
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        # Thứ tự tăng dần: các ô âm từ trị tuyệt đối lớn nhất, ô 0, rồi các ô dương
+        neg_idx = self.negative.offset + np.arange(len(self.negative.counts))
+        pos_idx = self.positive.offset + np.arange(len(self.positive.counts))
+        scale = 2 / (self.gamma + 1)
+        values = np.concatenate([
+            -scale * self.gamma ** neg_idx[::-1].astype(np.float64),
+            [0.0],
+            scale * self.gamma ** pos_idx.astype(np.float64)
+        ])
+        counts = np.concatenate([self.negative.counts[::-1], [self.zero_count], self.positive.counts])
+        cumulative = np.cumsum(counts)
+
+        pos = q * (self.count - 1)
+        lo = self._value_at(np.floor(pos), cumulative, values)
+        hi = self._value_at(np.ceil(pos), cumulative, values)
+        estimate = lo + (hi - lo) * (pos - np.floor(pos))
+        return float(np.clip(estimate, self.min, self.max))
+
+
+# Băm 64 bit (splitmix64) trên bit của giá trị số thực; -0.0 được đưa về 0.0
+def _hash64(values):
+    z = np.ascontiguousarray(values + 0.0, dtype=np.float64).view(np.uint64)
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+# Đếm số giá trị khác nhau kiểu HyperLogLog: 2^precision thanh ghi, mỗi thanh ghi giữ
+# số bit 0 đầu dài nhất (+1) của các giá trị băm rơi vào nó. Gộp = lấy max từng thanh ghi.
+class DistinctSketch:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    # Độ lệch chuẩn tương đối của ước lượng
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    # values: mảng số thực không có NaN
+    def update(self, values):
+        if len(values) == 0:
+            return self
+        bits = 64 - self.precision
+        hashed = _hash64(values)
+        index = (hashed >> np.uint64(bits)).astype(np.intp)
+        rest = hashed & np.uint64((1 << bits) - 1)
+        # Độ dài bit của rest (< 2^53 nên chuyển sang số thực là chính xác); rest = 0 cho bits + 1
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (bits + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Chỉ gộp được các sketch có cùng độ chính xác")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Ít giá trị: dùng đếm tuyến tính theo số thanh ghi còn trống
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+# Tóm tắt gộp được của một cột số: số đếm, tổng, trung bình và tổng bình phương độ lệch
+# (gộp theo công thức của Chan), min/max, số giá trị khác 0, sketch phân vị và sketch đếm phân biệt.
+class ColumnSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, precision=HLL_PRECISION):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.nonzero = 0
+        self.quantiles = QuantileSketch(relative_accuracy)
+        self.distinct = DistinctSketch(precision)
+
+    @property
+    def min(self):
+        return self.quantiles.min if self.count else np.nan
+
+    @property
+    def max(self):
+        return self.quantiles.max if self.count else np.nan
+
+    @property
+    def var(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    # values: một khối giá trị của cột (NaN = ô trống, được bỏ qua)
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        chunk = ColumnSketch(self.quantiles.relative_accuracy, self.distinct.precision)
+        chunk.count = len(values)
+        chunk.total = float(values.sum())
+        chunk.mean = chunk.total / chunk.count
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.nonzero = int(np.count_nonzero(values))
+        chunk.quantiles.update(values)
+        chunk.distinct.update(values)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.count = count
+            self.total += other.total
+            self.nonzero += other.nonzero
+        self.quantiles.merge(other.quantiles)
+        self.distinct.merge(other.distinct)
+        return self
+
+
+# Dựng sketch cho từng cột số trong một lượt quét theo khối dòng
+def sketch_columns(df, columns, chunk_rows=SKETCH_CHUNK_ROWS):
+    sketches = {}
+    for i, col in enumerate(columns):
+        values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        sketch = ColumnSketch()
+        for start in range(0, len(values), chunk_rows):
+            report_progress(i * len(values) + start, len(columns) * len(values))
+            sketch.update(values[start:start + chunk_rows])
+        sketches[col] = sketch
+    return sketches
+
+
+# Gộp các dict {cột: ColumnSketch} (từ nhiều khối, nhiều sheet hay nhiều file) theo tên cột
+def merge_sketches(parts):
+    merged = {}
+    for part in parts:
+        for col, sketch in part.items():
+            if col in merged:
+                merged[col].merge(sketch)
+            else:
+                merged[col] = sketch
+    return merged
@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+
+from job_pool import report_progress
+from sketches import RELATIVE_ACCURACY, DistinctSketch, sketch_columns
+
+# Số cột xử lý cùng lúc: giới hạn bộ nhớ tạm (khối số thực + bản sắp xếp) với sheet rất rộng
+BLOCK_COLS = 32
+
+
+# Kết quả thống kê mô tả cho tất cả cột số, tính một lần và dùng chung cho cả ba tab.
+# Mỗi thuộc tính là một mảng numpy theo thứ tự của columns.
+class NumericSummary:
+    def __init__(self, columns, rows, integer, count, missing, nonzero, total,
+                 mean, var, minimum, q25, median, q75, maximum, nunique, error_bounds=None):
+        self.columns = list(columns)
+        self.rows = rows
+        self.integer = integer
+        self.count = count.astype(np.int64)
+        self.missing = missing.astype(np.int64)
+        self.nonzero = nonzero.astype(np.int64)
+        self.sum = total
+        self.mean = mean
+        self.var = var
+        self.std = np.sqrt(var)
+        self.min = minimum
+        self.q25 = q25
+        self.median = median
+        self.q75 = q75
+        self.max = maximum
+        self.nunique = nunique.astype(np.int64)
+        # None = thống kê chính xác; chế độ xấp xỉ: {'quantile': sai số tương đối của phân vị,
+        # 'distinct': độ lệch chuẩn tương đối của số giá trị duy nhất}
+        self.error_bounds = error_bounds
+        self._pos = {col: i for i, col in enumerate(self.columns)}
+
+    # Vị trí của cột trong các mảng thống kê
+    def position(self, col):
+        return self._pos[col]
+
+    # Tổng của các cột được chọn, giống df[cols].sum()
+    def totals(self, cols):
+        return pd.Series([self.sum[self._pos[col]] for col in cols], index=list(cols))
+
+    # Bảng giống df.describe()
+    def describe(self):
+        return pd.DataFrame(
+            [self.count, self.mean, self.std, self.min, self.q25, self.median, self.q75, self.max],
+            index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+            columns=self.columns
+        )
+
+    # Bảng thống kê chi tiết của tab "Chi Tiết"
+    def table(self):
+        return pd.DataFrame({
+            'Cột': self.columns,
+            'Tổng': self.sum,
+            'Trung Bình': self.mean,
+            'Trung Vị': self.median,
+            'Độ Lệch Chuẩn': self.std,
+            'Min': self.min,
+            'Max': self.max,
+            'Số Giá Trị Thiếu': self.missing,
+            'Số Giá Trị Khác 0': self.nonzero
+        })
+
+    # Tỷ lệ trung bình giữa từng cặp cột (hàng / cột), như phần "Thống kê so sánh"
+    def mean_ratios(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios = self.mean[:, None] / self.mean[None, :]
+        return pd.DataFrame(ratios, index=self.columns, columns=self.columns)
+
+    # Các chỉ số của một cột cho tab "Phân Tích Từng Cột"; cột nguyên giữ kiểu nguyên
+    def column(self, col):
+        i = self._pos[col]
+
+        def exact(value):
+            if self.integer[i] and np.isfinite(value):
+                return int(value)
+            return float(value)
+
+        return {
+            'Số lượng': int(self.rows),
+            'Tổng': exact(self.sum[i]),
+            'Trung bình': float(self.mean[i]),
+            'Trung vị': float(self.median[i]),
+            'Độ lệch chuẩn': float(self.std[i]),
+            'Phương sai': float(self.var[i]),
+            'Giá trị nhỏ nhất': exact(self.min[i]),
+            'Giá trị lớn nhất': exact(self.max[i]),
+            'Quartile 25%': float(self.q25[i]),
+            'Quartile 75%': float(self.q75[i]),
+            'Số giá trị thiếu': int(self.missing[i]),
+            'Số giá trị duy nhất': int(self.nunique[i])
+        }
+
+
+# Phân vị nội suy tuyến tính (giống pandas) trên khối đã sắp xếp theo cột, NaN nằm cuối
+def _sorted_quantile(sorted_block, count, q):
+    result = np.full(sorted_block.shape[1], np.nan)
+    has = count > 0
+    if not has.any():
+        return result
+    pos = q * (count[has] - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.ceil(pos).astype(np.intp)
+    cols = np.flatnonzero(has)
+    lo_val = sorted_block[lo, cols]
+    hi_val = sorted_block[hi, cols]
+    result[has] = lo_val + (hi_val - lo_val) * (pos - lo)
+    return result
+
+
+# Mặt nạ (length x số cột) đánh dấu các cặp liền kề đều nằm trong phần hợp lệ của cột
+def _valid_prefix(count, length):
+    return np.arange(1, length + 1)[:, None] < count[None, :]
+
+
+# Tính toàn bộ thống kê trên khối 2-D của các cột số:
+# lượt 1 cộng dồn tổng/số đếm, lượt 2 tính độ lệch bình phương quanh trung bình,
+# và một lần sắp xếp theo cột cho min/max, phân vị và số giá trị duy nhất.
+def summarize_numeric(df, columns):
+    columns = list(columns)
+    k = len(columns)
+    rows = len(df)
+    out = {name: np.empty(k) for name in (
+        'count', 'missing', 'nonzero', 'sum', 'mean', 'var',
+        'min', 'q25', 'median', 'q75', 'max', 'nunique'
+    )}
+    integer = np.array([pd.api.types.is_integer_dtype(df[col]) for col in columns], dtype=bool)
+    nullable = np.array([pd.api.types.is_extension_array_dtype(df[col]) for col in columns], dtype=bool)
+
+    for start in range(0, k, BLOCK_COLS):
+        report_progress(start, k)
+        part = slice(start, start + BLOCK_COLS)
+        block = df[columns[part]].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        total = np.where(valid, block, 0.0).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, total / count, np.nan)
+            centered = np.where(valid, block - mean, 0.0)
+            var = np.where(count > 1, (centered ** 2).sum(axis=0) / (count - 1), np.nan)
+        del centered
+
+        # NaN khác 0 nên được tính là "khác 0", giống (df[col] != 0).sum();
+        # riêng kiểu nullable (Int64, Float64...) thì pd.NA != 0 cho NA và không được đếm
+        out['nonzero'][part] = (block != 0).sum(axis=0) - np.where(nullable[part], rows - count, 0)
+        out['count'][part] = count
+        out['missing'][part] = rows - count
+        out['sum'][part] = total
+        out['mean'][part] = mean
+        out['var'][part] = var
+
+        block.sort(axis=0)
+        has = count > 0
+        cols = np.flatnonzero(has)
+        out['min'][part] = np.nan
+        out['max'][part] = np.nan
+        if cols.size:
+            out['min'][part][has] = block[0, cols]
+            out['max'][part][has] = block[count[has] - 1, cols]
+        out['q25'][part] = _sorted_quantile(block, count, 0.25)
+        out['median'][part] = _sorted_quantile(block, count, 0.5)
+        out['q75'][part] = _sorted_quantile(block, count, 0.75)
+
+        # Giá trị duy nhất = số lần giá trị thay đổi trong phần hợp lệ đã sắp xếp + 1
+        changes = (block[1:] != block[:-1]) & _valid_prefix(count, block.shape[0] - 1)
+        out['nunique'][part] = np.where(has, changes.sum(axis=0) + 1, 0)
+
+    return NumericSummary(
+        columns, rows, integer,
+        out['count'], out['missing'], out['nonzero'], out['sum'], out['mean'], out['var'],
+        out['min'], out['q25'], out['median'], out['q75'], out['max'], out['nunique']
+    )
+
+
+# Thống kê mô tả xấp xỉ cho dữ liệu rất lớn: một lượt quét theo khối dòng, không sắp xếp.
+# Tổng, trung bình, phương sai, min/max và số đếm vẫn chính xác; phân vị và số giá trị
+# duy nhất lấy từ sketch (sai số ghi trong error_bounds).
+def summarize_approx(df, columns):
+    return summary_from_sketches(df, columns, sketch_columns(df, columns))
+
+
+# Thống kê mô tả từ sketch đã dựng (hoặc đã gộp) của từng cột; df chỉ dùng cho số dòng và kiểu cột
+def summary_from_sketches(df, columns, sketches):
+    columns = list(columns)
+    rows = len(df)
+    integer = np.array([pd.api.types.is_integer_dtype(df[col]) for col in columns], dtype=bool)
+    nullable = np.array([pd.api.types.is_extension_array_dtype(df[col]) for col in columns], dtype=bool)
+    parts = [sketches[col] for col in columns]
+
+    def collect(get):
+        return np.array([get(sk) for sk in parts], dtype=np.float64)
+
+    count = collect(lambda sk: sk.count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, collect(lambda sk: sk.total) / count, np.nan)
+    # Ô trống được tính là "khác 0" như summarize_numeric (trừ kiểu nullable)
+    nonzero = collect(lambda sk: sk.nonzero) + np.where(nullable, 0, rows - count)
+
+    error_bounds = {'quantile': RELATIVE_ACCURACY, 'distinct': DistinctSketch().relative_error}
+    return NumericSummary(
+        columns, rows, integer,
+        count, rows - count, nonzero, collect(lambda sk: sk.total), mean, collect(lambda sk: sk.var),
+        collect(lambda sk: sk.min), collect(lambda sk: sk.quantiles.quantile(0.25)),
+        collect(lambda sk: sk.quantiles.quantile(0.5)), collect(lambda sk: sk.quantiles.quantile(0.75)),
+        collect(lambda sk: sk.max), collect(lambda sk: min(sk.distinct.estimate(), sk.count)),
+        error_bounds=error_bounds
+    )
+
+
+# Thống kê xu hướng theo thứ tự dòng: thay đổi trung bình, tăng và giảm nhiều nhất giữa hai dòng liên tiếp
+def trend_table(df, columns):
+    columns = list(columns)
+    block = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    diff = np.diff(block, axis=0)
+    valid = ~np.isnan(diff)
+    has = valid.any(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, diff, 0.0).sum(axis=0) / valid.sum(axis=0)
+    maximum = np.full(len(columns), np.nan)
+    minimum = np.full(len(columns), np.nan)
+    if has.any():
+        maximum[has] = np.nanmax(diff[:, has], axis=0)
+        minimum[has] = np.nanmin(diff[:, has], axis=0)
+    return pd.DataFrame({
+        'Thay đổi trung bình': mean,
+        'Tăng nhiều nhất': maximum,
+        'Giảm nhiều nhất': minimum
+    }, index=columns)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (50, 100, 500, 1000)
+
+
+# Các dòng (theo thứ tự dòng gốc) có giá trị chứa chuỗi term, không phân biệt hoa thường, ở bất kỳ
+# cột nào trong indexes (chỉ mục nhóm CategoryIndex của từng cột). Chỉ so khớp trên các giá trị
+# khác nhau của mỗi cột, sau đó tra mã nhóm của từng dòng.
+def search_rows(indexes, term, n_rows):
+    term = term.lower()
+    hits = np.zeros(n_rows, dtype=bool)
+    for index in indexes:
+        text = pd.Index(np.asarray(index.labels, dtype=object)).map(str).str.lower()
+        # Phần tử cuối ứng với mã -1 (ô trống), không bao giờ khớp
+        matched = np.append(np.asarray(text.str.contains(term, regex=False), dtype=bool), False)
+        hits |= matched[index.codes]
+    return np.flatnonzero(hits)
+
+
+# Thứ tự xem của bảng theo trang. order: các dòng có giá trị đã sắp xếp tăng dần theo cột
+# được chọn (None = thứ tự gốc), missing: các dòng trống của cột đó (luôn ở cuối, kể cả khi
+# giảm dần); rows: chỉ giữ các dòng này (kết quả tìm kiếm).
+# Lấy một trang chỉ cắt các mảng thứ tự nên tốn chi phí theo kích thước trang; khi có rows,
+# thứ tự được lọc một lần khi tạo view rồi dùng cho mọi trang.
+class TableView:
+    def __init__(self, n_rows, order=None, missing=None, descending=False, rows=None):
+        self.descending = descending and order is not None
+        if rows is not None and order is not None:
+            keep = np.zeros(n_rows, dtype=bool)
+            keep[rows] = True
+            order = order[keep[order]]
+            missing = missing[keep[missing]]
+        elif rows is not None:
+            order = rows
+        self.order = order
+        self.missing = missing if missing is not None else np.zeros(0, dtype=np.intp)
+        self.n_rows = n_rows if order is None else len(order) + len(self.missing)
+
+    def __len__(self):
+        return self.n_rows
+
+    # Vị trí dòng gốc của các dòng [start, stop) trong view
+    def page(self, start, stop):
+        stop = min(stop, self.n_rows)
+        if self.order is None:
+            return np.arange(start, stop)
+        n_valid = len(self.order)
+        if self.descending:
+            head = self.order[max(n_valid - stop, 0):max(n_valid - start, 0)][::-1]
+        else:
+            head = self.order[start:stop]
+        tail = self.missing[max(start - n_valid, 0):max(stop - n_valid, 0)]
+        return np.concatenate([head, tail])
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Các module của ứng dụng nằm phẳng ở thư mục gốc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Bảng ngẫu nhiên dùng chung: cột số thực có ô trống, cột nguyên, cột toàn ô trống,
+# cột phân loại có ô trống và một nhóm chỉ có một dòng
+def random_frame(n_rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(100, 15, n_rows)
+    x[rng.random(n_rows) < 0.1] = np.nan
+    region = rng.choice(['Bắc', 'Trung', 'Nam'], n_rows).astype(object)
+    region[rng.random(n_rows) < 0.05] = None
+    product = rng.choice(['A', 'B', 'C', 'D'], n_rows).astype(object)
+    if n_rows:
+        region[0] = 'Đảo'
+    return pd.DataFrame({
+        'region': pd.Categorical(region),
+        'product': product,
+        'x': x,
+        'y': x * 0.5 + rng.normal(0, 5, n_rows),
+        'qty': rng.integers(-50, 500, n_rows),
+        'empty': np.full(n_rows, np.nan)
+    })
+
+
+@pytest.fixture
+def frame():
+    return random_frame()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from conftest import random_frame
+from correlation import cluster_order, correlation_matrix, filter_matrix, top_pairs
+
+COLUMNS = ['x', 'y', 'qty', 'empty']
+
+
+def test_matches_pandas_corr(frame):
+    pd.testing.assert_frame_equal(correlation_matrix(frame, COLUMNS), frame[COLUMNS].corr(), rtol=1e-9)
+
+
+def test_large_offset_is_stable():
+    # Giá trị lớn gần bằng nhau: công thức tổng bình phương không dời sẽ mất độ chính xác
+    df = random_frame()
+    df['x'] += 1e9
+    pd.testing.assert_frame_equal(correlation_matrix(df, COLUMNS), df[COLUMNS].corr(), rtol=1e-6)
+
+
+def test_constant_and_all_nan_columns_are_nan(frame):
+    frame['const'] = 5.0
+    corr = correlation_matrix(frame, ['x', 'const', 'empty'])
+    assert np.isnan(corr.loc['x', 'const'])
+    assert np.isnan(corr.loc['x', 'empty'])
+    assert np.isnan(corr.loc['empty', 'empty'])
+    assert corr.loc['x', 'x'] == 1.0
+
+
+def test_single_row_and_empty_frame():
+    for n_rows in (0, 1):
+        df = random_frame(n_rows)
+        assert correlation_matrix(df, COLUMNS).isna().all().all()
+
+
+def test_top_pairs_and_filter(frame):
+    corr = correlation_matrix(frame, COLUMNS)
+    pairs = top_pairs(corr, k=1)
+    assert set(pairs.iloc[0][['Cột 1', 'Cột 2']]) == {'x', 'y'}
+    filtered = filter_matrix(corr, 0.5)
+    assert list(filtered.columns) == ['x', 'y']
+    assert sorted(cluster_order(corr)) == sorted(COLUMNS)
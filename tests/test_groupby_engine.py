@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import random_frame
+from groupby_engine import AGG_FUNCS, group_aggregates
+
+VALUE_COLS = ['x', 'y', 'qty', 'empty']
+
+
+def aggregates(df, group_col):
+    codes, labels = pd.factorize(df[group_col], sort=True)
+    return group_aggregates(df, group_col, VALUE_COLS, codes, labels)
+
+
+def expected(df, group_col, func):
+    return df.groupby(group_col, observed=True)[VALUE_COLS].agg(func).reset_index()
+
+
+@pytest.mark.parametrize('func', AGG_FUNCS)
+@pytest.mark.parametrize('group_col', ['region', 'product'])
+def test_matches_pandas_groupby(frame, group_col, func):
+    result = aggregates(frame, group_col).frame(func, VALUE_COLS)
+    pd.testing.assert_frame_equal(
+        result, expected(frame, group_col, func),
+        check_dtype=False, check_categorical=False, rtol=1e-9
+    )
+
+
+def test_single_row_group(frame):
+    result = aggregates(frame, 'region').frame('mean', ['x', 'qty'])
+    row = result[result['region'] == 'Đảo'].iloc[0]
+    assert row['qty'] == frame['qty'].iloc[0]
+
+
+def test_integer_columns_keep_integer_dtype(frame):
+    result = aggregates(frame, 'product').frame('sum', ['qty'])
+    assert result['qty'].dtype == np.int64
+
+
+def test_empty_frame():
+    df = random_frame(0)
+    result = aggregates(df, 'product').frame('sum', VALUE_COLS)
+    assert len(result) == 0
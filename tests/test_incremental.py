@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import random_frame
+from correlation import frame_comoments
+from data_loader import append_frames
+from dataset_profile import DatasetProfile
+from groupby_engine import AGG_FUNCS, group_aggregates
+
+VALUE_COLS = ['x', 'y', 'qty', 'empty']
+
+
+def parts(split):
+    df = random_frame(seed=3)
+    return df, df.iloc[:split].reset_index(drop=True), df.iloc[split:].reset_index(drop=True)
+
+
+def aggregates(df, group_col):
+    codes, labels = pd.factorize(df[group_col], sort=True)
+    return group_aggregates(df, group_col, VALUE_COLS, codes, labels)
+
+
+@pytest.mark.parametrize('split', [1, 700, 1999])
+@pytest.mark.parametrize('func', AGG_FUNCS)
+def test_group_aggregates_merge_matches_whole(split, func):
+    df, head, tail = parts(split)
+    merged = aggregates(head, 'product').merge(aggregates(tail, 'product'))
+    pd.testing.assert_frame_equal(merged.frame(func, VALUE_COLS), aggregates(df, 'product').frame(func, VALUE_COLS), rtol=1e-9)
+
+
+def test_group_aggregates_merge_adds_new_groups():
+    df, head, tail = parts(1000)
+    head = head[head['product'] != 'D']
+    merged = aggregates(head, 'product').merge(aggregates(tail, 'product'))
+    expected = pd.concat([head, tail]).groupby('product')[VALUE_COLS].sum().reset_index()
+    pd.testing.assert_frame_equal(merged.frame('sum', VALUE_COLS), expected, check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('split', [1, 700])
+def test_comoments_merge_matches_pandas(split):
+    df, head, tail = parts(split)
+    moments = frame_comoments(head, VALUE_COLS)
+    moments.merge(frame_comoments(tail, VALUE_COLS, moments.shift))
+    pd.testing.assert_frame_equal(moments.correlation(), df[VALUE_COLS].corr(), rtol=1e-9)
+
+
+def test_profile_extend_matches_fresh_profile():
+    df, head, tail = parts(1500)
+    base = DatasetProfile(head)
+    base.sketches()
+    base.correlation()
+    base.groups('product')
+    combined, issues = append_frames(head, tail)
+    assert issues == []
+    extended = base.extend(tail, combined)
+    fresh = DatasetProfile(combined)
+
+    pd.testing.assert_frame_equal(extended.correlation()[0], fresh.correlation()[0], rtol=1e-9)
+    for func in AGG_FUNCS:
+        pd.testing.assert_frame_equal(
+            extended.group_agg('product', VALUE_COLS, func)[0], fresh.group_agg('product', VALUE_COLS, func)[0], rtol=1e-9
+        )
+    for col in ('x', 'qty'):
+        merged, whole = extended.sketches()[0][col], fresh.sketches()[0][col]
+        assert merged.count == whole.count
+        assert merged.var == pytest.approx(whole.var, rel=1e-9)
+        assert merged.quantiles.quantile(0.5) == whole.quantiles.quantile(0.5)
+    # Hồ sơ cũ không bị thay đổi
+    assert base.sketches()[0]['x'].count == head['x'].count()
+
+
+def test_append_keeps_categories_and_reports_mismatch():
+    df, head, tail = parts(1000)
+    combined, issues = append_frames(head, tail)
+    assert len(combined) == len(df)
+    assert isinstance(combined['region'].dtype, pd.CategoricalDtype)
+    assert combined['region'].astype(object).equals(df['region'].astype(object))
+    _, issues = append_frames(head, tail.drop(columns='y'))
+    assert issues
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from conftest import random_frame
+from pivot_cube import build_cube, direct_rollup
+
+DIMS = ['region', 'product']
+VALUE_COLS = ['x', 'qty', 'empty']
+
+
+def cube_of(df, dims=DIMS, **kwargs):
+    indexes = {dim: pd.factorize(df[dim], sort=True) for dim in dims}
+    return build_cube(df, dims, indexes, VALUE_COLS, **kwargs)
+
+
+def same(result, expected):
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), expected.reset_index(drop=True),
+        check_dtype=False, check_categorical=False, rtol=1e-9
+    )
+
+
+@pytest.mark.parametrize('func', ['sum', 'mean', 'count', 'min', 'max'])
+@pytest.mark.parametrize('group_dims', [['region'], ['product'], ['region', 'product'], []])
+def test_rollup_matches_direct(frame, group_dims, func):
+    cube = cube_of(frame)
+    same(cube.rollup(group_dims, VALUE_COLS, func), direct_rollup(frame, group_dims, VALUE_COLS, func))
+
+
+@pytest.mark.parametrize('func', ['sum', 'mean', 'max'])
+def test_drill_down_matches_direct(frame, func):
+    cube = cube_of(frame)
+    where = {'region': 'Nam'}
+    same(cube.rollup(['product'], VALUE_COLS, func, where), direct_rollup(frame, ['product'], VALUE_COLS, func, where))
+
+
+def test_pivot_matches_pivot_table(frame):
+    cube = cube_of(frame)
+    expected = frame.pivot_table(index='region', columns='product', values='x', aggfunc='sum', observed=True)
+    pd.testing.assert_frame_equal(
+        cube.pivot('region', 'product', 'x', 'sum'), expected,
+        check_dtype=False, check_categorical=False, check_names=False, check_index_type=False, rtol=1e-9
+    )
+
+
+def test_single_row_cell():
+    df = random_frame(1)
+    cube = cube_of(df)
+    assert cube.n_cells == 1
+    assert cube.rollup(['region'], ['qty'], 'sum')['qty'].tolist() == [df['qty'].iloc[0]]
+
+
+def test_empty_frame():
+    cube = cube_of(random_frame(0))
+    assert cube.n_cells == 0
+    assert len(cube.rollup(['region'], VALUE_COLS, 'sum')) == 0
+
+
+def test_over_budget_returns_none(frame):
+    assert cube_of(frame, max_bytes=1) is None
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import random_frame
+from row_filter import CategoryIndex, RangeIndex, filter_positions
+
+
+def category_index(df, column):
+    codes, labels = pd.factorize(df[column], sort=True)
+    return CategoryIndex(codes, labels)
+
+
+def range_index(df, column):
+    return RangeIndex(df[column].to_numpy(dtype=np.float64, na_value=np.nan))
+
+
+@pytest.mark.parametrize('regions, products, lo, hi', [
+    (['Nam'], ['A', 'B'], 90.0, 110.0),
+    (['Bắc', 'Trung', 'Nam', 'Đảo'], ['A', 'B', 'C', 'D'], -np.inf, np.inf),
+    (['Đảo'], ['A', 'B', 'C', 'D'], -np.inf, np.inf),
+    (['Nam'], ['C'], 1000.0, 2000.0),
+    (['Không có'], ['A'], 0.0, 200.0),
+])
+def test_matches_pandas_mask(frame, regions, products, lo, hi):
+    conditions = [
+        (category_index(frame, 'region'), (tuple(regions),)),
+        (category_index(frame, 'product'), (tuple(products),)),
+        (range_index(frame, 'x'), (lo, hi)),
+    ]
+    mask = frame['region'].isin(regions) & frame['product'].isin(products) & frame['x'].between(lo, hi)
+    np.testing.assert_array_equal(filter_positions(conditions), np.flatnonzero(mask.to_numpy()))
+
+
+def test_counts_match_selection(frame):
+    index = category_index(frame, 'region')
+    assert index.count(['Bắc', 'Nam']) == frame['region'].isin(['Bắc', 'Nam']).sum()
+    values = range_index(frame, 'qty')
+    assert values.count(0, 100) == frame['qty'].between(0, 100).sum()
+    assert values.bounds == (frame['qty'].min(), frame['qty'].max())
+
+
+def test_positions_in_row_order_for_large_selection(frame):
+    # Nhiều dòng được chọn thì dùng mặt nạ thay vì sắp xếp: kết quả vẫn theo thứ tự dòng
+    positions = range_index(frame, 'qty').positions(-1000, 1000)
+    np.testing.assert_array_equal(positions, np.arange(len(frame)))
+
+
+def test_all_nan_and_empty_columns(frame):
+    index = range_index(frame, 'empty')
+    assert np.isnan(index.bounds[0])
+    assert len(index.positions(-np.inf, np.inf)) == 0
+    empty = random_frame(0)
+    conditions = [(category_index(empty, 'product'), (('A',),)), (range_index(empty, 'x'), (0.0, 1.0))]
+    assert len(filter_positions(conditions)) == 0
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from conftest import random_frame
+from sketches import RELATIVE_ACCURACY, ColumnSketch, DistinctSketch, QuantileSketch, merge_sketches, sketch_columns
+
+
+# Sai số cho phép của phân vị nội suy: mỗi thứ hạng lệch tương đối không quá RELATIVE_ACCURACY
+def assert_quantile_close(sketch, values, q):
+    ordered = np.sort(values)
+    pos = q * (len(ordered) - 1)
+    lo, hi = ordered[int(np.floor(pos))], ordered[int(np.ceil(pos))]
+    exact = np.quantile(values, q)
+    assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * max(abs(lo), abs(hi)) + 1e-12
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_quantiles_within_relative_accuracy(seed):
+    rng = np.random.default_rng(seed)
+    # Có giá trị âm, 0 và trải nhiều bậc độ lớn
+    values = np.concatenate([rng.lognormal(3, 2, 20_000), -rng.lognormal(1, 1, 5_000), np.zeros(500)])
+    sketch = QuantileSketch().update(values)
+    for q in (0.0, 0.01, 0.25, 0.5, 0.75, 0.99, 1.0):
+        assert_quantile_close(sketch, values, q)
+
+
+def test_merged_quantiles_match_single_pass():
+    values = np.random.default_rng(1).normal(50, 10, 30_000)
+    whole = QuantileSketch().update(values)
+    merged = QuantileSketch()
+    for part in np.array_split(values, 7):
+        merged.merge(QuantileSketch().update(part))
+    for q in (0.1, 0.5, 0.9):
+        assert merged.quantile(q) == whole.quantile(q)
+
+
+@pytest.mark.parametrize('n_distinct', [10, 1_000, 100_000])
+def test_distinct_estimate(n_distinct):
+    values = np.random.default_rng(2).permutation(np.repeat(np.arange(n_distinct, dtype=np.float64), 3))
+    sketch = DistinctSketch().update(values)
+    assert abs(sketch.estimate() - n_distinct) <= 3 * sketch.relative_error * n_distinct + 1
+
+
+def test_column_sketch_matches_pandas(frame):
+    sketches = sketch_columns(frame, ['x', 'qty'], chunk_rows=300)
+    for col in ('x', 'qty'):
+        series = frame[col]
+        sketch = sketches[col]
+        assert sketch.count == series.count()
+        assert sketch.total == pytest.approx(series.sum(), rel=1e-12)
+        assert sketch.mean == pytest.approx(series.mean(), rel=1e-12)
+        assert sketch.var == pytest.approx(series.var(), rel=1e-9)
+        assert sketch.min == series.min() and sketch.max == series.max()
+        assert abs(sketch.distinct.estimate() - series.nunique()) <= 3 * sketch.distinct.relative_error * series.nunique()
+
+
+def test_merge_sketches_across_frames():
+    a, b = random_frame(seed=1), random_frame(seed=2)
+    merged = merge_sketches([sketch_columns(a, ['x']), sketch_columns(b, ['x'])])['x']
+    both = np.concatenate([a['x'].to_numpy(), b['x'].to_numpy()])
+    assert merged.count == np.count_nonzero(~np.isnan(both))
+    assert merged.var == pytest.approx(np.nanvar(both, ddof=1), rel=1e-9)
+
+
+def test_all_nan_and_empty_columns():
+    for values in (np.full(100, np.nan), np.zeros(0)):
+        sketch = ColumnSketch().update(values)
+        assert sketch.count == 0
+        assert np.isnan(sketch.min) and np.isnan(sketch.max) and np.isnan(sketch.var)
+        assert np.isnan(sketch.quantiles.quantile(0.5))
+        assert sketch.distinct.estimate() == 0
+
+
+def test_single_value():
+    sketch = ColumnSketch().update(np.array([42.0]))
+    assert sketch.quantiles.quantile(0.5) == 42.0
+    assert np.isnan(sketch.var)
+    assert sketch.distinct.estimate() == 1
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import random_frame
+from dataset_profile import DatasetProfile
+from table_view import TableView, search_rows
+
+
+def view_rows(view, page_size):
+    return np.concatenate([view.page(start, start + page_size) for start in range(0, len(view), page_size)] or [np.zeros(0, dtype=np.intp)])
+
+
+@pytest.mark.parametrize('term', ['nam', 'A', 'ảo', 'không có'])
+def test_search_matches_str_contains(frame, term):
+    profile = DatasetProfile(frame)
+    indexes = [profile.category_index(col)[0] for col in ('region', 'product')]
+    expected = np.zeros(len(frame), dtype=bool)
+    for col in ('region', 'product'):
+        expected |= frame[col].astype(object).astype(str).str.lower().str.contains(term.lower(), regex=False) & frame[col].notna()
+    np.testing.assert_array_equal(search_rows(indexes, term, len(frame)), np.flatnonzero(expected.to_numpy()))
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('column', ['x', 'qty', 'region'])
+@pytest.mark.parametrize('page_size', [50, 333])
+def test_sorted_pages_match_sort_values(frame, column, descending, page_size):
+    profile = DatasetProfile(frame)
+    order, missing = profile.sort_order(column)[0]
+    rows = view_rows(TableView(len(frame), order, missing, descending), page_size)
+
+    expected = frame[column].sort_values(ascending=not descending, na_position='last', kind='stable')
+    assert len(rows) == len(frame)
+    assert sorted(rows) == list(range(len(frame)))
+    pd.testing.assert_series_equal(frame[column].iloc[rows].reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_search_then_sort(frame):
+    profile = DatasetProfile(frame)
+    hits = search_rows([profile.category_index('product')[0]], 'b', len(frame))
+    order, missing = profile.sort_order('x')[0]
+    view = TableView(len(frame), order, missing, rows=hits)
+    rows = view_rows(view, 100)
+    expected = frame[frame['product'] == 'B']['x'].sort_values(na_position='last', kind='stable')
+    assert len(view) == len(hits)
+    pd.testing.assert_series_equal(frame['x'].iloc[rows].reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_unsorted_view_and_pages_past_the_end(frame):
+    view = TableView(len(frame))
+    np.testing.assert_array_equal(view.page(1990, 2100), np.arange(1990, 2000))
+    assert len(view.page(5000, 5050)) == 0
+    filtered = TableView(len(frame), rows=np.array([3, 7, 11]))
+    assert len(filtered) == 3 and filtered.page(0, 50).tolist() == [3, 7, 11]
+
+
+def test_all_nan_column_and_empty_frame():
+    df = random_frame()
+    profile = DatasetProfile(df)
+    order, missing = profile.sort_order('empty')[0]
+    assert len(order) == 0 and len(missing) == len(df)
+    assert len(TableView(len(df), order, missing, True).page(0, 50)) == 50
+    empty = random_frame(0)
+    profile = DatasetProfile(empty)
+    assert len(search_rows([profile.category_index('product')[0]], 'a', 0)) == 0
+    order, missing = profile.sort_order('x')[0]
+    assert len(TableView(0, order, missing)) == 0
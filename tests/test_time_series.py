@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from time_series import date_buckets, detect_time_columns, parse_dates, period_buckets, period_keys, trend_frame
+
+PANDAS_FREQ = {'D': 'D', 'W': 'W-SUN', 'M': 'M'}
+
+
+def random_dates(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-01-01T00:00', 'm')
+    values = start + rng.integers(0, 2 * 365 * 24 * 60, n_rows).astype('timedelta64[m]')
+    values = values.astype('datetime64[ns]')
+    values[rng.random(n_rows) < 0.05] = np.datetime64('NaT')
+    return values
+
+
+@pytest.mark.parametrize('freq', ['D', 'W', 'M'])
+def test_bucket_counts_match_pandas_periods(freq):
+    values = random_dates(5000)
+    codes, starts = date_buckets(values, freq)
+    counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(starts)), index=starts)
+
+    periods = pd.Series(values).dropna().dt.to_period(PANDAS_FREQ[freq])
+    expected = periods.value_counts().sort_index()
+    expected = expected.reindex(pd.period_range(expected.index.min(), expected.index.max()), fill_value=0)
+    np.testing.assert_array_equal(counts.to_numpy(), expected.to_numpy())
+    pd.testing.assert_index_equal(starts, expected.index.to_timestamp(), check_names=False, exact=False)
+    assert (codes[np.isnat(values)] == -1).all()
+
+
+def test_weeks_start_on_monday():
+    _, starts = date_buckets(random_dates(500), 'W')
+    assert (starts.dayofweek == 0).all()
+
+
+def test_all_missing_and_single_value():
+    codes, starts = date_buckets(np.full(3, np.datetime64('NaT'), dtype='datetime64[ns]'), 'D')
+    assert (codes == -1).all() and len(starts) == 0
+    codes, starts = date_buckets(np.array(['2024-02-29T13:00'], dtype='datetime64[ns]'), 'M')
+    assert codes.tolist() == [0] and starts[0] == pd.Timestamp('2024-02-01')
+
+
+def test_too_many_buckets():
+    values = np.array(['1800-01-01', '2200-01-01'], dtype='datetime64[ns]')
+    with pytest.raises(ValueError):
+        date_buckets(values, 'D')
+
+
+def test_parse_dates_iso_and_day_first():
+    parsed = parse_dates(['2024-03-05', '05/03/2024', '2024/03/05 12:00', 'không phải ngày', '2024-03-05T00:00:00+07:00'])
+    assert pd.Timestamp(parsed[0]) == pd.Timestamp('2024-03-05')
+    assert pd.Timestamp(parsed[1]) == pd.Timestamp('2024-03-05')
+    assert pd.Timestamp(parsed[2]) == pd.Timestamp('2024-03-05 12:00')
+    assert np.isnat(parsed[3])
+    assert pd.Timestamp(parsed[4]) == pd.Timestamp('2024-03-04 17:00')
+
+
+def test_period_labels():
+    keys = period_keys(['Tháng 3', 'tháng 03/2024', 'T12-2023', 'Tháng 13', None])
+    assert keys.tolist() == [2, 2024 * 12 + 2, 2023 * 12 + 11, -1, -1]
+    codes, labels = period_buckets(keys)
+    assert list(labels) == ['Tháng 3', 'Tháng 12/2023', 'Tháng 3/2024']
+    assert codes.tolist() == [0, 2, 1, -1, -1]
+
+
+def test_detect_time_columns():
+    n_rows = 50
+    df = pd.DataFrame({
+        'ngay': pd.date_range('2024-01-01', periods=n_rows),
+        'ngay_text': pd.date_range('2024-01-01', periods=n_rows).strftime('%d/%m/%Y'),
+        'thang': pd.Categorical([f"Tháng {i % 12 + 1}" for i in range(n_rows)]),
+        'ten': [f"SP{i}" for i in range(n_rows)],
+        'so': np.arange(n_rows),
+        'trong': [None] * n_rows,
+    })
+    assert detect_time_columns(df) == {'ngay': 'datetime', 'ngay_text': 'datetime', 'thang': 'period'}
+
+
+def test_trend_frame_matches_pandas():
+    series = pd.Series([1.0, 2.0, np.nan, 4.0, 0.0, 3.0])
+    trend = trend_frame(series, 3)
+    pd.testing.assert_series_equal(trend['TB trượt 3 kỳ'], series.rolling(3, min_periods=1).mean(), check_names=False)
+    pd.testing.assert_series_equal(trend['Thay đổi'], series.diff(), check_names=False)
+    assert np.isnan(trend['Thay đổi %'].iloc[5])
@@ -0,0 +1,142 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Các mức gộp thời gian: nhãn hiển thị -> mã
+FREQUENCIES = {'Ngày': 'D', 'Tuần': 'W', 'Tháng': 'M'}
+# Số kỳ tối đa của một chuỗi thời gian (khoảng thời gian quá dài so với mức gộp thì báo lỗi)
+MAX_TIME_BUCKETS = 100_000
+# Nhận diện cột ngày giờ dạng văn bản: thử parse tối đa chừng này giá trị khác nhau,
+# cột được nhận khi ít nhất DETECT_MIN_RATIO trong số đó là ngày hợp lệ
+DETECT_SAMPLE = 200
+DETECT_MIN_RATIO = 0.9
+
+# Kỳ dạng tháng: "Tháng 3", "tháng 03/2024", "T3-2024"...
+PERIOD_PATTERN = re.compile(r'^\s*(?:tháng|thang|t)\s*(\d{1,2})(?:\s*[/\-.]\s*(\d{4}))?\s*$', re.IGNORECASE)
+
+
+# Khóa của từng nhãn kỳ tháng: năm * 12 + tháng - 1 (năm 0 khi nhãn không ghi năm), -1 nếu không khớp
+def period_keys(labels):
+    keys = np.full(len(labels), -1, dtype=np.int64)
+    for i, label in enumerate(labels):
+        match = PERIOD_PATTERN.match(str(label))
+        if match and 1 <= int(match.group(1)) <= 12:
+            keys[i] = int(match.group(2) or 0) * 12 + int(match.group(1)) - 1
+    return keys
+
+
+def period_label(key):
+    year, month = divmod(int(key), 12)
+    return f"Tháng {month + 1}/{year}" if year else f"Tháng {month + 1}"
+
+
+# Ngày dạng năm trước (2024-03-05, 2024/03/05 12:00...)
+ISO_PATTERN = r'^\s*\d{4}[-/.]\d{1,2}[-/.]\d{1,2}'
+
+
+# Parse các nhãn văn bản thành ngày (NaT nếu không phải ngày). Dữ liệu Việt Nam ghi ngày trước
+# tháng (05/03/2024), riêng dạng năm trước luôn là năm-tháng-ngày.
+def parse_dates(labels):
+    text = pd.Index(labels, dtype=object).map(str)
+    iso = np.asarray(text.str.match(ISO_PATTERN), dtype=bool)
+    parsed = np.full(len(text), np.datetime64('NaT', 'ns'))
+    for mask, dayfirst in ((iso, False), (~iso, True)):
+        if mask.any():
+            # utc=True để ghép được cả giá trị có và không có múi giờ (giá trị có múi giờ đổi về UTC)
+            dates = pd.to_datetime(text[mask], errors='coerce', dayfirst=dayfirst, format='mixed', utc=True)
+            parsed[mask] = dates.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    return parsed
+
+
+# Các cột thời gian của bảng: {cột: 'datetime' | 'period'}.
+# 'datetime': cột kiểu ngày giờ, hoặc cột văn bản mà hầu hết giá trị là ngày;
+# 'period': cột văn bản dạng "Tháng N" (chỉ gộp được theo tháng).
+# Chỉ xét các giá trị khác nhau (category) hoặc một mẫu nhỏ, không parse cả cột.
+def detect_time_columns(df):
+    found = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            found[col] = 'datetime'
+            continue
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            labels = series.cat.categories
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            labels = series.dropna().head(DETECT_SAMPLE * 10).unique()
+        else:
+            continue
+        labels = labels[:DETECT_SAMPLE]
+        if len(labels) == 0:
+            continue
+        if (period_keys(labels) >= 0).mean() >= DETECT_MIN_RATIO:
+            found[col] = 'period'
+        elif (~np.isnat(parse_dates(labels))).mean() >= DETECT_MIN_RATIO:
+            found[col] = 'datetime'
+    return found
+
+
+# Giá trị ngày giờ (datetime64[ns], NaT = ô trống) của từng dòng một cột kiểu ngày giờ
+def datetime_values(series):
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_localize(None)
+    return series.to_numpy(dtype='datetime64[ns]')
+
+
+# Gán mỗi dòng vào kỳ (ngày, tuần bắt đầu thứ Hai, tháng) bằng phép toán số nguyên trên
+# cả mảng. Các kỳ liên tiếp từ kỳ đầu đến kỳ cuối, kể cả kỳ không có dòng nào, nên trục
+# thời gian không bị nhảy cóc. Trả về (mã kỳ của từng dòng, -1 nếu trống; ngày bắt đầu các kỳ).
+def date_buckets(values, freq):
+    valid = ~np.isnat(values)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    if not valid.any():
+        return codes, pd.DatetimeIndex([])
+    if freq == 'M':
+        index = values[valid].astype('datetime64[M]').astype(np.int64)
+    else:
+        index = values[valid].astype('datetime64[D]').astype(np.int64)
+        if freq == 'W':
+            # 1970-01-01 là thứ Năm: cộng 3 ngày để mỗi tuần bắt đầu từ thứ Hai
+            index = (index + 3) // 7
+    first, last = int(index.min()), int(index.max())
+    if last - first + 1 > MAX_TIME_BUCKETS:
+        raise ValueError(f"khoảng thời gian gồm {last - first + 1:,} kỳ, hãy chọn mức gộp lớn hơn")
+    codes[valid] = index - first
+    steps = np.arange(first, last + 1)
+    if freq == 'M':
+        starts = steps.astype('datetime64[M]')
+    elif freq == 'W':
+        starts = (steps * 7 - 3).astype('datetime64[D]')
+    else:
+        starts = steps.astype('datetime64[D]')
+    return codes, pd.DatetimeIndex(starts.astype('datetime64[ns]'))
+
+
+# Kỳ tháng của từng dòng theo khóa kỳ của dòng (-1 = trống). Trả về (mã kỳ, nhãn các kỳ theo thứ tự thời gian)
+def period_buckets(keys):
+    valid = keys >= 0
+    unique = np.unique(keys[valid])
+    codes = np.full(len(keys), -1, dtype=np.int64)
+    codes[valid] = np.searchsorted(unique, keys[valid])
+    return codes, pd.Index([period_label(key) for key in unique])
+
+
+# Chuỗi giá trị theo kỳ của một cột từ kết quả tổng hợp (GroupAggregates theo mã kỳ)
+def bucket_series(aggregates, column, func):
+    values = getattr(aggregates, func)[:, aggregates.columns.index(column)]
+    return pd.Series(values, index=aggregates.labels, name=column)
+
+
+# Bảng xu hướng theo kỳ: giá trị, trung bình trượt window kỳ, trung bình trượt hàm mũ
+# (span = window) và thay đổi so với kỳ trước (tuyệt đối và %)
+def trend_frame(series, window):
+    values = series.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change_pct = values.pct_change(fill_method=None) * 100
+    return pd.DataFrame({
+        'Giá trị': values,
+        f"TB trượt {window} kỳ": values.rolling(window, min_periods=1).mean(),
+        'TB hàm mũ': values.ewm(span=window, ignore_na=True).mean(),
+        'Thay đổi': values.diff(),
+        'Thay đổi %': change_pct.replace([np.inf, -np.inf], np.nan)
+    })